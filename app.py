@@ -1,25 +1,40 @@
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
-import subprocess
 import eventlet
 
-eventlet.monkey_patch()  # Needed for eventlet compatibility
+eventlet.monkey_patch()  # Needed for eventlet compatibility; must run before the other imports
+
+import os
+
+from flask import Flask, render_template, request
+from flask_socketio import SocketIO
+
+from command_runner import CommandRunner
 
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+runner = CommandRunner(
+    socketio,
+    timeout=float(os.getenv('COMMAND_TIMEOUT', 30)),  # seconds
+    max_output_bytes=int(os.getenv('COMMAND_MAX_OUTPUT_BYTES', 1024 * 1024)),  # per command
+    max_concurrent=int(os.getenv('COMMAND_MAX_CONCURRENT', 4))  # across all clients
+)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @socketio.on('run_command')
 def handle_command(data):
-    command = data['command']
-    try:
-        output = subprocess.check_output(command, shell=True, text=True, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as e:
-        output = e.output
-    emit('command_output', {'output': output})
+    # Output is streamed back as command_output events while the command runs
+    runner.start(request.sid, data.get('command'), data.get('id'))
+
+@socketio.on('cancel_command')
+def handle_cancel(data):
+    runner.cancel(request.sid, data.get('id'))
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    runner.cancel_all(request.sid)
 
 if __name__ == '__main__':
     socketio.run(app, debug=True)
@@ -0,0 +1,240 @@
+"""
+Admission control and request size limits for the cipher operations.
+
+Before /encrypt, /decrypt, /hash or /mac (or the same messages on the
+WebSocket channel), /encrypt/incremental, /validate, /validate/batch,
+/crack/* or /analyze does any work, admit() estimates what it will cost
+from the kind of work, the input size and the steps level the client asked
+for:
+
+- If it fits ADMISSION_CPU_BUDGET and ADMISSION_MEMORY_BUDGET it runs as
+  asked.
+- If the cipher itself fits but the steps don't, the request is downgraded.
+  Classical ciphers build steps for as many leading characters as the budget
+  allows; the other methods leave the steps out. The response then carries
+  "steps_truncated": true and "steps_length" (characters covered).
+- If even the bare cipher doesn't fit, it is refused with 413 and pointed at
+  the background jobs in /jobs.
+
+Clients that don't need steps can send "steps": "none", which makes large
+inputs much cheaper. Estimates are rough, so each admitted operation also
+gets a CPU-time deadline (ADMISSION_CPU_DEADLINE, measured with
+time.thread_time()) checked between chunks of work; an operation that runs
+past it stops with 503.
+
+The substitution solver runs for a fixed time on a process pool rather than
+for a time that grows with its input, so it is limited by how many searches
+may run at once instead (solver_slots, SOLVER_MAX_CONCURRENT per server
+process); a request beyond that is refused with 503.
+
+Request bodies are limited to MAX_CONTENT_LENGTH, except on blueprints
+that stream large bodies and enforce their own limit (BODY_LIMITS).
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from negotiation import NegotiatingRequest
+
+STEP_LEVELS = ('full', 'none')
+
+# Estimated (CPU nanoseconds, peak bytes) per input character without steps,
+# then the extra per character covered by steps. They include building the
+# response and encoding it as JSON, and come from benchmarks/ciphers.py on a
+# development machine; the budgets are what to tune.
+COSTS = {
+    'caesar': (5, 8, 1200, 800),
+    'substitution': (5, 8, 1200, 700),
+    'vigenere': (40, 48, 1500, 900),
+    'aes': (6, 24, 6, 16),
+    'chacha20': (6, 24, 6, 16),
+    '3des': (50, 24, 6, 16),
+    'hash': (3, 8, 500, 120),
+    'mac': (3, 8, 30, 24),
+    # Work without steps; the cracking costs include the plaintext in the response
+    'crack-caesar': (6, 12, 0, 0),
+    'crack-vigenere': (110, 80, 0, 0),
+    'crack-substitution': (2, 8, 0, 0),
+    'analyze': (65, 32, 0, 0),
+}
+
+# Methods whose steps can be built for the start of the text only
+TRUNCATABLE_STEPS = frozenset(['caesar', 'substitution', 'vigenere'])
+
+# Blueprints whose bodies are streamed, and the setting that limits them instead of MAX_CONTENT_LENGTH
+BODY_LIMITS = {
+    'containers': 'CONTAINER_MAX_BYTES',
+    'jobs': 'JOBS_MAX_REQUEST_BYTES',
+}
+
+
+class AdmissionError(ValueError):
+    """A request refused or stopped by admission control, with the HTTP status to report."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class DeadlineExceeded(AdmissionError):
+    def __init__(self, seconds):
+        super().__init__(f"The request ran out of CPU time ({seconds:g} s); submit it as a background job to /jobs",
+                         503)
+
+
+class CpuDeadline:
+    """Limit on the CPU time of the current thread."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.thread_time() + seconds if seconds else None
+
+    def check(self, *_):
+        """Raise DeadlineExceeded once the thread has used up its CPU time (usable as a checkpoint)."""
+        if self.expires is not None and time.thread_time() > self.expires:
+            raise DeadlineExceeded(self.seconds)
+
+
+class Admission:
+    """How an admitted operation runs."""
+
+    def __init__(self, steps_length, truncated, deadline):
+        self.steps_length = steps_length  # Characters to build steps for
+        self.truncated = truncated  # Fewer than the client asked for
+        self.deadline = deadline
+
+    @property
+    def with_steps(self):
+        return self.steps_length > 0
+
+    def whole_steps_only(self):
+        """For operations that can't build steps for part of the text: leave them all out instead."""
+        if self.truncated:
+            self.steps_length = 0
+        return self
+
+    def annotate(self, result):
+        """Mark a result whose steps were cut short by the budget."""
+        if self.truncated:
+            result["steps_truncated"] = True
+            result["steps_length"] = self.steps_length
+        return result
+
+
+class ConcurrencyLimit:
+    """Limit on how many runs of an operation this process does at once."""
+
+    def __init__(self, setting):
+        self.setting = setting  # Config key holding the limit
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the slots while the block runs; raises AdmissionError (503) when none is free."""
+        config = current_app.config
+        limit = config[self.setting] if config['ADMISSION_ENABLED'] else None
+        with self._lock:
+            if limit is not None and self._running >= limit:
+                raise AdmissionError("The server is busy with other requests like this one; retry later or "
+                                     "submit it as a background job to /jobs", 503)
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+solver_slots = ConcurrencyLimit('SOLVER_MAX_CONCURRENT')
+
+
+def estimate(kind, size, steps_length):
+    """
+    Estimated cost of an operation.
+
+    Args:
+        kind (str): A key of COSTS (the cipher method, or hash or mac)
+        size (int): Input length in characters
+        steps_length (int): Characters covered by steps
+
+    Returns:
+        tuple: (cpu_seconds, memory_bytes)
+    """
+    cpu_ns, memory, steps_cpu_ns, steps_memory = COSTS[kind]
+    return (size * cpu_ns + steps_length * steps_cpu_ns) / 1e9, size * memory + steps_length * steps_memory
+
+
+def steps_level(data):
+    """The steps level requested in a body ("full" unless "steps" says otherwise)."""
+    level = data.get('steps', 'full')
+    if isinstance(level, bool):
+        level = 'full' if level else 'none'
+    if level not in STEP_LEVELS:
+        raise AdmissionError("steps must be full or none", 400)
+    return level
+
+
+def admit(kind, size, level='full'):
+    """
+    Decide whether and how an operation may run.
+
+    Args:
+        kind (str): The cipher method, or hash or mac
+        size (int): Input length in characters
+        level (str): Steps level the client asked for (full or none)
+
+    Returns:
+        Admission: The steps to build and the CPU deadline. Raises AdmissionError (413)
+        when the operation is too expensive even without steps.
+    """
+    config = current_app.config
+    wanted = size if level == 'full' else 0
+    if not config['ADMISSION_ENABLED'] or kind not in COSTS:
+        # Unknown methods are rejected by the operation itself
+        return Admission(wanted, False, CpuDeadline(None))
+
+    cpu_budget = config['ADMISSION_CPU_BUDGET']
+    memory_budget = config['ADMISSION_MEMORY_BUDGET']
+    cpu, memory = estimate(kind, size, 0)
+    if cpu > cpu_budget or memory > memory_budget:
+        raise AdmissionError(
+            f"This request is too large to run synchronously (estimated {cpu:.1f} s of CPU and "
+            f"{memory / 2 ** 20:.0f} MB of memory); submit it as a background job to /jobs",
+            413
+        )
+
+    steps_length = wanted
+    _, _, steps_cpu_ns, steps_memory = COSTS[kind]
+    if wanted and steps_cpu_ns:  # Kinds without steps have no steps cost
+        affordable = int(min((cpu_budget - cpu) * 1e9 / steps_cpu_ns, (memory_budget - memory) / steps_memory))
+        if affordable < wanted:
+            steps_length = affordable if kind in TRUNCATABLE_STEPS else 0
+
+    return Admission(steps_length, steps_length < wanted, CpuDeadline(config['ADMISSION_CPU_DEADLINE']))
+
+
+class LimitedRequest(NegotiatingRequest):
+    """Request class that applies MAX_CONTENT_LENGTH, or a blueprint's own limit from BODY_LIMITS."""
+
+    @property
+    def max_content_length(self):
+        config = current_app.config
+        setting = BODY_LIMITS.get(self.blueprint)
+        return config.get(setting) if setting else config.get('MAX_CONTENT_LENGTH')
+
+
+def _too_large(error):
+    limit = request.max_content_length
+    message = f"The request body is too large (the limit is {limit} bytes)" if limit else "The request body is too large"
+    return jsonify({"error": message}), 413
+
+
+def init_admission(app):
+    """Install the request size limits (call after init_negotiation)."""
+    app.request_class = LimitedRequest
+    app.register_error_handler(RequestEntityTooLarge, _too_large)
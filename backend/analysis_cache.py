@@ -0,0 +1,235 @@
+"""
+State for the frequency analysis endpoints.
+
+- AnalysisCache: LRU cache of analysis results keyed by the SHA-256 of the
+  text. Each server process has its own, so a lookup by content hash can
+  miss on another process; clients then send the text again.
+- UploadSessions: in-progress chunked uploads, kept in a directory that all
+  server processes share, so consecutive chunks of one upload may be
+  handled by different gunicorn workers. Each upload holds partial n-gram
+  counts and the text received so far (for the content hash), belongs to
+  the user who started it, and expires after a period of inactivity.
+"""
+
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from ciphers.frequency import NgramCounts
+from jobs import FileLock
+
+UPLOAD_ID = re.compile(r'^[A-Za-z0-9_-]{22}$')  # secrets.token_urlsafe(16)
+
+# Bytes of the received text read at a time when hashing it
+HASH_READ_SIZE = 1024 * 1024
+
+
+def content_hash(text):
+    """SHA-256 hex digest of a text's UTF-8 encoding."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Thread-safe LRU cache of analysis summaries."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, top):
+        with self._lock:
+            result = self._entries.get((digest, top))
+            if result is not None:
+                self._entries.move_to_end((digest, top))
+            return result
+
+    def put(self, digest, top, result):
+        with self._lock:
+            self._entries[(digest, top)] = result
+            self._entries.move_to_end((digest, top))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class UploadLimitError(OverflowError):
+    """An upload refused by one of the limits, with the HTTP status to report."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadSessions:
+    """
+    Chunked uploads in progress.
+
+    Every upload is a directory holding meta.json (owner and bytes received),
+    counts.npz (the partial NgramCounts) and text (the chunks so far). A lock
+    file in the directory keeps chunks of one upload from being applied at
+    the same time; another lock covers starting uploads and sweeping expired
+    ones.
+    """
+
+    def __init__(self):
+        self.directory = None
+
+    def configure(self, directory, ttl_seconds=600, max_sessions=1000, max_per_owner=3,
+                  max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_per_owner = max_per_owner
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = FileLock(os.path.join(directory, 'uploads.lock'))
+
+    def add_chunk(self, upload_id, chunk, owner):
+        """
+        Add a chunk to an upload, starting a new one when upload_id is None.
+
+        Chunks must be sent in order. Raises KeyError for unknown or expired uploads
+        (and for other users' uploads), UploadLimitError when a limit is reached.
+
+        Returns:
+            tuple: (upload_id, NgramCounts of the text so far)
+        """
+        if upload_id is None:
+            upload_id = self._create(owner)
+        data = chunk.encode('utf-8')
+
+        with self._session(upload_id, owner) as (path, meta):
+            if meta["bytes"] + len(data) > self.max_bytes:
+                raise UploadLimitError(f"Uploads are limited to {self.max_bytes} bytes", 413)
+            counts = NgramCounts.load(os.path.join(path, 'counts.npz'))
+            counts.update(chunk)
+            with open(os.path.join(path, 'text'), 'ab') as f:
+                f.write(data)
+            self._save_counts(path, counts)
+            meta["bytes"] += len(data)
+            _write_meta(path, meta)  # Also marks the upload as active
+        return upload_id, counts
+
+    def finish(self, upload_id, owner):
+        """
+        Remove a finished upload.
+
+        Returns:
+            tuple: (NgramCounts, SHA-256 hex digest of the whole text)
+        """
+        with self._session(upload_id, owner) as (path, _):
+            counts = NgramCounts.load(os.path.join(path, 'counts.npz'))
+            hasher = hashlib.sha256()
+            with open(os.path.join(path, 'text'), 'rb') as f:
+                for block in iter(lambda: f.read(HASH_READ_SIZE), b''):
+                    hasher.update(block)
+            shutil.rmtree(path, ignore_errors=True)
+        return counts, hasher.hexdigest()
+
+    def _path(self, upload_id):
+        if not isinstance(upload_id, str) or not UPLOAD_ID.match(upload_id):
+            raise KeyError(upload_id)
+        return os.path.join(self.directory, upload_id)
+
+    @contextmanager
+    def _session(self, upload_id, owner):
+        """Lock an upload of this owner and yield its directory and metadata."""
+        path = self._path(upload_id)
+        try:
+            lock = FileLock(os.path.join(path, 'lock'))
+            lock.__enter__()
+        except FileNotFoundError:  # Finished or swept
+            raise KeyError(upload_id)
+        try:
+            meta = _read_meta(path)
+            if meta is None or meta["owner"] != owner:
+                raise KeyError(upload_id)
+            yield path, meta
+        finally:
+            lock.__exit__(None, None, None)
+
+    def _create(self, owner):
+        with self._lock:
+            active = self._sweep_locked()
+            if len(active) >= self.max_sessions:
+                raise UploadLimitError("Too many uploads in progress", 503)
+            if sum(1 for meta in active if meta["owner"] == owner) >= self.max_per_owner:
+                raise UploadLimitError(f"At most {self.max_per_owner} uploads can be in progress at once", 429)
+
+            upload_id = secrets.token_urlsafe(16)
+            path = os.path.join(self.directory, upload_id)
+            os.mkdir(path)
+            open(os.path.join(path, 'text'), 'wb').close()
+            self._save_counts(path, NgramCounts())
+            _write_meta(path, {"owner": owner, "bytes": 0})
+        return upload_id
+
+    def _sweep_locked(self):
+        """Delete expired uploads and return the metadata of the others."""
+        cutoff = time.time() - self.ttl_seconds
+        active = []
+        for name in os.listdir(self.directory):
+            if not UPLOAD_ID.match(name):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                touched = os.path.getmtime(os.path.join(path, 'meta.json'))
+            except FileNotFoundError:
+                touched = None
+            meta = _read_meta(path)
+            if touched is None or touched < cutoff or meta is None:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                active.append(meta)
+        return active
+
+    @staticmethod
+    def _save_counts(path, counts):
+        _replace(path, 'counts.npz', counts.save)
+
+
+def _replace(path, name, write):
+    """Write a file of an upload atomically; write(f) fills the binary file f."""
+    descriptor, partial = tempfile.mkstemp(dir=path, suffix='.partial')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            write(f)
+        os.replace(partial, os.path.join(path, name))
+    except BaseException:
+        os.unlink(partial)
+        raise
+
+
+def _write_meta(path, meta):
+    _replace(path, 'meta.json', lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def init_uploads(app):
+    config = app.config
+    upload_sessions.configure(
+        directory=config['ANALYSIS_UPLOAD_DIR'],
+        ttl_seconds=config['ANALYSIS_UPLOAD_TTL'],
+        max_sessions=config['ANALYSIS_MAX_UPLOADS'],
+        max_per_owner=config['ANALYSIS_MAX_UPLOADS_PER_USER'],
+        max_bytes=config['ANALYSIS_UPLOAD_MAX_BYTES']
+    )
+
+
+analysis_cache = AnalysisCache()
+upload_sessions = UploadSessions()
@@ -1,32 +1,107 @@
-from flask import Flask, request, jsonify, current_app
+from flask import Flask, Blueprint, Response, request, jsonify, current_app, abort
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, get_jwt_identity, jwt_required
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
+import click
+import hmac
 import json
 import os
-from ciphers.classical import caesar_cipher, substitution_cipher, vigenere_cipher
-from ciphers.modern import aes_encryption, aes_decryption, des3_encryption, des3_decryption
-from ciphers.integrity import compute_hash, compute_mac, validate_mac
+import time
+from ciphers.validation import ciphertext_validator
+from ciphers.incremental import incremental_encoder
+from ciphers.integrity import validate_mac
+from ciphers.cryptanalysis import crack_caesar, crack_vigenere, shift_text, vigenere_text
+from ciphers.substitution_solver import solve_substitution, apply_substitution
+from ciphers.frequency import analyze_text
+from analysis_cache import analysis_cache, upload_sessions, content_hash, init_uploads, UploadLimitError
+from edit_sessions import edit_sessions, init_edit_sessions
+from operations import OperationError, encrypt_data, decrypt_data, hash_data, mac_data
 from models import db, User
-from auth import auth_bp, init_mail
+from auth import auth_bp, init_mail, init_otp_store
+from otp_store import create_otp_store
+from totp import totp_verifier
+from db_pool import publish_pool_gauges
+from json_provider import create_json_provider
+from logging_setup import init_logging, sampled
+from metrics import metrics, init_metrics, cipher_label, CONTENT_TYPE
+from profiler import profiler_bp, init_profiler
+from containers import containers_bp, init_containers
+from jobs import jobs_bp, init_jobs
+from negotiation import init_negotiation
+from admission import AdmissionError, admit, steps_level, solver_slots, init_admission
+from realtime import init_realtime
 from config import Config
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)  # Enable CORS for all routes
-
-# Initialize extensions
-db.init_app(app)
-jwt = JWTManager(app)
-bcrypt = Bcrypt(app)
-mail = Mail(app)
-init_mail(mail)
+# Extensions are created here and bound to an app in create_app()
+jwt = JWTManager()
+bcrypt = Bcrypt()
+mail = Mail()
+
+api_bp = Blueprint('api', __name__)
+
+def create_app(config_class=Config):
+    """
+    Application factory.
+
+    Builds a fully configured app without touching the database, so each
+    server worker starts quickly. Tables are created separately with
+    `flask --app app init-db`.
+    """
+    started = time.perf_counter()
+
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    init_logging(app)
+    app.json = create_json_provider(app)
+    init_metrics(app)
+    init_profiler(app)
+    init_negotiation(app)
+    init_admission(app)
+    CORS(app)  # Enable CORS for all routes
+
+    # Initialize extensions
+    db.init_app(app)
+    jwt.init_app(app)
+    bcrypt.init_app(app)
+    mail.init_app(app)
+    init_mail(mail)
+    init_otp_store(create_otp_store(app.config))
+    totp_verifier.configure(
+        valid_window=app.config['TOTP_VALID_WINDOW'],
+        cache_size=app.config['TOTP_CACHE_SIZE']
+    )
+
+    # Register blueprints
+    app.register_blueprint(api_bp)
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(profiler_bp, url_prefix='/admin')
+    app.register_blueprint(containers_bp, url_prefix='/containers')
+    app.register_blueprint(jobs_bp, url_prefix='/jobs')
+    init_jobs(app)
+    init_uploads(app)
+    init_containers(app)
+    init_edit_sessions(app)
+    init_realtime(app)
+
+    app.cli.add_command(init_db_command)
+
+    startup_ms = (time.perf_counter() - started) * 1000
+    app.config['STARTUP_MS'] = startup_ms
+    app.logger.info("Application created in %.1f ms (pid %s)", startup_ms, os.getpid())
+
+    return app
+
+@click.command('init-db')
+def init_db_command():
+    """Create database tables (run once per deploy, not in every worker)."""
+    db.create_all()
+    click.echo("Database tables created successfully")
 
 # JWT error handlers
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header, jwt_payload):
-    current_app.logger.warning(f"Expired token: {jwt_payload}")
+    current_app.logger.info("Expired token for user %s", jwt_payload.get("sub"), extra=sampled(0.1))
     return jsonify({
         "error": "Token has expired",
         "message": "Please refresh your token or log in again"
@@ -34,7 +109,7 @@ def expired_token_callback(jwt_header, jwt_payload):
 
 @jwt.invalid_token_loader
 def invalid_token_callback(error):
-    current_app.logger.warning(f"Invalid token: {error}")
+    current_app.logger.warning("Invalid token: %s", error, extra=sampled(0.1))
     return jsonify({
         "error": "Invalid token",
         "message": "Signature verification failed"
@@ -42,7 +117,7 @@ def invalid_token_callback(error):
 
 @jwt.unauthorized_loader
 def missing_token_callback(error):
-    current_app.logger.warning(f"Missing token: {error}")
+    current_app.logger.info("Missing token: %s", error, extra=sampled(0.1))
     return jsonify({
         "error": "Authorization required",
         "message": "Request does not contain a valid token"
@@ -50,193 +125,203 @@ def missing_token_callback(error):
 
 @jwt.token_verification_failed_loader
 def verification_failed_callback():
-    current_app.logger.warning("Token verification failed")
+    current_app.logger.warning("Token verification failed", extra=sampled(0.1))
     return jsonify({
         "error": "Token verification failed",
         "message": "The token is invalid or has been tampered with"
     }), 401
 
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/auth')
-
-@app.route('/')
+@api_bp.route('/')
 def index():
     return jsonify({
         "status": "success",
         "message": "Cryptography Learning Platform API is running"
     })
 
-@app.route('/encrypt', methods=['POST'])
+@api_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not metrics.enabled:
+        abort(404)
+    token = current_app.config.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    if token and not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return jsonify({"error": "Metrics token required"}), 401
+    publish_pool_gauges(db.engine.pool)
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@api_bp.route('/encrypt', methods=['POST'])
 def encrypt():
     data = request.get_json()
-    
+
     if not data:
         return jsonify({"error": "No data provided"}), 400
-    
-    plaintext = data.get('plaintext', '')
-    method = data.get('method', '').lower()
-    key = data.get('key', '')
-    mode = data.get('mode', '')  # For AES: ECB, CBC, CTR
-    
-    if not plaintext:
-        return jsonify({"error": "No plaintext provided"}), 400
-    
-    if not method:
-        return jsonify({"error": "No encryption method specified"}), 400
-    
-    if not key and method != 'caesar':  # Caesar can use default shift
-        return jsonify({"error": "No encryption key provided"}), 400
-    
+
     try:
-        result = {}
-        
-        # Classical ciphers
-        if method == 'caesar':
-            shift = int(key) if key else 3  # Default shift of 3
-            ciphertext, steps = caesar_cipher(plaintext, shift, encrypt=True)
-            result = {
-                "ciphertext": ciphertext,
-                "steps": steps
-            }
-        
-        elif method == 'substitution':
-            ciphertext, steps = substitution_cipher(plaintext, key, encrypt=True)
-            result = {
-                "ciphertext": ciphertext,
-                "steps": steps
-            }
-        
-        elif method == 'vigenere':
-            ciphertext, steps = vigenere_cipher(plaintext, key, encrypt=True)
-            result = {
-                "ciphertext": ciphertext,
-                "steps": steps
-            }
-        
-        # Modern ciphers
-        elif method == 'aes':
-            if not mode:
-                mode = 'cbc'  # Default to CBC mode if not specified
-
-            ciphertext, iv, steps = aes_encryption(plaintext, key, mode)
-            result = {
-                "ciphertext": ciphertext,
-                "iv": iv,
-                "steps": steps
-            }
-        
-        elif method == '3des':
-            ciphertext, iv, steps = des3_encryption(plaintext, key)
-            result = {
-                "ciphertext": ciphertext,
-                "iv": iv,
-                "steps": steps
-            }
-        
-        else:
-            return jsonify({"error": f"Unsupported encryption method: {method}"}), 400
-        
-        return jsonify(result)
-    
+        return jsonify(encrypt_data(data))
+
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/encrypt/incremental', methods=['POST'])
+def encrypt_incremental():
+    """
+    Live-typing encryption.
+
+    Without a session, encrypts the plaintext like /encrypt and starts a
+    session. With a session, applies an edit ({offset, delete, insert}) and
+    returns only the part of the ciphertext and steps that changed.
+    """
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    session_id = data.get('session')
+
+    try:
+        level = steps_level(data)
+        if not session_id:
+            plaintext = data.get('plaintext', '')
+            method = data.get('method', '').lower()
+            key = data.get('key', '')
+
+            if not method:
+                return jsonify({"error": "No encryption method specified"}), 400
+            if not key and method != 'caesar':
+                return jsonify({"error": "No encryption key provided"}), 400
+            if len(plaintext) > current_app.config['INCREMENTAL_MAX_LENGTH']:
+                return jsonify({"error": "Text is too long for a live-typing session"}), 413
+
+            # Steps can't cover only part of a live document, so a truncated admission leaves them out
+            admission = admit(method, len(plaintext), level).whole_steps_only()
+            encoder = incremental_encoder(method, key, data.get('mode'))
+            with metrics.time('cipher_duration_seconds', method=cipher_label(method), operation='encrypt'):
+                result = encoder.start(plaintext, admission.with_steps)
+            admission.deadline.check()
+            session_id, session = edit_sessions.create(encoder)
+            return jsonify(admission.annotate({"session": session_id, "version": session.version, **result}))
+
+        insert = data.get('insert', '')
+        offset = data.get('offset')
+        delete = data.get('delete', 0)
+        if not isinstance(insert, str):
+            return jsonify({"error": "insert must be a string"}), 400
+
+        # Loads the session from the shared directory and saves it back after the edit
+        with edit_sessions.edit(session_id) as session:
+            expected = data.get('version')
+            if expected is not None and expected != session.version:
+                return jsonify({
+                    "error": "Edit is based on an older version of the text",
+                    "version": session.version
+                }), 409
+            length = len(session.encoder.text) - delete + len(insert)
+            if length > current_app.config['INCREMENTAL_MAX_LENGTH']:
+                return jsonify({"error": "Text is too long for a live-typing session"}), 413
+
+            method = session.encoder.method
+            # An edit can re-encrypt everything after it, so it is admitted at the document's length
+            admission = admit(method, length, level).whole_steps_only()
+            with metrics.time('cipher_duration_seconds', method=cipher_label(method), operation='encrypt_incremental'):
+                result = session.encoder.edit(offset, delete, insert, admission.with_steps)
+            session.version += 1
+            admission.deadline.check()
+            return jsonify(admission.annotate({"session": session_id, "version": session.version, **result}))
+
+    except KeyError:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
+    except OverflowError as e:
+        return jsonify({"error": str(e)}), 503
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/decrypt', methods=['POST'])
+@api_bp.route('/encrypt/incremental/<session_id>', methods=['DELETE'])
+def end_incremental_session(session_id):
+    edit_sessions.close(session_id)
+    return '', 204
+
+@api_bp.route('/decrypt', methods=['POST'])
 def decrypt():
     data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    try:
+        return jsonify(decrypt_data(data))
+
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/validate', methods=['POST'])
+def validate():
+    data = request.get_json()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
+    plaintext = data.get('plaintext', '')
     ciphertext = data.get('ciphertext', '')
     method = data.get('method', '').lower()
     key = data.get('key', '')
-    mode = data.get('mode', '')  # For AES: ECB, CBC, CTR
-    iv = data.get('iv', '')  # For AES CBC/CTR modes
+    mode = data.get('mode', '')  # For AES: ECB, CBC, CTR, GCM
     
-    if not ciphertext:
-        return jsonify({"error": "No ciphertext provided"}), 400
+    if not plaintext or not ciphertext:
+        return jsonify({"error": "Both plaintext and ciphertext must be provided"}), 400
     
     if not method:
-        return jsonify({"error": "No decryption method specified"}), 400
+        return jsonify({"error": "No encryption method specified"}), 400
     
-    if not key and method != 'caesar':  # Caesar can use default shift
-        return jsonify({"error": "No decryption key provided"}), 400
+    if not key and method != 'caesar':
+        return jsonify({"error": "No encryption key provided"}), 400
     
     try:
-        result = {}
-        
-        # Classical ciphers
-        if method == 'caesar':
-            shift = int(key) if key else 3  # Default shift of 3
-            plaintext, steps = caesar_cipher(ciphertext, shift, encrypt=False)
-            result = {
-                "plaintext": plaintext,
-                "steps": steps
-            }
-        
-        elif method == 'substitution':
-            plaintext, steps = substitution_cipher(ciphertext, key, encrypt=False)
-            result = {
-                "plaintext": plaintext,
-                "steps": steps
-            }
-        
-        elif method == 'vigenere':
-            plaintext, steps = vigenere_cipher(ciphertext, key, encrypt=False)
-            result = {
-                "plaintext": plaintext,
-                "steps": steps
-            }
-        
-        # Modern ciphers
-        elif method == 'aes':
-            if not mode:
-                mode = 'cbc'  # Default to CBC mode if not specified
-
-            if mode in ['cbc', 'ctr'] and not iv:
-                return jsonify({"error": f"IV required for AES {mode.upper()} mode"}), 400
-
-            # Call the appropriate decryption function
-            plaintext, steps = aes_decryption(ciphertext, key, mode, iv)
-            result = {
-                "plaintext": plaintext,
-                "steps": steps
-            }
-        
-        elif method == '3des':
-            if not iv:
-                return jsonify({"error": "IV required for 3DES decryption"}), 400
-
-            plaintext, steps = des3_decryption(ciphertext, key, iv)
-            result = {
-                "plaintext": plaintext,
-                "steps": steps
-            }
-        
-        else:
-            return jsonify({"error": f"Unsupported decryption method: {method}"}), 400
+        admission = admit(method, len(plaintext) + len(ciphertext), 'none')
+        # Encrypt once with the supplied IV/nonce and compare in constant time
+        with metrics.time('cipher_duration_seconds', method=cipher_label(method), operation='validate'):
+            result = ciphertext_validator(method, key, mode)(
+                plaintext, ciphertext, data.get('iv'), data.get('tag'), data.get('aad', '')
+            )
+        admission.deadline.check()
         
         return jsonify(result)
     
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/validate', methods=['POST'])
-def validate():
+@api_bp.route('/validate/batch', methods=['POST'])
+def validate_batch():
     data = request.get_json()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
-    plaintext = data.get('plaintext', '')
-    ciphertext = data.get('ciphertext', '')
+    items = data.get('items')
     method = data.get('method', '').lower()
     key = data.get('key', '')
-    mode = data.get('mode', '')  # For AES: ECB, CBC, CTR
+    mode = data.get('mode', '')
+    include_expected = bool(data.get('include_expected', False))
+    max_items = current_app.config['VALIDATE_MAX_BATCH']
     
-    if not plaintext or not ciphertext:
-        return jsonify({"error": "Both plaintext and ciphertext must be provided"}), 400
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list of {plaintext, ciphertext, iv, tag, aad}"}), 400
+    
+    if len(items) > max_items:
+        return jsonify({"error": f"At most {max_items} items can be validated per request"}), 400
     
     if not method:
         return jsonify({"error": "No encryption method specified"}), 400
@@ -245,83 +330,275 @@ def validate():
         return jsonify({"error": "No encryption key provided"}), 400
     
     try:
-        # Encrypt the plaintext and check if it matches the provided ciphertext
-        if method == 'caesar':
-            shift = int(key) if key else 3
-            encrypted, _ = caesar_cipher(plaintext, shift, encrypt=True)
-        elif method == 'substitution':
-            encrypted, _ = substitution_cipher(plaintext, key, encrypt=True)
-        elif method == 'vigenere':
-            encrypted, _ = vigenere_cipher(plaintext, key, encrypt=True)
-        elif method == 'aes':
-            if not mode:
-                return jsonify({"error": "AES mode not specified (ECB, CBC, CTR)"}), 400
-            
-            # For simplicity, we're not checking the IV here
-            encrypted, _, _ = aes_encryption(plaintext, key, mode)
-        elif method == '3des':
-            encrypted, _, _ = des3_encryption(plaintext, key)
-        else:
-            return jsonify({"error": f"Unsupported encryption method: {method}"}), 400
-        
-        # Compare the encrypted result with the provided ciphertext
-        is_valid = encrypted == ciphertext
-        
-        return jsonify({
-            "valid": is_valid,
-            "expected": encrypted
-        })
+        # The whole batch is admitted at once, and the deadline is checked between items
+        size = sum(
+            len(item.get('plaintext') or '') + len(item.get('ciphertext') or '')
+            for item in items if isinstance(item, dict)
+        )
+        admission = admit(method, size, 'none')
+        # The key is derived once and shared by every item
+        validator = ciphertext_validator(method, key, mode)
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
     
+    results = []
+    with metrics.time('cipher_duration_seconds', method=cipher_label(method), operation='validate'):
+        for item in items:
+            try:
+                admission.deadline.check()
+            except AdmissionError as e:
+                return jsonify({"error": str(e)}), e.status
+            if not isinstance(item, dict) or not item.get('plaintext') or not item.get('ciphertext'):
+                results.append({"valid": False, "error": "Both plaintext and ciphertext must be provided"})
+                continue
+            try:
+                result = validator(
+                    item['plaintext'], item['ciphertext'], item.get('iv'), item.get('tag'), item.get('aad', '')
+                )
+            except (ValueError, TypeError, AttributeError) as e:
+                results.append({"valid": False, "error": str(e)})
+                continue
+            if not include_expected:
+                result = {"valid": result["valid"]}
+            results.append(result)
+    
+    valid_count = sum(1 for result in results if result["valid"])
+    return jsonify({
+        "results": results,
+        "valid_count": valid_count,
+        "all_valid": valid_count == len(results)
+    })
+
+@api_bp.route('/crack/caesar', methods=['POST'])
+def crack_caesar_route():
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    ciphertext = data.get('ciphertext', '')
+    top = data.get('top', 5)
+    include_plaintext = data.get('include_plaintext', True)
+
+    if not ciphertext:
+        return jsonify({"error": "No ciphertext provided"}), 400
+
+    try:
+        admission = admit('crack-caesar', len(ciphertext), 'none')
+        result = crack_caesar(ciphertext, top=int(top))
+        if include_plaintext:
+            result["plaintext"] = shift_text(ciphertext, -result["best_shift"])
+        admission.deadline.check()
+        return jsonify(result)
+
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/hash', methods=['POST'])
-def hash_message():
+@api_bp.route('/crack/vigenere', methods=['POST'])
+def crack_vigenere_route():
     data = request.get_json()
 
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    message = data.get('message', '')
-    algorithm = data.get('algorithm', 'sha256').lower()
+    ciphertext = data.get('ciphertext', '')
+    key_length = data.get('key_length')
+    include_plaintext = data.get('include_plaintext', False)
 
-    if not message:
-        return jsonify({"error": "No message provided"}), 400
+    if not ciphertext:
+        return jsonify({"error": "No ciphertext provided"}), 400
+
+    try:
+        max_key_length = int(data.get('max_key_length', 20))
+        key_length = int(key_length) if key_length not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_key_length and key_length must be integers"}), 400
+
+    if not 1 <= max_key_length <= 100:
+        return jsonify({"error": "max_key_length must be between 1 and 100"}), 400
+
+    if key_length is not None and key_length < 1:
+        return jsonify({"error": "key_length must be at least 1"}), 400
 
     try:
-        # Compute hash
-        result = compute_hash(message, algorithm)
+        admission = admit('crack-vigenere', len(ciphertext), 'none')
+        result = crack_vigenere(
+            ciphertext,
+            max_key_length=max_key_length,
+            key_length=key_length
+        )
+        if include_plaintext:
+            result["plaintext"] = vigenere_text(ciphertext, result["key"], encrypt=False)
+        admission.deadline.check()
         return jsonify(result)
 
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/mac', methods=['POST'])
-def mac_message():
+@api_bp.route('/crack/substitution', methods=['POST'])
+@jwt_required()  # Keeps worker processes busy for up to SOLVER_MAX_TIME_BUDGET seconds
+def crack_substitution_route():
     data = request.get_json()
 
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    message = data.get('message', '')
-    key = data.get('key', '')
-    algorithm = data.get('algorithm', 'sha256').lower()
+    ciphertext = data.get('ciphertext', '')
+    include_plaintext = data.get('include_plaintext', False)
 
-    if not message:
-        return jsonify({"error": "No message provided"}), 400
+    if not ciphertext:
+        return jsonify({"error": "No ciphertext provided"}), 400
 
-    if not key:
-        return jsonify({"error": "No key provided"}), 400
+    max_budget = current_app.config['SOLVER_MAX_TIME_BUDGET']
+    try:
+        time_budget = float(data.get('time_budget', current_app.config['SOLVER_DEFAULT_TIME_BUDGET']))
+    except (TypeError, ValueError):
+        time_budget = None
+    if time_budget is None or not 0 < time_budget <= max_budget:
+        return jsonify({"error": f"time_budget must be between 0 and {max_budget} seconds"}), 400
 
     try:
-        # Compute MAC
-        result = compute_mac(message, key, algorithm)
+        admit('crack-substitution', len(ciphertext), 'none')
+        with solver_slots.slot():
+            result = solve_substitution(
+                ciphertext,
+                time_budget=time_budget,
+                processes=current_app.config['SOLVER_PROCESSES']
+            )
+        if include_plaintext:
+            result["plaintext"] = apply_substitution(ciphertext, result["key"], encrypt=False)
         return jsonify(result)
 
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/validate-mac', methods=['POST'])
+def analysis_request(text_field):
+    """Read the text and options of an analysis request (JSON, or a text/plain body with query options)"""
+    if request.mimetype == 'text/plain':
+        return request.get_data(as_text=True), request.args
+    data = request.get_json(silent=True) or {}
+    return data.get(text_field, ''), data
+
+@api_bp.route('/analyze', methods=['POST'])
+def analyze():
+    text, options = analysis_request('text')
+
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+
+    try:
+        top = int(options.get('top', 20))
+        admission = admit('analyze', len(text), 'none')
+        digest = content_hash(text)
+        result = analysis_cache.get(digest, top)
+        cached = result is not None
+        if not cached:
+            result = analyze_text(text, top)
+            admission.deadline.check()
+            analysis_cache.put(digest, top, result)
+
+        return jsonify({**result, "content_hash": digest, "cached": cached})
+
+    except AdmissionError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/analyze/upload', methods=['POST'])
+@jwt_required()  # Uploads hold disk space until they finish or expire
+def analyze_upload():
+    chunk, options = analysis_request('chunk')
+    upload_id = options.get('upload_id') or None
+    final = str(options.get('final', False)).lower() in ('true', '1')
+
+    if not chunk and not (upload_id and final):
+        return jsonify({"error": "No chunk provided"}), 400
+
+    try:
+        top = int(options.get('top', 20))
+        owner = get_jwt_identity()
+        if chunk:
+            admit('analyze', len(chunk), 'none')
+            upload_id, counts = upload_sessions.add_chunk(upload_id, chunk, owner)
+
+        if not final:
+            return jsonify({
+                "upload_id": upload_id,
+                "characters_received": counts.characters,
+                "letters_received": counts.total_letters
+            })
+
+        counts, digest = upload_sessions.finish(upload_id, owner)
+        result = analysis_cache.get(digest, top)
+        cached = result is not None
+        if not cached:
+            result = counts.summary(top)
+            analysis_cache.put(digest, top, result)
+
+        return jsonify({**result, "content_hash": digest, "cached": cached, "upload_id": upload_id})
+
+    except KeyError:
+        return jsonify({"error": "Unknown or expired upload"}), 404
+    except (AdmissionError, UploadLimitError) as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/analyze/<digest>', methods=['GET'])
+def analyze_cached(digest):
+    top = request.args.get('top', 20, type=int)
+    result = analysis_cache.get(digest, top)
+
+    if result is None:
+        return jsonify({"error": "No cached analysis for this content hash"}), 404
+
+    return jsonify({**result, "content_hash": digest, "cached": True})
+
+@api_bp.route('/hash', methods=['POST'])
+def hash_message():
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    try:
+        return jsonify(hash_data(data))
+
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/mac', methods=['POST'])
+def mac_message():
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    try:
+        return jsonify(mac_data(data))
+
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api_bp.route('/validate-mac', methods=['POST'])
 def validate_message_mac():
     data = request.get_json()
 
@@ -344,19 +621,21 @@ def validate_message_mac():
 
     try:
         # Validate MAC
-        result = validate_mac(message, key, mac, algorithm)
+        with metrics.time('cipher_duration_seconds', method=cipher_label(algorithm), operation='validate-mac'):
+            result = validate_mac(message, key, mac, algorithm)
         return jsonify(result)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# Create database tables when the app starts
-with app.app_context():
-    try:
-        db.create_all()
-        print("Database tables created successfully")
-    except Exception as e:
-        print(f"Error creating database tables: {str(e)}")
-
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server; use gunicorn with wsgi.py in production
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    socketio = app.extensions.get('socketio')  # set up by init_realtime()
+    if socketio is not None:
+        # Serves the WebSocket channel as well as the HTTP routes
+        socketio.run(app, debug=app.config['DEBUG'])
+    else:
+        app.run(debug=app.config['DEBUG'])
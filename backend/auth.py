@@ -5,19 +5,26 @@ from flask_jwt_extended import (
 )
 from flask_mail import Message
 from models import db, User
+from otp_store import OTP_VALID, OTP_MISSING, OTP_EXPIRED, OTP_LOCKED
+from metrics import metrics
 from flask_bcrypt import Bcrypt
 import random
 import string
-from datetime import datetime, timedelta
+from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
 bcrypt = Bcrypt()
 mail = None  # Will be initialized in app.py
+otp_store = None  # Will be initialized in app.py
 
 def init_mail(mail_instance):
     global mail
     mail = mail_instance
 
+def init_otp_store(store):
+    global otp_store
+    otp_store = store
+
 def generate_otp(length=6):
     """Generate a random OTP of specified length"""
     return ''.join(random.choices(string.digits, k=length))
@@ -27,13 +34,13 @@ def send_otp_email(user, otp):
     if not mail:
         current_app.logger.error("Mail not initialized")
         if current_app.config['DEBUG']:
-            current_app.logger.info(f"[DEV MODE] Mail not initialized, but proceeding. OTP for {user.email}: {otp}")
+            current_app.logger.info("[DEV MODE] Mail not initialized, but proceeding. OTP for %s: %s", user.email, otp)
             return True
         return False
 
     # Always log the OTP in debug mode for testing purposes
     if current_app.config['DEBUG']:
-        current_app.logger.info(f"[DEV MODE] OTP for {user.email}: {otp}")
+        current_app.logger.info("[DEV MODE] OTP for %s: %s", user.email, otp)
         # In development mode, don't even try to send the email to avoid timeouts
         return True
 
@@ -50,10 +57,11 @@ def send_otp_email(user, otp):
             <p>If you did not request this code, please ignore this email.</p>
             """
         )
-        mail.send(msg)
+        with metrics.time('mail_send_duration_seconds'):
+            mail.send(msg)
         return True
     except Exception as e:
-        current_app.logger.error(f"Failed to send email: {str(e)}")
+        current_app.logger.error("Failed to send email to user %s: %s", user.id, e)
         return False
 
 @auth_bp.route('/register', methods=['POST'])
@@ -81,7 +89,8 @@ def register():
             return jsonify({"error": "Email already exists"}), 409
 
         # Hash password
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        with metrics.time('bcrypt_duration_seconds', operation='hash'):
+            hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
 
         # Create new user with hashed password
         user = User(username=username, email=email, password=hashed_password)
@@ -109,7 +118,7 @@ def register():
 
         return jsonify(result), 201
     except Exception as e:
-        current_app.logger.error(f"Registration error: {str(e)}")
+        current_app.logger.error("Registration error: %s", e, exc_info=True)
         db.session.rollback()
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
 
@@ -131,7 +140,13 @@ def login():
         (User.username == username_or_email) | (User.email == username_or_email)
     ).first()
     
-    if not user or not bcrypt.check_password_hash(user.hashed_password, password):
+    if not user:
+        return jsonify({"error": "Invalid credentials"}), 401
+
+    with metrics.time('bcrypt_duration_seconds', operation='check'):
+        password_ok = bcrypt.check_password_hash(user.hashed_password, password)
+
+    if not password_ok:
         return jsonify({"error": "Invalid credentials"}), 401
     
     # Check if MFA is enabled
@@ -148,21 +163,14 @@ def login():
             # For Email OTP, generate and send OTP
             otp = generate_otp()
 
-            # Store OTP directly in the user model
-            user.email_otp = otp
-            user.email_otp_expiry = datetime.utcnow() + timedelta(minutes=current_app.config['OTP_EXPIRY_MINUTES'])
-
-            db.session.commit()
+            # Store OTP in the OTP store rather than the users row
+            otp_store.issue(user.id, otp)
 
             # Send OTP email - in debug mode this will just log the OTP
             email_sent = send_otp_email(user, otp)
 
             # In development mode, always proceed
             if email_sent or current_app.config['DEBUG']:
-                # Always log the OTP in debug mode
-                if current_app.config['DEBUG']:
-                    current_app.logger.info(f"[DEBUG] Email OTP for {user.email}: {otp}")
-
                 return jsonify({
                     "message": "MFA required",
                     "mfa_method": "email",
@@ -177,9 +185,7 @@ def login():
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
 
-    # Log the tokens for debugging
-    current_app.logger.info(f"Generated access token for user {user.id}: {access_token[:10]}...")
-    current_app.logger.info(f"Generated refresh token for user {user.id}: {refresh_token[:10]}...")
+    current_app.logger.info("Issued tokens for user %s", user.id)
 
     return jsonify({
         "message": "Login successful",
@@ -214,10 +220,6 @@ def verify_totp():
     if user.totp_secret is None:
         return jsonify({"error": "TOTP not set up for this user"}), 400
 
-    # Log the verification attempt
-    current_app.logger.info(f"Verifying TOTP code for user {user.id}: {totp_code}")
-    current_app.logger.info(f"User TOTP secret: {user.totp_secret}")
-
     if user.verify_totp(totp_code):
         # If this is a login verification, generate tokens
         if request.args.get('login') == 'true' or data.get('login') == True:
@@ -260,21 +262,22 @@ def verify_email_otp():
     if not user.mfa_enabled or user.mfa_method != 'email':
         return jsonify({"error": "Email OTP MFA not enabled for this user"}), 400
     
-    # Check if OTP exists and is valid
-    if not user.email_otp:
+    # Look up and consume the OTP in one step
+    otp_status = otp_store.verify(user.id, otp)
+
+    if otp_status == OTP_MISSING:
         return jsonify({"error": "No OTP found for this user"}), 404
 
-    if not user.email_otp_expiry or datetime.utcnow() > user.email_otp_expiry:
+    if otp_status == OTP_EXPIRED:
         return jsonify({"error": "OTP has expired"}), 401
 
-    if user.email_otp != otp:
-        return jsonify({"error": "Invalid OTP"}), 401
+    if otp_status == OTP_LOCKED:
+        return jsonify({"error": "Too many invalid attempts, please log in again"}), 429
 
-    # OTP is valid, clear it and generate tokens
-    user.email_otp = None
-    user.email_otp_expiry = None
-    db.session.commit()
+    if otp_status != OTP_VALID:
+        return jsonify({"error": "Invalid OTP"}), 401
 
+    # OTP is valid, generate tokens
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
     
@@ -290,7 +293,7 @@ def verify_email_otp():
 def get_account():
     try:
         user_id = get_jwt_identity()
-        current_app.logger.info(f"Getting account for user_id: {user_id}")
+        current_app.logger.debug("Getting account for user %s", user_id)
 
         # Convert user_id to int if it's a string
         if isinstance(user_id, str) and user_id.isdigit():
@@ -299,7 +302,7 @@ def get_account():
         user = User.query.get(user_id)
 
         if not user:
-            current_app.logger.error(f"User not found for ID: {user_id}")
+            current_app.logger.warning("User not found for ID: %s", user_id)
             return jsonify({"error": "User not found"}), 404
 
         result = user.to_dict()
@@ -310,7 +313,7 @@ def get_account():
 
         return jsonify(result), 200
     except Exception as e:
-        current_app.logger.error(f"Error in get_account: {str(e)}")
+        current_app.logger.error("Error in get_account: %s", e, exc_info=True)
         return jsonify({"error": f"Failed to get account: {str(e)}"}), 500
 
 @auth_bp.route('/account/update', methods=['PUT'])
@@ -356,7 +359,8 @@ def update_account():
     
     # Update password if provided
     if 'password' in data and data['password']:
-        user.hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        with metrics.time('bcrypt_duration_seconds', operation='hash'):
+            user.hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
     
     # Update MFA settings if provided
     if 'mfa_enabled' in data:
@@ -367,14 +371,14 @@ def update_account():
             user.mfa_enabled = False
             user.mfa_method = 'none'
             user.totp_secret = None
-            current_app.logger.info(f"User {user.id} disabled MFA")
+            current_app.logger.info("User %s disabled MFA", user.id)
         else:
             # If enabling MFA, make sure a method is selected
             if user.mfa_method == 'none' and 'mfa_method' not in data:
                 # Default to email if no method is specified
                 user.mfa_method = 'email'
             user.mfa_enabled = True
-            current_app.logger.info(f"User {user.id} enabled MFA with method {user.mfa_method}")
+            current_app.logger.info("User %s enabled MFA with method %s", user.id, user.mfa_method)
 
     # Update MFA method if provided
     if 'mfa_method' in data and data['mfa_method'] in ['none', 'totp', 'email']:
@@ -384,13 +388,13 @@ def update_account():
         # If changing to a different method
         if old_method != new_method:
             user.mfa_method = new_method
-            current_app.logger.info(f"User {user.id} changed MFA method from {old_method} to {new_method}")
+            current_app.logger.info("User %s changed MFA method from %s to %s", user.id, old_method, new_method)
 
             # If enabling TOTP, generate a new secret
             if new_method == 'totp':
                 user.mfa_enabled = True
                 user.generate_totp_secret()
-                current_app.logger.info(f"Generated new TOTP secret for user {user.id}")
+                current_app.logger.info("Generated new TOTP secret for user %s", user.id)
 
             # If enabling email OTP
             elif new_method == 'email':
@@ -411,15 +415,13 @@ def update_account():
     if user.mfa_method == 'totp':
         # Always include the TOTP secret for manual entry
         result["totp_secret"] = user.totp_secret
-        current_app.logger.info(f"TOTP secret for user {user.id}: {user.totp_secret}")
 
         # Also include QR code if possible
         qr_code = user.generate_qr_code()
         if qr_code:
             result["qr_code"] = qr_code
-            current_app.logger.info(f"Generated QR code for user {user.id}, length: {len(qr_code)}")
         else:
-            current_app.logger.error(f"Failed to generate QR code for user {user.id}")
+            current_app.logger.error("Failed to generate QR code for user %s", user.id)
     
     return jsonify({
         "message": "Account updated successfully",
@@ -432,11 +434,7 @@ def refresh():
     try:
         # Get the JWT identity
         user_id = get_jwt_identity()
-        current_app.logger.info(f"Refreshing token for user_id: {user_id}")
-
-        # Get the authorization header
-        auth_header = request.headers.get('Authorization', '')
-        current_app.logger.info(f"Auth header: {auth_header}")
+        current_app.logger.debug("Refreshing token for user %s", user_id)
 
         # Convert user_id to int if it's a string
         if isinstance(user_id, str) and user_id.isdigit():
@@ -445,12 +443,12 @@ def refresh():
         # Find the user
         user = User.query.get(user_id)
         if not user:
-            current_app.logger.error(f"User not found for ID: {user_id} during token refresh")
+            current_app.logger.warning("User not found for ID: %s during token refresh", user_id)
             return jsonify({"error": "User not found"}), 404
 
         # Create a new access token
         access_token = create_access_token(identity=str(user_id))
-        current_app.logger.info(f"New access token created for user {user_id}")
+        current_app.logger.debug("New access token created for user %s", user_id)
 
         return jsonify({
             "message": "Token refreshed",
@@ -459,5 +457,5 @@ def refresh():
             "user": user.to_dict()
         }), 200
     except Exception as e:
-        current_app.logger.error(f"Error in refresh token: {str(e)}")
+        current_app.logger.error("Error in refresh token: %s", e, exc_info=True)
         return jsonify({"error": f"Failed to refresh token: {str(e)}"}), 500
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+AEAD throughput benchmark.
+
+Compares single-pass authenticated encryption (AES-256-GCM and
+ChaCha20-Poly1305) with the two-pass approach of encrypting with AES-256-CBC
+and then computing HMAC-SHA256 over the ciphertext, on the same inputs.
+
+Two levels are measured:
+
+- primitive: bytes in, bytes out, using the cryptography primitives directly
+- api: the ciphers.modern / ciphers.integrity functions the endpoints call
+  (without step traces), including UTF-8 and Base64 handling
+
+    python benchmarks/aead.py
+    python benchmarks/aead.py --sizes 1K 64K 1M 16M --json
+
+ChaCha20-Poly1305 is the better choice on CPUs without AES instructions; the
+report says whether this CPU advertises them.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import platform
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+from benchmarks.ciphers import format_size, make_text, parse_size, time_case
+from ciphers.integrity import compute_mac
+from ciphers.modern import aead_encryption, aead_decryption, aes_encryption, aes_decryption
+
+KEY = 'benchmark-key'
+
+
+def cpu_has_aes():
+    """Whether the CPU advertises AES instructions (None if unknown)."""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith(('flags', 'Features')):
+                    return 'aes' in line.split(':', 1)[1].split()
+    except OSError:
+        pass
+    return None
+
+
+def primitive_cases(data):
+    key = os.urandom(32)
+    mac_key = os.urandom(32)
+    nonce = os.urandom(12)
+    iv = os.urandom(16)
+    gcm = AESGCM(key)
+    chacha = ChaCha20Poly1305(key)
+
+    def cbc_hmac_encrypt():
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(data) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+        ciphertext = encryptor.update(padded) + encryptor.finalize()
+        return ciphertext, hmac.new(mac_key, iv + ciphertext, hashlib.sha256).digest()
+
+    def cbc_hmac_decrypt(sealed):
+        ciphertext, tag = sealed
+        if not hmac.compare_digest(hmac.new(mac_key, iv + ciphertext, hashlib.sha256).digest(), tag):
+            raise ValueError("bad MAC")
+        decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+        padded = decryptor.update(ciphertext) + decryptor.finalize()
+        unpadder = padding.PKCS7(128).unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+
+    gcm_sealed = gcm.encrypt(nonce, data, b'header')
+    chacha_sealed = chacha.encrypt(nonce, data, b'header')
+    cbc_sealed = cbc_hmac_encrypt()
+    return {
+        ('aes-256-gcm', 'encrypt'): lambda: gcm.encrypt(nonce, data, b'header'),
+        ('aes-256-gcm', 'decrypt'): lambda: gcm.decrypt(nonce, gcm_sealed, b'header'),
+        ('chacha20-poly1305', 'encrypt'): lambda: chacha.encrypt(nonce, data, b'header'),
+        ('chacha20-poly1305', 'decrypt'): lambda: chacha.decrypt(nonce, chacha_sealed, b'header'),
+        ('aes-256-cbc+hmac-sha256', 'encrypt'): cbc_hmac_encrypt,
+        ('aes-256-cbc+hmac-sha256', 'decrypt'): lambda: cbc_hmac_decrypt(cbc_sealed),
+    }
+
+
+def api_cases(text):
+    gcm = aead_encryption(text, KEY, 'aes-gcm', 'header', with_steps=False)
+    chacha = aead_encryption(text, KEY, 'chacha20-poly1305', 'header', with_steps=False)
+    cbc_ciphertext, cbc_iv, _ = aes_encryption(text, KEY, 'cbc', with_steps=False)
+    cbc_mac = compute_mac(cbc_ciphertext, KEY, 'sha256', with_steps=False)['hmac']
+
+    def cbc_hmac_encrypt():
+        ciphertext, iv, _ = aes_encryption(text, KEY, 'cbc', with_steps=False)
+        return compute_mac(ciphertext, KEY, 'sha256', with_steps=False)
+
+    def cbc_hmac_decrypt():
+        if not hmac.compare_digest(compute_mac(cbc_ciphertext, KEY, 'sha256', with_steps=False)['hmac'], cbc_mac):
+            raise ValueError("bad MAC")
+        return aes_decryption(cbc_ciphertext, KEY, 'cbc', cbc_iv, with_steps=False)
+
+    return {
+        ('aes-256-gcm', 'encrypt'): lambda: aead_encryption(text, KEY, 'aes-gcm', 'header', with_steps=False),
+        ('aes-256-gcm', 'decrypt'): lambda: aead_decryption(
+            gcm[0], KEY, 'aes-gcm', gcm[1], gcm[2], 'header', with_steps=False),
+        ('chacha20-poly1305', 'encrypt'): lambda: aead_encryption(
+            text, KEY, 'chacha20-poly1305', 'header', with_steps=False),
+        ('chacha20-poly1305', 'decrypt'): lambda: aead_decryption(
+            chacha[0], KEY, 'chacha20-poly1305', chacha[1], chacha[2], 'header', with_steps=False),
+        ('aes-256-cbc+hmac-sha256', 'encrypt'): cbc_hmac_encrypt,
+        ('aes-256-cbc+hmac-sha256', 'decrypt'): cbc_hmac_decrypt,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['64', '1K', '16K', '256K', '1M', '16M'])
+    parser.add_argument('--levels', nargs='+', choices=['primitive', 'api'], default=['primitive', 'api'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for size in sorted(parse_size(size) for size in args.sizes):
+        text = make_text(size)
+        for level in args.levels:
+            cases = primitive_cases(text.encode('utf-8')) if level == 'primitive' else api_cases(text)
+            baseline = {}
+            for (scheme, operation), run in cases.items():
+                timings = time_case(run, args.repeat, args.min_time)
+                best = min(timings)
+                results.append({
+                    "level": level,
+                    "scheme": scheme,
+                    "operation": operation,
+                    "size": size,
+                    "min_ms": round(best * 1000, 4),
+                    "mb_per_s": round(size / best / 1e6, 2)
+                })
+                if scheme == 'aes-256-cbc+hmac-sha256':
+                    baseline[operation] = best
+
+            for result in results:
+                if result["level"] == level and result["size"] == size:
+                    result["speedup_vs_cbc_hmac"] = round(baseline[result["operation"]] / (result["min_ms"] / 1000), 2)
+
+    info = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_aes_instructions": cpu_has_aes()
+    }
+
+    if args.json:
+        print(json.dumps({"metadata": info, "results": results}, indent=2))
+        return
+
+    print(f"{info['machine']}, AES instructions: {info['cpu_aes_instructions']}")
+    print(f"{'level':<10} {'size':>6} {'scheme':<25} {'op':<8} {'ms':>10} {'MB/s':>9} {'vs CBC+HMAC':>12}")
+    for r in results:
+        print(f"{r['level']:<10} {format_size(r['size']):>6} {r['scheme']:<25} {r['operation']:<8} "
+              f"{r['min_ms']:>10.4f} {r['mb_per_s']:>9.1f} {r['speedup_vs_cbc_hmac']:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Cipher benchmark suite.
+
+Times every cipher, hash and MAC in the ciphers package across input sizes
+from 16 bytes to 64 MB, both with the step-by-step trace and without it, and
+reports latency and throughput. Results are written as JSON so runs can be
+compared against a saved baseline to catch regressions.
+
+    python benchmarks/ciphers.py
+    python benchmarks/ciphers.py --cases caesar aes-cbc-encrypt --sizes 16 1K 1M
+    python benchmarks/ciphers.py --output baseline.json
+    python benchmarks/ciphers.py --compare baseline.json --threshold 0.15
+
+Steps are only built up to --max-steps-size because the per-character step
+dictionaries of the classical ciphers grow far larger than the input. A case
+stops at the first size whose single run takes longer than --case-timeout.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from ciphers.classical import caesar_cipher, substitution_cipher, vigenere_cipher
+from ciphers.integrity import compute_hash, compute_mac
+from ciphers.modern import (
+    aes_encryption, aes_decryption, des3_encryption, des3_decryption, aead_encryption, aead_decryption
+)
+
+DEFAULT_SIZES = ['16', '256', '4K', '64K', '1M', '16M', '64M']
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+SUBSTITUTION_KEY = 'QWERTYUIOPASDFGHJKLZXCVBNM'
+SAMPLE = "The quick brown fox jumps over the lazy dog. Pack my box with five dozen liquor jugs! 0123456789\n"
+
+
+def parse_size(value):
+    """Parse sizes such as 16, 4K or 64M (binary multiples)."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def format_size(size):
+    for unit, factor in (('M', 1024 ** 2), ('K', 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def make_text(size):
+    return (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+
+def _encrypted(encrypt, *args):
+    """Precompute ciphertext (and IV) so decryption cases time decryption only."""
+    result = encrypt(*args, with_steps=False)
+    return result[0], result[1]
+
+
+# Each case maps to a setup function: setup(text, with_steps) -> zero-argument callable
+CASES = {
+    'caesar-encrypt': lambda text, steps: lambda: caesar_cipher(text, 3, True, steps),
+    'caesar-decrypt': lambda text, steps: lambda: caesar_cipher(text, 3, False, steps),
+    'substitution-encrypt': lambda text, steps: lambda: substitution_cipher(text, SUBSTITUTION_KEY, True, steps),
+    'substitution-decrypt': lambda text, steps: lambda: substitution_cipher(text, SUBSTITUTION_KEY, False, steps),
+    'vigenere-encrypt': lambda text, steps: lambda: vigenere_cipher(text, 'LEMON', True, steps),
+    'vigenere-decrypt': lambda text, steps: lambda: vigenere_cipher(text, 'LEMON', False, steps),
+    # One worker process per CPU; texts under 1 MB (and steps) still run inline
+    'vigenere-encrypt-parallel': lambda text, steps: lambda: vigenere_cipher(text, 'LEMON', True, steps, None),
+}
+
+for _mode in ('ecb', 'cbc', 'ctr'):
+    CASES[f'aes-{_mode}-encrypt'] = (
+        lambda mode: lambda text, steps: lambda: aes_encryption(text, 'benchmark-key', mode, steps)
+    )(_mode)
+    CASES[f'aes-{_mode}-decrypt'] = (
+        lambda mode: lambda text, steps: (
+            lambda ciphertext, iv: lambda: aes_decryption(ciphertext, 'benchmark-key', mode, iv, steps)
+        )(*_encrypted(aes_encryption, text, 'benchmark-key', mode))
+    )(_mode)
+
+for _algorithm in ('aes-gcm', 'chacha20-poly1305'):
+    CASES[f'{_algorithm}-encrypt'] = (
+        lambda algorithm: lambda text, steps: lambda: aead_encryption(text, 'benchmark-key', algorithm, 'aad', steps)
+    )(_algorithm)
+    CASES[f'{_algorithm}-decrypt'] = (
+        lambda algorithm: lambda text, steps: (
+            lambda sealed: lambda: aead_decryption(
+                sealed[0], 'benchmark-key', algorithm, sealed[1], sealed[2], 'aad', steps)
+        )(aead_encryption(text, 'benchmark-key', algorithm, 'aad', with_steps=False))
+    )(_algorithm)
+
+CASES['3des-encrypt'] = lambda text, steps: lambda: des3_encryption(text, 'benchmark-key', steps)
+CASES['3des-decrypt'] = lambda text, steps: (
+    lambda ciphertext, iv: lambda: des3_decryption(ciphertext, 'benchmark-key', iv, steps)
+)(*_encrypted(des3_encryption, text, 'benchmark-key'))
+
+for _algorithm in ('md5', 'sha1', 'sha256', 'sha512'):
+    CASES[f'hash-{_algorithm}'] = (
+        lambda algorithm: lambda text, steps: lambda: compute_hash(text, algorithm, steps)
+    )(_algorithm)
+    CASES[f'mac-{_algorithm}'] = (
+        lambda algorithm: lambda text, steps: lambda: compute_mac(text, 'benchmark-key', algorithm, steps)
+    )(_algorithm)
+
+
+def time_case(run, repeat, min_time):
+    """
+    Time a callable.
+
+    Runs it once to warm up, then at least `repeat` times and until `min_time`
+    seconds have passed, so small inputs get enough samples to be stable.
+
+    Returns:
+        list: Durations of the timed runs in seconds
+    """
+    run()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or time.perf_counter() - started < min_time:
+        begin = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - begin)
+        if len(timings) >= 10000:
+            break
+    return timings
+
+
+def benchmark(cases, sizes, args):
+    results = []
+    for name in cases:
+        for with_steps in (False, True):
+            for size in sizes:
+                if with_steps and size > args.max_steps_size:
+                    break
+
+                text = make_text(size)
+                run = CASES[name](text, with_steps)
+                # Large inputs get a single timed run after warm-up
+                repeat = args.repeat if size < 1024 ** 2 else 1
+                timings = time_case(run, repeat, args.min_time if size < 1024 ** 2 else 0)
+
+                median = statistics.median(timings)
+                result = {
+                    "case": name,
+                    "steps": with_steps,
+                    "size": size,
+                    "runs": len(timings),
+                    "min_ms": round(min(timings) * 1000, 4),
+                    "median_ms": round(median * 1000, 4),
+                    "mean_ms": round(statistics.fmean(timings) * 1000, 4),
+                    "mb_per_s": round(size / median / 1e6, 3) if median else None
+                }
+                results.append(result)
+                print(f"{name:<26} {'steps' if with_steps else 'plain':<6} {format_size(size):>6} "
+                      f"{result['median_ms']:>12.3f} ms {result['mb_per_s'] or 0:>10.2f} MB/s "
+                      f"({result['runs']} runs)", flush=True)
+
+                if median > args.case_timeout:
+                    print(f"{'':<26} skipping larger sizes (over {args.case_timeout:g} s)", flush=True)
+                    break
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Compare median latencies against a baseline run.
+
+    Returns:
+        list: Results that got slower than the baseline by more than threshold
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["case"], r["steps"], r["size"]): r for r in baseline["results"]}
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} ({baseline['metadata'].get('git_commit') or 'unknown commit'}):")
+    for result in results:
+        old = previous.get((result["case"], result["steps"], result["size"]))
+        if old is None or not old["median_ms"]:
+            continue
+        change = result["median_ms"] / old["median_ms"] - 1
+        if change > threshold:
+            regressions.append(dict(result, baseline_median_ms=old["median_ms"], change=round(change, 4)))
+            print(f"  REGRESSION {result['case']:<26} {'steps' if result['steps'] else 'plain':<6} "
+                  f"{format_size(result['size']):>6} {old['median_ms']:.3f} -> {result['median_ms']:.3f} ms "
+                  f"({change:+.0%})")
+        elif change < -threshold:
+            print(f"  improved   {result['case']:<26} {'steps' if result['steps'] else 'plain':<6} "
+                  f"{format_size(result['size']):>6} {old['median_ms']:.3f} -> {result['median_ms']:.3f} ms "
+                  f"({change:+.0%})")
+    if not regressions:
+        print(f"  no regressions over {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES),
+                        metavar='CASE', help='Cases to run (default: all)')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help='Input sizes, e.g. 16 4K 1M')
+    parser.add_argument('--max-steps-size', type=parse_size, default=parse_size('1M'),
+                        help='Largest input to benchmark with step generation (default: 1M)')
+    parser.add_argument('--repeat', type=int, default=5, help='Minimum timed runs per measurement')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds spent per measurement')
+    parser.add_argument('--case-timeout', type=float, default=10.0,
+                        help='Skip larger sizes once a single run takes longer than this many seconds')
+    parser.add_argument('--output', help='Where to write the JSON results (default: benchmarks/results/)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown reported as a regression (default: 0.10)')
+    args = parser.parse_args()
+
+    sizes = sorted(parse_size(size) for size in args.sizes)
+
+    print(f"{'case':<26} {'mode':<6} {'size':>6} {'median':>15} {'throughput':>15}")
+    results = benchmark(args.cases, sizes, args)
+
+    report = {"metadata": metadata(), "results": results}
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"ciphers-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Connection pool load test.
+
+Runs concurrent user lookups against the database under several pool
+configurations and reports throughput, latency and pool checkout metrics.
+By default a temporary SQLite file stands in for PostgreSQL; pass
+--database-url to run against a local PostgreSQL instance.
+
+    python benchmarks/db_pool_load.py --threads 32 --requests 4000 --hold-ms 2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (pool size, max overflow) pairs to compare
+DEFAULT_CONFIGS = [(1, 0), (5, 0), (5, 10), (20, 20)]
+
+
+def run_config(database_url, pool_size, max_overflow, threads, requests, hold_ms):
+    os.environ['DB_POOL_SIZE'] = str(pool_size)
+    os.environ['DB_MAX_OVERFLOW'] = str(max_overflow)
+
+    from app import create_app
+    from config import Config
+    from db_pool import build_engine_options, pool_metrics
+    from models import db, User
+    from sqlalchemy import exc
+
+    class LoadTestConfig(Config):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(database_url)
+
+    app = create_app(LoadTestConfig)
+    with app.app_context():
+        db.create_all()
+        if not User.query.filter_by(username='loadtest').first():
+            db.session.add(User('loadtest', 'loadtest@example.com', 'x'))
+            db.session.commit()
+        user_id = User.query.filter_by(username='loadtest').first().id
+        # Start every configuration from a cold pool
+        db.engine.dispose()
+
+    pool_metrics.reset()
+    latencies = []
+    errors = []
+    latencies_lock = threading.Lock()
+    per_thread = requests // threads
+
+    def worker():
+        local = []
+        failed = 0
+        with app.app_context():
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                try:
+                    db.session.get(User, user_id)
+                    # Simulate network round trips / server work while holding the connection
+                    if hold_ms:
+                        time.sleep(hold_ms / 1000)
+                except exc.TimeoutError:
+                    failed += 1
+                finally:
+                    db.session.remove()
+                local.append(time.perf_counter() - started)
+        with latencies_lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        pool = db.engine.pool
+        metrics = pool_metrics.snapshot(pool)
+        db.engine.dispose()
+
+    latencies.sort()
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "latency_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        "latency_mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "checkout_wait_avg_ms": metrics["wait_avg_ms"],
+        "checkout_wait_max_ms": metrics["wait_max_ms"],
+        "pool_timeouts": metrics["timeouts"],
+        "failed_requests": sum(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='Database to test (default: temporary SQLite file)')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--hold-ms', type=float, default=2.0, help='Time each request holds its connection')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'pool_load.db')
+
+    results = [
+        run_config(database_url, size, overflow, args.threads, args.requests, args.hold_ms)
+        for size, overflow in DEFAULT_CONFIGS
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.threads} threads, {args.requests} requests, {args.hold_ms} ms hold, {database_url}")
+    print(f"{'size':>5} {'overflow':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'wait avg':>9} {'wait max':>9} {'timeouts':>8}")
+    for r in results:
+        print(f"{r['pool_size']:>5} {r['max_overflow']:>8} {r['throughput_rps']:>9} {r['latency_p50_ms']:>8} "
+              f"{r['latency_p99_ms']:>8} {r['checkout_wait_avg_ms']:>9} {r['checkout_wait_max_ms']:>9} {r['pool_timeouts']:>8}")
+
+
+if __name__ == '__main__':
+    main()
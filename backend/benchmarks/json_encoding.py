@@ -0,0 +1,77 @@
+"""
+JSON encoder benchmark for large API responses.
+
+Builds /encrypt and /hash response payloads of increasing size and times
+how long each JSON provider takes to turn them into a response body.
+
+    python benchmarks/json_encoding.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from ciphers.classical import caesar_cipher, vigenere_cipher
+from ciphers.integrity import compute_hash
+from ciphers.modern import aes_encryption
+from json_provider import PROVIDERS, orjson
+
+
+def build_payloads(size):
+    text = ("The quick brown fox jumps over the lazy dog. " * (size // 45 + 1))[:size]
+    ciphertext, steps = caesar_cipher(text, 3)
+    caesar = {"ciphertext": ciphertext, "steps": steps}
+    ciphertext, steps = vigenere_cipher(text, "LEMON")
+    vigenere = {"ciphertext": ciphertext, "steps": steps}
+    ciphertext, iv, steps = aes_encryption(text, "benchmark-key", "cbc")
+    aes = {"ciphertext": ciphertext, "iv": iv, "steps": steps}
+    return {
+        "caesar /encrypt": caesar,
+        "vigenere /encrypt": vigenere,
+        "aes-cbc /encrypt": aes,
+        "sha256 /hash": compute_hash(text, "sha256")
+    }
+
+
+def time_provider(provider, app, payload, repeat):
+    with app.app_context():
+        # Warm up once, then keep the fastest of `repeat` runs
+        body = provider.response(payload).get_data()
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            provider.response(payload)
+            best = min(best, time.perf_counter() - started)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    names = [name for name in PROVIDERS if name != 'orjson' or orjson is not None]
+    providers = {name: PROVIDERS[name](app) for name in names}
+
+    print(f"{'payload':<20} {'chars':>8} {'body KB':>9} " + " ".join(f"{name + ' ms':>11}" for name in names) + f" {'speedup':>8}")
+    for size in args.sizes:
+        for label, payload in build_payloads(size).items():
+            timings = {}
+            body_size = 0
+            for name, provider in providers.items():
+                timings[name], body_size = time_provider(provider, app, payload, args.repeat)
+            speedup = timings['stdlib'] / timings['orjson'] if 'orjson' in timings else 1.0
+            print(f"{label:<20} {size:>8} {body_size / 1024:>9.1f} "
+                  + " ".join(f"{timings[name] * 1000:>11.2f}" for name in names)
+                  + f" {speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
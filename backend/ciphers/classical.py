@@ -3,187 +3,503 @@ Implementation of classical ciphers:
 - Caesar Cipher
 - Substitution Cipher
 - Vigenère Cipher
+
+Each cipher is a class that does the key-dependent work (translation tables,
+shift vectors, key validation) once. compile_cipher() returns cached
+instances, so repeated requests with the same key reuse them, and the
+caesar_cipher/substitution_cipher/vigenere_cipher functions go through it.
+Keys longer than CACHED_KEY_MAX_LENGTH are compiled on every call instead,
+so large request-supplied keys can't pin memory in the cache.
+
+Caesar and Vigenère can also run on the shared process pool (pool.py) for
+multi-megabyte texts (processes > 1, without steps). The text is split into
+chunks; a Vigenère chunk starts at the key position given by the number of letters before it,
+which comes from a prefix sum of per-chunk letter counts. The output is
+identical to the serial functions. This mode is for library callers and
+benchmarks; routes and background jobs use apply_in_chunks(), which reports
+progress and can be cancelled, and jobs already run JOBS_PROCESSES at once.
+
+apply_in_chunks() runs a compiled cipher piece by piece in one process, so
+callers can report progress or stop between pieces, and can build steps for
+only the start of a long text.
 """
 
-def caesar_cipher(text, shift, encrypt=True):
+import math
+import string
+from functools import lru_cache
+
+import numpy as np
+
+from .pool import default_processes, get_executor
+
+UPPERCASE = string.ascii_uppercase
+LOWERCASE = string.ascii_lowercase
+
+# Compiled ciphers kept by compile_cipher (least recently used are evicted)
+COMPILED_CACHE_SIZE = 1024
+
+# Longer keys are not cached: a compiled Vigenère key costs about 17 bytes per key letter
+CACHED_KEY_MAX_LENGTH = 256
+
+# Below this length the per-call overhead of numpy outweighs the vectorized Vigenère
+VECTORIZE_MIN_LENGTH = 128
+
+# Texts shorter than this are not worth sending to worker processes
+PARALLEL_MIN_LENGTH = 1024 * 1024
+PARALLEL_MIN_CHUNK = 256 * 1024
+
+# Piece sizes for apply_in_chunks (building steps is about a thousand times slower per character)
+CHUNK_SIZE = 1024 * 1024
+STEPS_CHUNK_SIZE = 16 * 1024
+
+# Every byte that is not an ASCII letter, for counting letters with bytes.translate
+_NON_LETTER_BYTES = bytes(b for b in range(256) if not (65 <= (b & 0xDF) <= 90) or b > 127)
+
+
+def count_letters(text):
+    """Number of characters for which str.isalpha() is true (the ones that advance a Vigenère key)."""
+    if text.isascii():
+        return len(text.encode('ascii').translate(None, _NON_LETTER_BYTES))
+    return sum(map(str.isalpha, text))
+
+
+class CaesarCipher:
+    """Caesar cipher for one shift and direction."""
+
+    method = 'caesar'
+
+    def __init__(self, shift, encrypt=True):
+        self.shift = shift if encrypt else -shift  # For decryption, shift in the opposite direction
+        offset = self.shift % 26
+        self.table = str.maketrans(
+            UPPERCASE + LOWERCASE,
+            UPPERCASE[offset:] + UPPERCASE[:offset] + LOWERCASE[offset:] + LOWERCASE[:offset]
+        )
+
+    def apply(self, text, with_steps=True):
+        """
+        Encrypt or decrypt a text.
+
+        Args:
+            text (str): The text to transform
+            with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+
+        Returns:
+            tuple: (result_text, steps)
+        """
+        # Only ASCII letters can be translated by table; str.isalpha() also accepts other letters
+        if not with_steps and text.isascii():
+            return text.translate(self.table), []
+
+        shift = self.shift
+        result = []
+        steps = []
+
+        for i, char in enumerate(text):
+            # Only encrypt/decrypt letters
+            if char.isalpha():
+                # Determine the ASCII offset based on case
+                ascii_offset = ord('A') if char.isupper() else ord('a')
+
+                # Convert to 0-25 range, apply shift, and convert back to ASCII
+                shifted_value = (ord(char) - ascii_offset + shift) % 26 + ascii_offset
+                shifted_char = chr(shifted_value)
+                result.append(shifted_char)
+
+                if with_steps:
+                    steps.append({
+                        "position": i,
+                        "original_char": char,
+                        "shift_value": shift,
+                        "is_letter": True,
+                        "ascii_value": ord(char),
+                        "offset": ascii_offset,
+                        "position_in_alphabet": ord(char) - ascii_offset,
+                        "shifted_position": (ord(char) - ascii_offset + shift) % 26,
+                        "new_ascii_value": shifted_value,
+                        "result_char": shifted_char
+                    })
+            else:
+                result.append(char)
+
+                if with_steps:
+                    steps.append({
+                        "position": i,
+                        "original_char": char,
+                        "shift_value": shift,
+                        "is_letter": False,
+                        "result_char": char
+                    })
+
+        return ''.join(result), steps
+
+
+class SubstitutionCipher:
+    """Substitution cipher for one key and direction."""
+
+    method = 'substitution'
+
+    def __init__(self, key, encrypt=True):
+        # Validate the key
+        if len(set(key.lower())) != 26 or len(key) != 26:
+            raise ValueError("Key must contain all 26 letters exactly once")
+
+        # Create mapping dictionaries
+        if encrypt:
+            # For encryption: map from alphabet to key
+            self.upper_map = {chr(i + ord('A')): key[i].upper() for i in range(26)}
+            self.lower_map = {chr(i + ord('a')): key[i].lower() for i in range(26)}
+        else:
+            # For decryption: map from key to alphabet
+            self.upper_map = {key[i].upper(): chr(i + ord('A')) for i in range(26)}
+            self.lower_map = {key[i].lower(): chr(i + ord('a')) for i in range(26)}
+
+        # The same mapping as a translation table: only characters of the matching case are replaced
+        self.table = {ord(c): v for c, v in self.upper_map.items() if len(c) == 1 and c.isupper()}
+        self.table.update({ord(c): v for c, v in self.lower_map.items() if len(c) == 1 and c.islower()})
+
+    def apply(self, text, with_steps=True):
+        """
+        Encrypt or decrypt a text.
+
+        Args:
+            text (str): The text to transform
+            with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+
+        Returns:
+            tuple: (result_text, steps)
+        """
+        if not with_steps:
+            return text.translate(self.table), []
+
+        upper_map = self.upper_map
+        lower_map = self.lower_map
+        result = []
+        steps = []
+
+        for i, char in enumerate(text):
+            if char.isupper() and char in upper_map:
+                result_char = upper_map[char]
+                case = "upper"
+            elif char.islower() and char in lower_map:
+                result_char = lower_map[char]
+                case = "lower"
+            else:
+                result_char = char
+                case = None
+
+            result.append(result_char)
+
+            step_info = {
+                "position": i,
+                "original_char": char
+            }
+
+            if case:
+                step_info["is_letter"] = True
+                step_info["case"] = case
+                step_info["mapping"] = f"{char} → {result_char}"
+            else:
+                step_info["is_letter"] = False
+            step_info["result_char"] = result_char
+
+            steps.append(step_info)
+
+        return ''.join(result), steps
+
+
+class VigenereCipher:
+    """Vigenère cipher for one keyword and direction."""
+
+    method = 'vigenere'
+
+    def __init__(self, key, encrypt=True):
+        # Validate the key
+        if not key.isalpha():
+            raise ValueError("Key must contain only letters")
+
+        self.key = key.upper()
+        self.encrypt = encrypt
+        # Shift of each key letter (negative for decryption)
+        self.shifts = [(ord(c) - ord('A')) * (1 if encrypt else -1) for c in self.key]
+        self.shift_vector = np.array(self.shifts, dtype=np.int64)
+
+    def _apply_ascii(self, text, key_offset=0):
+        raw = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        folded = raw & 0xDF
+        letters = (folded >= 65) & (folded <= 90)
+
+        # The key only advances on letters
+        key_positions = np.cumsum(letters) - 1 + key_offset
+
+        out = raw.copy()
+        base = raw[letters] & 0x20 | 65  # 65 for upper case, 97 for lower case
+        shifts = self.shift_vector[key_positions[letters] % len(self.shift_vector)]
+        out[letters] = (folded[letters].astype(np.int64) - 65 + shifts) % 26 + base
+        return out.tobytes().decode('ascii')
+
+    def apply(self, text, with_steps=True, key_offset=0):
+        """
+        Encrypt or decrypt a text.
+
+        Args:
+            text (str): The text to transform
+            with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+            key_offset (int): Letters that came before the text (where in the key it starts)
+
+        Returns:
+            tuple: (result_text, steps)
+        """
+        if not with_steps and len(text) >= VECTORIZE_MIN_LENGTH and text.isascii():
+            return self._apply_ascii(text, key_offset), []
+
+        key = self.key
+        shifts = self.shifts
+        result = []
+        steps = []
+
+        # Keep track of the key index (only increment for letters in the text)
+        key_idx = key_offset
+
+        for i, char in enumerate(text):
+            if char.isalpha():
+                key_position = key_idx % len(key)
+                key_shift = shifts[key_position]
+
+                # Determine the ASCII offset based on case
+                ascii_offset = ord('A') if char.isupper() else ord('a')
+
+                # Convert to 0-25 range, apply shift, and convert back to ASCII
+                shifted_value = (ord(char) - ascii_offset + key_shift) % 26 + ascii_offset
+                shifted_char = chr(shifted_value)
+                result.append(shifted_char)
+
+                if with_steps:
+                    steps.append({
+                        "position": i,
+                        "original_char": char,
+                        "is_letter": True,
+                        "key_char": key[key_position],
+                        "key_position": key_position,
+                        "key_shift": key_shift,
+                        "ascii_value": ord(char),
+                        "offset": ascii_offset,
+                        "position_in_alphabet": ord(char) - ascii_offset,
+                        "shifted_position": (ord(char) - ascii_offset + key_shift) % 26,
+                        "new_ascii_value": shifted_value,
+                        "result_char": shifted_char
+                    })
+                key_idx += 1
+            else:
+                result.append(char)
+
+                if with_steps:
+                    steps.append({
+                        "position": i,
+                        "original_char": char,
+                        "is_letter": False,
+                        "result_char": char
+                    })
+
+        return ''.join(result), steps
+
+
+def _split(text, processes):
+    """Split a text into a few chunks per process."""
+    size = max(PARALLEL_MIN_CHUNK, math.ceil(len(text) / (processes * 4)))
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def _count_letters(chunk):
+    return sum(map(str.isalpha, chunk))
+
+
+def _caesar_chunk(shift, encrypt, chunk):
+    return compile_cipher('caesar', shift, encrypt).apply(chunk, with_steps=False)[0]
+
+
+def _vigenere_chunk(key, encrypt, chunk, key_offset):
+    return compile_cipher('vigenere', key, encrypt).apply(chunk, with_steps=False, key_offset=key_offset)[0]
+
+
+def _vigenere_offsets(text, chunks, key_length, executor):
+    """Key position at the start of each chunk: a prefix sum of the letters in earlier chunks."""
+    if text.isascii():
+        raw = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        folded = raw & 0xDF
+        letters = ((folded >= 65) & (folded <= 90)).astype(np.int64)
+        starts = np.cumsum([0] + [len(chunk) for chunk in chunks[:-1]])
+        counts = np.add.reduceat(letters, starts)
+    else:
+        # str.isalpha() also accepts non-ASCII letters, so count them in the workers
+        counts = np.fromiter(executor.map(_count_letters, chunks), dtype=np.int64, count=len(chunks))
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1])) % key_length
+    return offsets.tolist()
+
+
+def parallel_apply(method, key, text, encrypt=True, processes=None):
+    """
+    Apply a Caesar or Vigenère cipher to a large text on a process pool.
+
+    Args:
+        method (str): 'caesar' or 'vigenere'
+        key (int or str): The shift for Caesar, otherwise the keyword
+        text (str): The text to transform
+        encrypt (bool): True for encryption, False for decryption
+        processes (int, optional): Worker processes (defaults to default_processes())
+
+    Returns:
+        str: The same result as the serial cipher
+    """
+    cipher = compile_cipher(method, key, encrypt)  # validates the key before any work is sent out
+    if processes is None:
+        processes = default_processes()
+    # str.translate already runs at memory speed, faster than copying chunks to workers
+    if processes <= 1 or len(text) < PARALLEL_MIN_LENGTH or (method == 'caesar' and text.isascii()):
+        return cipher.apply(text, with_steps=False)[0]
+
+    executor = get_executor(processes)
+    chunks = _split(text, processes)
+    if method == 'caesar':
+        results = executor.map(_caesar_chunk, [key] * len(chunks), [encrypt] * len(chunks), chunks)
+    elif method == 'vigenere':
+        offsets = _vigenere_offsets(text, chunks, len(cipher.key), executor)
+        results = executor.map(_vigenere_chunk, [key] * len(chunks), [encrypt] * len(chunks), chunks, offsets)
+    else:
+        raise ValueError(f"Parallel mode is not available for {method}")
+    return ''.join(results)
+
+
+CLASSICAL_CIPHERS = {
+    'caesar': CaesarCipher,
+    'substitution': SubstitutionCipher,
+    'vigenere': VigenereCipher
+}
+
+
+def compile_cipher(method, key, encrypt=True):
+    """
+    Build (or fetch from the cache) a reusable cipher object.
+
+    Args:
+        method (str): 'caesar', 'substitution' or 'vigenere'
+        key (int or str): The shift for Caesar, otherwise the key
+        encrypt (bool): True for encryption, False for decryption
+
+    Returns:
+        CaesarCipher, SubstitutionCipher or VigenereCipher: Object whose
+        apply(text, with_steps=True) returns (result_text, steps)
+    """
+    if isinstance(key, str) and len(key) > CACHED_KEY_MAX_LENGTH:
+        return _compile(method, key, encrypt)
+    return _compile_cached(method, key, encrypt)
+
+
+def _compile(method, key, encrypt):
+    if method not in CLASSICAL_CIPHERS:
+        raise ValueError(f"Unsupported classical cipher: {method}")
+    return CLASSICAL_CIPHERS[method](key, encrypt)
+
+
+_compile_cached = lru_cache(maxsize=COMPILED_CACHE_SIZE)(_compile)
+
+
+def apply_in_chunks(cipher, text, steps_length=None, checkpoint=None):
+    """
+    Apply a compiled cipher to a text one piece at a time.
+
+    Args:
+        cipher: A cipher from compile_cipher()
+        text (str): The text to transform
+        steps_length (int, optional): Build steps for this many leading characters
+            (None for the whole text, 0 for none)
+        checkpoint (callable, optional): Called with the number of characters done after
+            each piece; it may raise to stop
+
+    Returns:
+        tuple: (result_text, steps), the same as cipher.apply() for the whole text
+        except that steps stop after steps_length characters
+    """
+    if steps_length is None:
+        steps_length = len(text)
+    parts = []
+    steps = []
+    letters = 0
+    start = 0
+    while start < len(text):
+        with_steps = start < steps_length
+        end = min(len(text), steps_length, start + STEPS_CHUNK_SIZE) if with_steps else min(len(text), start + CHUNK_SIZE)
+        piece = text[start:end]
+        if cipher.method == 'vigenere':
+            # The key only advances on letters, so each piece starts where the letters before it left off
+            part, piece_steps = cipher.apply(piece, with_steps, key_offset=letters)
+            letters += count_letters(piece)
+        else:
+            part, piece_steps = cipher.apply(piece, with_steps)
+        if start:
+            for step in piece_steps:
+                step["position"] += start
+        parts.append(part)
+        steps.extend(piece_steps)
+        start = end
+        if checkpoint is not None:
+            checkpoint(start)
+    return ''.join(parts), steps
+
+
+def caesar_cipher(text, shift, encrypt=True, with_steps=True, processes=1):
     """
     Implements the Caesar cipher.
-    
+
     Args:
         text (str): The text to encrypt or decrypt
         shift (int): The shift value (key)
         encrypt (bool): True for encryption, False for decryption
-    
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+        processes (int): Worker processes for large texts without steps (1 runs inline)
+
     Returns:
         tuple: (result_text, steps)
             - result_text (str): The encrypted or decrypted text
             - steps (list): List of dictionaries containing step-by-step information
     """
-    if not encrypt:
-        shift = -shift  # For decryption, shift in the opposite direction
-    
-    result = ""
-    steps = []
-    
-    for i, char in enumerate(text):
-        step_info = {
-            "position": i,
-            "original_char": char,
-            "shift_value": shift
-        }
-        
-        # Only encrypt/decrypt letters
-        if char.isalpha():
-            # Determine the ASCII offset based on case
-            ascii_offset = ord('A') if char.isupper() else ord('a')
-            
-            # Convert to 0-25 range, apply shift, and convert back to ASCII
-            shifted_value = (ord(char) - ascii_offset + shift) % 26 + ascii_offset
-            shifted_char = chr(shifted_value)
-            
-            step_info["is_letter"] = True
-            step_info["ascii_value"] = ord(char)
-            step_info["offset"] = ascii_offset
-            step_info["position_in_alphabet"] = ord(char) - ascii_offset
-            step_info["shifted_position"] = (ord(char) - ascii_offset + shift) % 26
-            step_info["new_ascii_value"] = shifted_value
-            step_info["result_char"] = shifted_char
-            
-            result += shifted_char
-        else:
-            step_info["is_letter"] = False
-            step_info["result_char"] = char
-            result += char
-        
-        steps.append(step_info)
-    
-    return result, steps
-
-def substitution_cipher(text, key, encrypt=True):
+    if processes != 1 and not with_steps:
+        return parallel_apply('caesar', shift, text, encrypt, processes), []
+    return compile_cipher('caesar', shift, encrypt).apply(text, with_steps)
+
+def substitution_cipher(text, key, encrypt=True, with_steps=True):
     """
     Implements the Substitution cipher.
-    
+
     Args:
         text (str): The text to encrypt or decrypt
         key (str): The substitution key (26 unique letters)
         encrypt (bool): True for encryption, False for decryption
-    
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+
     Returns:
         tuple: (result_text, steps)
             - result_text (str): The encrypted or decrypted text
             - steps (list): List of dictionaries containing step-by-step information
     """
-    # Validate the key
-    if len(set(key.lower())) != 26 or len(key) != 26:
-        raise ValueError("Key must contain all 26 letters exactly once")
-    
-    result = ""
-    steps = []
-    
-    # Create mapping dictionaries
-    if encrypt:
-        # For encryption: map from alphabet to key
-        upper_map = {chr(i + ord('A')): key[i].upper() for i in range(26)}
-        lower_map = {chr(i + ord('a')): key[i].lower() for i in range(26)}
-    else:
-        # For decryption: map from key to alphabet
-        upper_map = {key[i].upper(): chr(i + ord('A')) for i in range(26)}
-        lower_map = {key[i].lower(): chr(i + ord('a')) for i in range(26)}
-    
-    for i, char in enumerate(text):
-        step_info = {
-            "position": i,
-            "original_char": char
-        }
-        
-        if char.isupper() and char in upper_map:
-            result_char = upper_map[char]
-            step_info["is_letter"] = True
-            step_info["case"] = "upper"
-            step_info["mapping"] = f"{char} → {result_char}"
-            step_info["result_char"] = result_char
-            result += result_char
-        elif char.islower() and char in lower_map:
-            result_char = lower_map[char]
-            step_info["is_letter"] = True
-            step_info["case"] = "lower"
-            step_info["mapping"] = f"{char} → {result_char}"
-            step_info["result_char"] = result_char
-            result += result_char
-        else:
-            step_info["is_letter"] = False
-            step_info["result_char"] = char
-            result += char
-        
-        steps.append(step_info)
-    
-    return result, steps
-
-def vigenere_cipher(text, key, encrypt=True):
+    return compile_cipher('substitution', key, encrypt).apply(text, with_steps)
+
+def vigenere_cipher(text, key, encrypt=True, with_steps=True, processes=1):
     """
     Implements the Vigenère cipher.
-    
+
     Args:
         text (str): The text to encrypt or decrypt
         key (str): The keyword
         encrypt (bool): True for encryption, False for decryption
-    
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+        processes (int): Worker processes for large texts without steps (1 runs inline)
+
     Returns:
         tuple: (result_text, steps)
             - result_text (str): The encrypted or decrypted text
             - steps (list): List of dictionaries containing step-by-step information
     """
-    # Validate the key
-    if not key.isalpha():
-        raise ValueError("Key must contain only letters")
-    
-    key = key.upper()
-    result = ""
-    steps = []
-    
-    # Keep track of the key index (only increment for letters in the text)
-    key_idx = 0
-    
-    for i, char in enumerate(text):
-        step_info = {
-            "position": i,
-            "original_char": char
-        }
-        
-        if char.isalpha():
-            # Get the corresponding key character
-            key_char = key[key_idx % len(key)]
-            key_shift = ord(key_char) - ord('A')
-            
-            # Apply the shift (positive for encryption, negative for decryption)
-            if not encrypt:
-                key_shift = -key_shift
-            
-            # Determine the ASCII offset based on case
-            ascii_offset = ord('A') if char.isupper() else ord('a')
-            
-            # Convert to 0-25 range, apply shift, and convert back to ASCII
-            shifted_value = (ord(char) - ascii_offset + key_shift) % 26 + ascii_offset
-            shifted_char = chr(shifted_value)
-            
-            step_info["is_letter"] = True
-            step_info["key_char"] = key_char
-            step_info["key_position"] = key_idx % len(key)
-            step_info["key_shift"] = key_shift
-            step_info["ascii_value"] = ord(char)
-            step_info["offset"] = ascii_offset
-            step_info["position_in_alphabet"] = ord(char) - ascii_offset
-            step_info["shifted_position"] = (ord(char) - ascii_offset + key_shift) % 26
-            step_info["new_ascii_value"] = shifted_value
-            step_info["result_char"] = shifted_char
-            
-            result += shifted_char
-            key_idx += 1
-        else:
-            step_info["is_letter"] = False
-            step_info["result_char"] = char
-            result += char
-        
-        steps.append(step_info)
-    
-    return result, steps
\ No newline at end of file
+    if processes != 1 and not with_steps:
+        return parallel_apply('vigenere', key, text, encrypt, processes), []
+    return compile_cipher('vigenere', key, encrypt).apply(text, with_steps)
@@ -0,0 +1,340 @@
+"""
+Seekable encrypted container format.
+
+A container holds a byte stream as fixed-size chunks. Each chunk is sealed
+independently with AES-256-GCM or ChaCha20-Poly1305, so a byte range can be
+decrypted by reading only the chunks that cover it, and chunks can be
+encrypted or decrypted in parallel.
+
+Layout (integers are big-endian):
+
+    header    32 bytes: magic "CLXC", version, algorithm id, chunk size, salt
+    chunks    one record per chunk: ciphertext followed by its 16-byte tag
+    index     per chunk: record offset (u64) and plaintext length (u32),
+              then a 16-byte tag over the header, index and trailer
+    trailer   24 bytes: plaintext size, index offset, chunk count, magic "CLXE"
+
+Each container has a random salt. The container key is derived from the key
+and the salt with HKDF-SHA256, so the chunk number can be used as the chunk's
+nonce. The index is sealed under the reserved all-ones nonce. The associated
+data of a chunk is the header, the chunk number and a last-chunk flag.
+Reordering chunks, moving them between containers or cutting chunks off the
+end therefore fails authentication.
+"""
+
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from .modern import AEAD_ALGORITHMS, AEAD_TAG_SIZE, derive_key
+
+MAGIC = b'CLXC'
+TRAILER_MAGIC = b'CLXE'
+VERSION = 1
+
+HEADER = struct.Struct('>4sBBxxI16s4x')  # magic, version, algorithm, chunk size, salt
+INDEX_ENTRY = struct.Struct('>QI')  # record offset, plaintext length
+TRAILER = struct.Struct('>QQI4s')  # plaintext size, index offset, chunk count, magic
+CHUNK_AAD = struct.Struct('>I?')  # chunk number, last chunk
+
+ALGORITHM_IDS = {'aes-gcm': 1, 'chacha20-poly1305': 2}
+ALGORITHM_NAMES = {number: name for name, number in ALGORITHM_IDS.items()}
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MIN_CHUNK_SIZE = 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_CHUNKS = 2 ** 32 - 1
+
+SALT_SIZE = 16
+INDEX_NONCE = b'\xff' * 12
+HKDF_INFO = b'cipherlab container v1'
+
+
+class ContainerError(ValueError):
+    """Raised for data that is not a well-formed container."""
+
+
+def _container_cipher(key, salt, algorithm):
+    """AEAD instance keyed for one container (key may be a passphrase or raw bytes)."""
+    key_bytes = key if isinstance(key, bytes) else derive_key(key, 32)
+    container_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=HKDF_INFO).derive(key_bytes)
+    return AEAD_ALGORITHMS[algorithm][0](container_key)
+
+
+def _nonce(number):
+    return number.to_bytes(12, 'big')
+
+
+def _read_exactly(source, size):
+    """Read size bytes, or fewer only at end of stream (streams may return short reads)."""
+    data = source.read(size)
+    if not data or len(data) == size:
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        part = source.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+def _ordered_map(executor, function, items, window):
+    """Like map(), but runs up to `window` calls ahead on an executor while keeping order."""
+    if executor is None:
+        for item in items:
+            yield function(*item)
+        return
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def encrypt_stream(source, destination, key, algorithm='aes-gcm', chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Encrypt a binary stream into a container.
+
+    Args:
+        source: Readable binary file object with the plaintext
+        destination: Writable binary file object for the container
+        key (str or bytes): Passphrase, or 32 bytes of key material
+        algorithm (str): 'aes-gcm' or 'chacha20-poly1305'
+        chunk_size (int): Plaintext bytes per chunk
+        workers (int): Threads sealing chunks in parallel
+
+    Returns:
+        dict: Container metadata (see ContainerLayout.describe)
+    """
+    if algorithm not in ALGORITHM_IDS:
+        raise ValueError(f"Unsupported container algorithm: {algorithm}")
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+
+    salt = os.urandom(SALT_SIZE)
+    header = HEADER.pack(MAGIC, VERSION, ALGORITHM_IDS[algorithm], chunk_size, salt)
+    aead = _container_cipher(key, salt, algorithm)
+
+    def seal(number, chunk, last):
+        return aead.encrypt(_nonce(number), chunk, header + CHUNK_AAD.pack(number, last))
+
+    def chunks():
+        # Read one chunk ahead so the last chunk is known when it is sealed
+        number = 0
+        chunk = _read_exactly(source, chunk_size)
+        while chunk:
+            following = _read_exactly(source, chunk_size)
+            if number >= MAX_CHUNKS:
+                raise ContainerError("Input has too many chunks for this chunk size")
+            yield number, chunk, not following
+            number += 1
+            chunk = following
+
+    destination.write(header)
+    offset = HEADER.size
+    plaintext_size = 0
+    index = []
+    executor = ThreadPoolExecutor(workers) if workers > 1 else None
+    try:
+        for record in _ordered_map(executor, seal, chunks(), workers * 2):
+            destination.write(record)
+            length = len(record) - AEAD_TAG_SIZE
+            index.append(INDEX_ENTRY.pack(offset, length))
+            offset += len(record)
+            plaintext_size += length
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    index_bytes = b''.join(index)
+    trailer = TRAILER.pack(plaintext_size, offset, len(index), TRAILER_MAGIC)
+    destination.write(index_bytes)
+    destination.write(aead.encrypt(INDEX_NONCE, b'', header + index_bytes + trailer))
+    destination.write(trailer)
+
+    layout = ContainerLayout(header, trailer, index_bytes)
+    return layout.describe()
+
+
+class ContainerLayout:
+    """
+    Parsed header, index and trailer of a container.
+
+    Nothing is authenticated at this point; ContainerReader checks the index
+    tag with the key. Useful for clients that fetch chunk records themselves.
+    """
+
+    def __init__(self, header, trailer, index_bytes, index_tag=b''):
+        magic, version, algorithm_id, self.chunk_size, self.salt = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ContainerError("Not an encrypted container")
+        if version != VERSION:
+            raise ContainerError(f"Unsupported container version: {version}")
+        if algorithm_id not in ALGORITHM_NAMES:
+            raise ContainerError(f"Unknown container algorithm: {algorithm_id}")
+        if not MIN_CHUNK_SIZE <= self.chunk_size <= MAX_CHUNK_SIZE:
+            raise ContainerError("Invalid chunk size")
+
+        self.plaintext_size, self.index_offset, self.chunk_count, magic = TRAILER.unpack(trailer)
+        if magic != TRAILER_MAGIC:
+            raise ContainerError("Container trailer is missing or damaged")
+
+        self.header = header
+        self.trailer = trailer
+        self.index_bytes = index_bytes
+        self.index_tag = index_tag
+        self.algorithm = ALGORITHM_NAMES[algorithm_id]
+        self.chunks = list(INDEX_ENTRY.iter_unpack(index_bytes))
+
+        # Every chunk but the last is full, which is what makes offsets computable
+        expected = divmod(self.plaintext_size, self.chunk_size)
+        if len(self.chunks) != self.chunk_count or self.chunk_count != expected[0] + bool(expected[1]):
+            raise ContainerError("Container index does not match its size")
+        if any(length != self.chunk_size for _, length in self.chunks[:-1]):
+            raise ContainerError("Container index has a short chunk before the last one")
+
+    @classmethod
+    def read(cls, fileobj):
+        """Read the layout from a seekable binary file object."""
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        if size < HEADER.size + AEAD_TAG_SIZE + TRAILER.size:
+            raise ContainerError("Container is truncated")
+
+        fileobj.seek(0)
+        header = fileobj.read(HEADER.size)
+        fileobj.seek(size - TRAILER.size)
+        trailer = fileobj.read(TRAILER.size)
+        _, index_offset, chunk_count, _ = TRAILER.unpack(trailer)
+
+        index_size = chunk_count * INDEX_ENTRY.size
+        if index_offset + index_size + AEAD_TAG_SIZE + TRAILER.size != size:
+            raise ContainerError("Container is truncated or has trailing data")
+        fileobj.seek(index_offset)
+        index_bytes = fileobj.read(index_size)
+        index_tag = fileobj.read(AEAD_TAG_SIZE)
+        return cls(header, trailer, index_bytes, index_tag)
+
+    def chunks_for_range(self, start, stop):
+        """Numbers of the chunks covering plaintext bytes [start, stop)."""
+        if start >= stop:
+            return range(0)
+        return range(start // self.chunk_size, (stop - 1) // self.chunk_size + 1)
+
+    def describe(self, with_index=False):
+        description = {
+            "format": f"CLXC v{VERSION}",
+            "algorithm": self.algorithm,
+            "chunk_size": self.chunk_size,
+            "chunk_count": self.chunk_count,
+            "plaintext_size": self.plaintext_size,
+            "header_size": HEADER.size,
+            "tag_size": AEAD_TAG_SIZE,
+            "index_offset": self.index_offset,
+            "container_size": self.index_offset + len(self.index_bytes) + AEAD_TAG_SIZE + TRAILER.size
+        }
+        if with_index:
+            description["chunks"] = [
+                {"offset": offset, "length": length + AEAD_TAG_SIZE, "plaintext_offset": number * self.chunk_size}
+                for number, (offset, length) in enumerate(self.chunks)
+            ]
+        return description
+
+
+class ContainerReader:
+    """
+    Random-access decryption of a container in a seekable binary file object.
+
+    Opening checks the index tag, so a wrong key or a modified index raises
+    cryptography.exceptions.InvalidTag before any plaintext is returned. A
+    modified chunk raises InvalidTag when that chunk is read.
+    """
+
+    def __init__(self, fileobj, key, workers=1):
+        """
+        Args:
+            fileobj: Seekable binary file object holding the container
+            key (str or bytes): Passphrase, or 32 bytes of key material
+            workers (int): Threads decrypting chunks in parallel
+        """
+        self.fileobj = fileobj
+        self.workers = workers
+        self.layout = ContainerLayout.read(fileobj)
+        self._aead = _container_cipher(key, self.layout.salt, self.layout.algorithm)
+        self._aead.decrypt(
+            INDEX_NONCE, self.layout.index_tag,
+            self.layout.header + self.layout.index_bytes + self.layout.trailer
+        )
+
+    @property
+    def size(self):
+        return self.layout.plaintext_size
+
+    def _open(self, number, record):
+        layout = self.layout
+        if len(record) != layout.chunks[number][1] + AEAD_TAG_SIZE:
+            raise ContainerError(f"Chunk {number} is truncated")
+        last = number == layout.chunk_count - 1
+        return self._aead.decrypt(_nonce(number), record, layout.header + CHUNK_AAD.pack(number, last))
+
+    def _records(self, numbers):
+        # Records are read sequentially here; only decryption runs on the workers
+        for number in numbers:
+            offset, length = self.layout.chunks[number]
+            self.fileobj.seek(offset)
+            yield number, self.fileobj.read(length + AEAD_TAG_SIZE)
+
+    def read_chunk(self, number):
+        """Decrypt a single chunk."""
+        if not 0 <= number < self.layout.chunk_count:
+            raise IndexError(f"Chunk {number} out of range")
+        return self._open(*next(self._records([number])))
+
+    def iter_range(self, start=0, stop=None):
+        """
+        Decrypt plaintext bytes [start, stop), touching only the chunks that cover them.
+
+        Yields:
+            bytes: Consecutive pieces of the requested range (one per chunk)
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        start = max(start, 0)
+        numbers = self.layout.chunks_for_range(start, stop)
+        chunk_size = self.layout.chunk_size
+
+        executor = ThreadPoolExecutor(self.workers) if self.workers > 1 and len(numbers) > 1 else None
+        try:
+            pieces = _ordered_map(executor, self._open, self._records(numbers), self.workers * 2)
+            for number, plaintext in zip(numbers, pieces):
+                chunk_start = number * chunk_size
+                yield plaintext[max(start - chunk_start, 0):stop - chunk_start]
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def read(self, start=0, stop=None):
+        """Decrypt plaintext bytes [start, stop) into one bytes object."""
+        return b''.join(self.iter_range(start, stop))
+
+
+def decrypt_stream(source, destination, key, start=0, stop=None, workers=1):
+    """
+    Decrypt a container, or a byte range of it, into a binary stream.
+
+    Returns:
+        int: Number of plaintext bytes written
+    """
+    written = 0
+    for piece in ContainerReader(source, key, workers).iter_range(start, stop):
+        destination.write(piece)
+        written += len(piece)
+    return written
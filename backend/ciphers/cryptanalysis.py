@@ -0,0 +1,313 @@
+"""
+Cryptanalysis of classical ciphers:
+- Caesar cipher (chi-squared scoring of all 26 shifts)
+- Vigenère cipher (index of coincidence + Kasiski key length, per-column chi-squared)
+
+Texts are converted once into NumPy arrays of letter indices (0-25, ASCII
+letters only, case folded) so scoring cost depends on the alphabet size
+rather than the text length.
+"""
+
+import numpy as np
+
+from .classical import compile_cipher
+
+# Relative frequencies of letters in English text (A-Z)
+ENGLISH_FREQUENCIES = np.array([
+    0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015,
+    0.06094, 0.06966, 0.00153, 0.00772, 0.04025, 0.02406, 0.06749,
+    0.07507, 0.01929, 0.00095, 0.05987, 0.06327, 0.09056, 0.02758,
+    0.00978, 0.02360, 0.00150, 0.01974, 0.00074
+])
+
+# SHIFT_INDEX[s, p] = (p + s) % 26
+SHIFT_INDEX = (np.arange(26)[None, :] + np.arange(26)[:, None]) % 26
+
+# Index of coincidence of English text and of uniformly random letters
+ENGLISH_IOC = 0.0667
+RANDOM_IOC = 1 / 26
+
+# Marker for alphabetic characters outside A-Z (they advance the Vigenère key but aren't scored)
+OTHER_LETTER = 26
+
+# The Kasiski check replaces the IoC choice of key length with one of its
+# divisors when at least KASISKI_MIN_REPEATS repeated trigrams were found, the
+# IoC choice explains fewer than KASISKI_DIVISOR_RATIO of the repeats the
+# divisor explains, and the divisor's IoC gets at least KASISKI_IOC_FLOOR of the
+# way from random to the best IoC. (On short texts, multiples of the key length
+# often win on IoC alone.)
+KASISKI_MIN_REPEATS = 3
+KASISKI_DIVISOR_RATIO = 0.7
+KASISKI_IOC_FLOOR = 0.5
+
+UPPERCASE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+LOWERCASE = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def letter_indices(text):
+    """
+    Extract the letters of a text as alphabet indices.
+
+    Args:
+        text (str): Any text; only ASCII letters are kept
+
+    Returns:
+        numpy.ndarray: uint8 array of values 0-25, one per letter, in order
+    """
+    # ASCII letters are single bytes in UTF-8 and never collide with multi-byte sequences
+    raw = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    folded = raw & 0xDF  # clear the lowercase bit
+    mask = (folded >= 65) & (folded <= 90)
+    return folded[mask] - 65
+
+
+def letter_counts(indices):
+    """Count occurrences of each letter (A-Z) in an array of letter indices."""
+    return np.bincount(indices, minlength=26)[:26]
+
+
+def text_letter_counts(text):
+    """Count occurrences of each letter (A-Z, case folded) directly from a text."""
+    raw = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    # Counting all byte values avoids building a filtered copy of the text
+    return np.bincount(raw & 0xDF, minlength=256)[65:91]
+
+
+def chi_squared_shifts(counts):
+    """
+    Score every Caesar shift of a letter-count vector against English.
+
+    Args:
+        counts (numpy.ndarray): Ciphertext letter counts (length 26)
+
+    Returns:
+        numpy.ndarray: chi_squared[s] for decrypting with shift s (lower is better)
+    """
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(26)
+    expected = ENGLISH_FREQUENCIES * total
+    # Plaintext letter p under shift s came from ciphertext letter (p + s) % 26
+    observed = counts[SHIFT_INDEX]
+    return (((observed - expected) ** 2) / expected).sum(axis=1)
+
+
+def shift_text(text, shift):
+    """Apply a Caesar shift to the ASCII letters of a text without building steps."""
+    shift %= 26
+    table = str.maketrans(
+        UPPERCASE + LOWERCASE,
+        UPPERCASE[shift:] + UPPERCASE[:shift] + LOWERCASE[shift:] + LOWERCASE[:shift]
+    )
+    return text.translate(table)
+
+
+def crack_caesar(ciphertext, top=5, preview_length=80):
+    """
+    Break a Caesar cipher by ranking all 26 shifts with chi-squared statistics.
+
+    Args:
+        ciphertext (str): The encrypted text
+        top (int): Number of ranked candidates to return
+        preview_length (int): Characters of decrypted text to include per candidate
+
+    Returns:
+        dict: Best shift, ranked candidates and the letter count analysed
+    """
+    counts = text_letter_counts(ciphertext)
+    scores = chi_squared_shifts(counts)
+    ranking = np.argsort(scores, kind='stable')[:max(1, min(top, 26))]
+
+    preview_source = ciphertext[:preview_length]
+    candidates = [{
+        "shift": int(shift),
+        "chi_squared": round(float(scores[shift]), 4),
+        "preview": shift_text(preview_source, -int(shift))
+    } for shift in ranking]
+
+    return {
+        "best_shift": candidates[0]["shift"],
+        "letter_count": int(counts.sum()),
+        "letter_counts": counts.tolist(),
+        "candidates": candidates
+    }
+
+
+def key_stream_indices(text):
+    """
+    Extract every character that advances the Vigenère key.
+
+    vigenere_cipher only moves to the next key letter on characters where
+    str.isalpha() is true, so non-ASCII letters are kept too (as OTHER_LETTER)
+    to keep the key alignment identical.
+
+    Args:
+        text (str): The text to analyse
+
+    Returns:
+        numpy.ndarray: uint8 array of 0-25 for A-Z/a-z and OTHER_LETTER otherwise
+    """
+    if text.isascii():
+        return letter_indices(text)
+
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    folded = np.where(codepoints < 128, codepoints & 0xDF, codepoints)
+    ascii_letters = (folded >= 65) & (folded <= 90)
+    non_ascii = np.unique(codepoints[codepoints >= 128])
+    other_alpha = non_ascii[[chr(c).isalpha() for c in non_ascii]] if len(non_ascii) else non_ascii
+    other_letters = np.isin(codepoints, other_alpha)
+
+    keep = ascii_letters | other_letters
+    return np.where(ascii_letters[keep], folded[keep] - 65, OTHER_LETTER).astype(np.uint8)
+
+
+def column_counts(stream, key_length):
+    """
+    Letter counts of each key column.
+
+    Returns:
+        numpy.ndarray: (key_length, 26) array; row j counts letters at key position j
+    """
+    columns = np.arange(len(stream)) % key_length
+    combined = columns * 27 + stream
+    counts = np.bincount(combined, minlength=key_length * 27).reshape(key_length, 27)
+    return counts[:, :26]
+
+
+def index_of_coincidence(counts):
+    """Index of coincidence of each row of a count matrix (or of a single count vector)."""
+    counts = np.atleast_2d(counts).astype(np.float64)
+    totals = counts.sum(axis=1)
+    pairs = (counts * (counts - 1)).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ioc = np.where(totals > 1, pairs / (totals * (totals - 1)), 0.0)
+    return ioc
+
+
+def kasiski_spacings(stream, n=3):
+    """
+    Distances between consecutive repeats of each n-gram.
+
+    N-grams are encoded as integers and indexed by sorting, which groups the
+    positions of every repeated n-gram together.
+
+    Returns:
+        numpy.ndarray: Spacing between each pair of neighbouring occurrences
+    """
+    if len(stream) < n * 2:
+        return np.empty(0, dtype=np.int64)
+
+    codes = np.zeros(len(stream) - n + 1, dtype=np.int64)
+    for i in range(n):
+        codes = codes * 27 + stream[i:len(stream) - n + 1 + i]
+
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    repeated = sorted_codes[1:] == sorted_codes[:-1]
+    return (order[1:] - order[:-1])[repeated]
+
+
+def estimate_vigenere_key_length(stream, max_key_length=20, sample_size=200000):
+    """
+    Estimate the Vigenère key length.
+
+    Args:
+        stream (numpy.ndarray): Output of key_stream_indices
+        max_key_length (int): Longest key length to consider
+        sample_size (int): Letters used for estimation (long texts are sampled from the start)
+
+    Returns:
+        dict: Chosen key length, whether the Kasiski check changed it ("kasiski_divisor"),
+        plus IoC and Kasiski scores per candidate length
+    """
+    sample = stream[:sample_size]
+    max_key_length = max(1, min(max_key_length, len(sample) // 2 or 1))
+    lengths = np.arange(1, max_key_length + 1)
+
+    ioc = np.array([index_of_coincidence(column_counts(sample, length)).mean() for length in lengths])
+
+    spacings = kasiski_spacings(sample)
+    if len(spacings):
+        kasiski = (spacings[None, :] % lengths[:, None] == 0).mean(axis=1)
+    else:
+        kasiski = np.zeros(len(lengths))
+
+    # Multiples of the true length score as well as the length itself, so take
+    # the shortest length that gets most of the way to the best IoC
+    threshold = RANDOM_IOC + 0.75 * (ioc.max() - RANDOM_IOC)
+    passing = lengths[ioc >= threshold]
+    key_length = int(passing[0]) if len(passing) else int(lengths[ioc.argmax()])
+
+    # Repeats spaced by a divisor but not by the IoC choice point at the divisor
+    kasiski_divisor = False
+    if len(spacings) >= KASISKI_MIN_REPEATS:
+        floor = RANDOM_IOC + KASISKI_IOC_FLOOR * (ioc.max() - RANDOM_IOC)
+        for divisor in range(2, key_length):
+            if (key_length % divisor == 0 and ioc[divisor - 1] >= floor
+                    and kasiski[key_length - 1] < KASISKI_DIVISOR_RATIO * kasiski[divisor - 1]):
+                key_length, kasiski_divisor = divisor, True
+                break
+
+    return {
+        "key_length": key_length,
+        "kasiski_divisor": kasiski_divisor,
+        "ioc": {int(length): round(float(value), 5) for length, value in zip(lengths, ioc)},
+        "kasiski": {int(length): round(float(value), 4) for length, value in zip(lengths, kasiski)},
+        "repeated_trigrams": int(len(spacings))
+    }
+
+
+def recover_vigenere_key(stream, key_length):
+    """Recover the key letter of each column by chi-squared frequency scoring."""
+    counts = column_counts(stream, key_length)
+    total = counts.sum(axis=1, keepdims=True)
+    expected = ENGLISH_FREQUENCIES[None, :] * np.maximum(total, 1)
+    observed = counts[:, SHIFT_INDEX]  # (column, shift, plaintext letter)
+    scores = (((observed - expected[:, None, :]) ** 2) / expected[:, None, :]).sum(axis=2)
+    return ''.join(UPPERCASE[shift] for shift in scores.argmin(axis=1))
+
+
+def vigenere_text(text, key, encrypt=True):
+    """
+    Apply a Vigenère key to a whole text without building steps.
+
+    Produces the same output as vigenere_cipher; ASCII texts take a vectorized path.
+    """
+    return compile_cipher('vigenere', key, encrypt).apply(text, with_steps=False)[0]
+
+
+def crack_vigenere(ciphertext, max_key_length=20, key_length=None, preview_length=80):
+    """
+    Break a Vigenère cipher.
+
+    Args:
+        ciphertext (str): The encrypted text
+        max_key_length (int): Longest key length to consider when estimating
+        key_length (int, optional): Skip estimation and use this key length
+        preview_length (int): Characters of decrypted text to include
+
+    Returns:
+        dict: Recovered key, key length analysis (None when key_length was given) and a
+        plaintext preview
+    """
+    if key_length is not None and key_length < 1:
+        raise ValueError("key_length must be at least 1")
+
+    stream = key_stream_indices(ciphertext)
+    if len(stream) == 0:
+        raise ValueError("Ciphertext contains no letters")
+
+    analysis = None
+    if key_length is None:
+        analysis = estimate_vigenere_key_length(stream, max_key_length)
+        key_length = analysis["key_length"]
+
+    key = recover_vigenere_key(stream, key_length)
+
+    return {
+        "key": key,
+        "key_length": key_length,
+        "letter_count": int(len(stream)),
+        "key_length_analysis": analysis,
+        "preview": vigenere_text(ciphertext[:preview_length], key, encrypt=False)
+    }
@@ -0,0 +1,254 @@
+"""
+Frequency analysis and n-gram statistics.
+
+NgramCounts accumulates unigram to quadgram counts over a text that may
+arrive in chunks. Each chunk is converted once to letter indices and every
+n-gram order is counted with np.bincount on integer-encoded n-grams. The last
+and first few letters of each partial count are kept so n-grams that span
+chunk boundaries are counted exactly, both when chunks are fed in order
+(update) and when independently counted parts are combined (merge).
+
+Unigrams and bigrams are counted in dense tables. Trigrams and quadgrams
+(17,576 and 456,976 possible codes) are kept sparse, as the sorted codes that
+occur and their counts, so a partial count takes memory in proportion to
+the text it has seen. save() and load() store a partial count in a .npz file.
+"""
+
+import numpy as np
+
+from .cryptanalysis import ENGLISH_FREQUENCIES, UPPERCASE, letter_indices
+
+MAX_ORDER = 4
+
+# Orders above this are counted sparsely
+DENSE_MAX_ORDER = 2
+
+
+class SparseCounts:
+    """Counts of n-gram codes, as sorted distinct codes and the count of each."""
+
+    def __init__(self, codes=None, values=None):
+        self.codes = np.empty(0, dtype=np.int64) if codes is None else codes
+        self.values = np.empty(0, dtype=np.int64) if values is None else values
+
+    def add(self, codes):
+        """Count each code in an array of occurrences."""
+        new_codes, new_values = np.unique(codes, return_counts=True)
+        self._combine(new_codes, new_values.astype(np.int64))
+
+    def _combine(self, codes, values):
+        # Both sides hold distinct codes, so each lands on its own slot of the union
+        union = np.union1d(self.codes, codes)
+        combined = np.zeros(len(union), dtype=np.int64)
+        combined[np.searchsorted(union, self.codes)] += self.values
+        combined[np.searchsorted(union, codes)] += values
+        self.codes, self.values = union, combined
+
+    def __add__(self, other):
+        result = SparseCounts(self.codes, self.values)
+        result._combine(other.codes, other.values)
+        return result
+
+    def sum(self):
+        return self.values.sum()
+
+
+class NgramCounts:
+    """Unigram to quadgram letter counts for a text, built incrementally."""
+
+    def __init__(self, max_order=MAX_ORDER):
+        self.max_order = max_order
+        self.counts = [_empty_table(n) for n in range(1, max_order + 1)]
+        self.head = np.empty(0, dtype=np.int64)  # first max_order - 1 letters
+        self.tail = np.empty(0, dtype=np.int64)  # last max_order - 1 letters
+        self.characters = 0
+
+    @property
+    def total_letters(self):
+        return int(self.counts[0].sum())
+
+    def update(self, text):
+        """Add the next chunk of the text."""
+        self.characters += len(text)
+        self._add_letters(letter_indices(text).astype(np.int64))
+        return self
+
+    def _add_letters(self, letters):
+        keep = self.max_order - 1
+        if len(self.head) < keep:
+            self.head = np.concatenate([self.head, letters[:keep - len(self.head)]])
+
+        stream = np.concatenate([self.tail, letters])
+        carried = len(self.tail)
+        for n in range(1, self.max_order + 1):
+            # Only count n-grams ending in the new letters; the rest were counted already
+            start = max(0, carried - n + 1)
+            if len(stream) - start < n:
+                continue
+            codes = np.zeros(len(stream) - start - n + 1, dtype=np.int64)
+            for i in range(n):
+                codes = codes * 26 + stream[start + i:len(stream) - n + 1 + i]
+            _count(self.counts, n, codes)
+
+        self.tail = stream[-keep:] if keep else stream[:0]
+
+    def merge(self, other):
+        """
+        Combine with the counts of the text that directly follows this one.
+
+        Returns:
+            NgramCounts: A new object with the counts of both texts
+        """
+        if other.max_order != self.max_order:
+            raise ValueError("Cannot merge counts of different n-gram orders")
+
+        merged = NgramCounts(self.max_order)
+        merged.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        merged.characters = self.characters + other.characters
+
+        keep = self.max_order - 1
+        boundary = np.concatenate([self.tail, other.head])
+        carried = len(self.tail)
+        # Count n-grams that start in this text and end in the other one
+        for n in range(2, self.max_order + 1):
+            codes = []
+            for start in range(max(0, carried - n + 1), carried):
+                if start + n <= len(boundary):
+                    code = 0
+                    for value in boundary[start:start + n]:
+                        code = code * 26 + int(value)
+                    codes.append(code)
+            if codes:
+                _count(merged.counts, n, np.array(codes, dtype=np.int64))
+
+        merged.head = np.concatenate([self.head, other.head])[:keep]
+        merged.tail = np.concatenate([self.tail, other.tail])[-keep:] if keep else boundary[:0]
+        return merged
+
+    def summary(self, top=20):
+        """
+        Summarize the counts.
+
+        Args:
+            top (int): Number of most frequent bigrams, trigrams and quadgrams to list
+
+        Returns:
+            dict: Letter frequencies, top n-grams, index of coincidence and entropy
+        """
+        unigrams = self.counts[0]
+        total = int(unigrams.sum())
+        frequencies = unigrams / total if total else np.zeros(26)
+
+        result = {
+            "characters": self.characters,
+            "total_letters": total,
+            "letter_counts": {UPPERCASE[i]: int(count) for i, count in enumerate(unigrams)},
+            "letter_frequencies": {UPPERCASE[i]: round(float(freq), 6) for i, freq in enumerate(frequencies)},
+            "index_of_coincidence": round(float(index_of_coincidence(unigrams)), 6),
+            "entropy_bits": round(float(entropy(unigrams)), 6),
+            "chi_squared_english": round(float(chi_squared_english(unigrams)), 4),
+            "ngram_entropy_bits": {
+                n: round(float(entropy(_values(self.counts[n - 1]))), 6) for n in range(1, self.max_order + 1)
+            }
+        }
+
+        names = {2: "bigrams", 3: "trigrams", 4: "quadgrams"}
+        for n in range(2, self.max_order + 1):
+            result[f"top_{names.get(n, f'{n}-grams')}"] = top_ngrams(self.counts[n - 1], n, top)
+
+        return result
+
+    def save(self, file):
+        """Write the partial counts to a .npz file (a path or a binary file object)."""
+        arrays = {"head": self.head, "tail": self.tail, "sizes": np.array([self.max_order, self.characters])}
+        for n, table in enumerate(self.counts, start=1):
+            if isinstance(table, SparseCounts):
+                arrays[f"codes{n}"], arrays[f"counts{n}"] = table.codes, table.values
+            else:
+                arrays[f"counts{n}"] = table
+        np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        """Read partial counts written by save()."""
+        with np.load(file) as arrays:
+            max_order, characters = (int(value) for value in arrays["sizes"])
+            counts = cls(max_order)
+            counts.characters = characters
+            counts.head, counts.tail = arrays["head"], arrays["tail"]
+            for n in range(1, max_order + 1):
+                if n > DENSE_MAX_ORDER:
+                    counts.counts[n - 1] = SparseCounts(arrays[f"codes{n}"], arrays[f"counts{n}"])
+                else:
+                    counts.counts[n - 1] = arrays[f"counts{n}"]
+        return counts
+
+
+def _empty_table(n):
+    return np.zeros(26 ** n, dtype=np.int64) if n <= DENSE_MAX_ORDER else SparseCounts()
+
+
+def _count(tables, n, codes):
+    """Add occurrences of n-gram codes to the table for order n."""
+    if n <= DENSE_MAX_ORDER:
+        tables[n - 1] += np.bincount(codes, minlength=26 ** n)
+    else:
+        tables[n - 1].add(codes)
+
+
+def _values(table):
+    return table.values if isinstance(table, SparseCounts) else table
+
+
+def index_of_coincidence(counts):
+    """Probability that two letters drawn without replacement are the same."""
+    total = counts.sum()
+    if total < 2:
+        return 0.0
+    return (counts * (counts - 1)).sum() / (total * (total - 1))
+
+
+def entropy(counts):
+    """Shannon entropy (bits per symbol) of a count vector."""
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    p = counts[counts > 0] / total
+    return -(p * np.log2(p)).sum()
+
+
+def chi_squared_english(counts):
+    """Chi-squared statistic of letter counts against English letter frequencies."""
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    expected = ENGLISH_FREQUENCIES * total
+    return (((counts - expected) ** 2) / expected).sum()
+
+
+def decode_ngram(code, n):
+    letters = []
+    for _ in range(n):
+        code, value = divmod(code, 26)
+        letters.append(UPPERCASE[value])
+    return ''.join(reversed(letters))
+
+
+def top_ngrams(counts, n, top):
+    """Most frequent n-grams (from a dense table or SparseCounts) as a list of {ngram, count} dictionaries."""
+    if isinstance(counts, SparseCounts):
+        codes, counts = counts.codes, counts.values
+    else:
+        codes = np.arange(len(counts))
+    top = min(top, int(np.count_nonzero(counts)))
+    if top <= 0:
+        return []
+    candidates = np.argpartition(counts, -top)[-top:]
+    # Ties go to the lower code, as codes are sorted
+    ranked = candidates[np.lexsort((codes[candidates], -counts[candidates]))]
+    return [{"ngram": decode_ngram(int(codes[i]), n), "count": int(counts[i])} for i in ranked]
+
+
+def analyze_text(text, top=20):
+    """Compute frequency statistics for a complete text."""
+    return NgramCounts().update(text).summary(top)
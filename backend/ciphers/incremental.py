@@ -0,0 +1,292 @@
+"""
+Incremental re-encryption for live-typing visualizations.
+
+An encoder holds one document. After the first full encryption, each edit
+(offset, deleted length, inserted text) re-encrypts only the part of the
+output the edit can change, and returns it as a splice:
+
+- Caesar and substitution work character by character, so only the inserted
+  text is encrypted.
+- Vigenère encrypts the inserted text starting at the key position given by
+  the letters before the edit. If the edit changes the letter count by
+  something other than a multiple of the key length, every later letter
+  moves to a different key letter, so the rest of the text is re-encrypted
+  from the edit onward. The prefix is never re-encrypted.
+- ECB re-encrypts the blocks the edit touches. If the length change isn't a
+  whole number of blocks, every later block shifts, so the blocks from the
+  edit to the end are re-encrypted.
+- CTR re-encrypts only the edited bytes when the length is unchanged, and
+  otherwise the bytes from the edit to the end. The counter starts at the
+  edit's block, so the prefix is not touched.
+- CBC (AES-CBC and 3DES) chains every block to the previous one, so the
+  blocks from the first changed block to the end are re-encrypted.
+
+Offsets and lengths of the edit are in characters (Python string indices).
+Classical splices are in characters and steps. Block cipher splices are in
+ciphertext bytes, and the new bytes are Base64.
+
+An encoder's state() is plain JSON data, and encoder_from_state() rebuilds
+the encoder from it, so a document can be kept outside the process between
+edits (see edit_sessions.py).
+
+Every version of a document is encrypted under the same IV, so the output
+matches a one-shot encryption with that IV. That is fine for watching a
+cipher work, but it is exactly the IV reuse that real systems must avoid.
+Authenticated modes (GCM, ChaCha20-Poly1305) refuse to do it and are not
+supported.
+"""
+
+import base64
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from .classical import compile_cipher, count_letters
+from .modern import aes_encryption, des3_encryption, derive_key
+
+
+def _check_edit(length, offset, delete):
+    if not isinstance(offset, int) or not isinstance(delete, int):
+        raise ValueError("offset and delete must be integers")
+    if not 0 <= offset <= length:
+        raise ValueError(f"offset must be between 0 and {length}")
+    if not 0 <= delete <= length - offset:
+        raise ValueError(f"delete must be between 0 and {length - offset}")
+
+
+class IncrementalClassical:
+    """Incremental Caesar, substitution or Vigenère encryption of one document."""
+
+    def __init__(self, method, key):
+        self.key = key  # As given, for state()
+        if method == 'caesar':
+            key = int(key) if key else 3  # Default shift of 3
+        self.method = method
+        self.cipher = compile_cipher(method, key, encrypt=True)
+        # Splices rely on one output character per input character
+        if method == 'substitution' and any(len(v) != 1 for v in self.cipher.table.values()):
+            raise ValueError("Incremental encryption needs a key whose letters map to single characters")
+        self.text = ''
+
+    def start(self, plaintext, with_steps=True):
+        ciphertext, steps = self.cipher.apply(plaintext, with_steps)
+        self.text = plaintext
+        return {"ciphertext": ciphertext, "steps": steps}
+
+    def state(self):
+        return {"method": self.method, "key": self.key, "text": self.text}
+
+    def restore(self, state):
+        self.text = state["text"]
+
+    def edit(self, offset, delete, insert, with_steps=True):
+        """
+        Apply an edit and re-encrypt the part of the output it changes.
+
+        Returns:
+            dict: The splice to apply to the previous output (ciphertext characters and steps
+            line up one to one with plaintext characters):
+                - offset, delete: where the replaced ciphertext starts and how long it was
+                - ciphertext: the replacement ciphertext
+                - steps: steps for the replacement (positions in the new text); the old steps
+                  for the replaced characters are dropped
+                - position_shift: how far the positions of the steps after the splice move
+                - length: the new plaintext length
+        """
+        old = self.text
+        _check_edit(len(old), offset, delete)
+        new = old[:offset] + insert + old[offset + delete:]
+
+        end = offset + len(insert)
+        replaced = delete
+        key_offset = 0
+        if self.method == 'vigenere':
+            key_offset = count_letters(old[:offset])
+            moved = count_letters(insert) - count_letters(old[offset:offset + delete])
+            if moved % len(self.cipher.key):
+                # Every later letter now lines up with a different key letter
+                end, replaced = len(new), len(old) - offset
+            ciphertext, steps = self.cipher.apply(new[offset:end], with_steps, key_offset=key_offset)
+        else:
+            ciphertext, steps = self.cipher.apply(insert, with_steps)
+
+        for step in steps:
+            step["position"] += offset
+
+        self.text = new
+        return {
+            "offset": offset,
+            "delete": replaced,
+            "ciphertext": ciphertext,
+            "steps": steps,
+            "position_shift": len(insert) - delete,
+            "length": len(new)
+        }
+
+
+class IncrementalBlockCipher:
+    """Incremental AES (ECB, CBC, CTR) or 3DES (CBC) encryption of one document."""
+
+    def __init__(self, method, key, mode):
+        if method == 'aes':
+            mode = (mode or 'cbc').lower()
+            if mode not in ('ecb', 'cbc', 'ctr'):
+                raise ValueError(f"Incremental encryption is not available for AES {mode.upper()}")
+            self.algorithm = algorithms.AES
+            self.key_bytes = derive_key(key, 32)
+        else:
+            mode = 'cbc'
+            self.algorithm = algorithms.TripleDES
+            self.key_bytes = derive_key(key, 24)
+        self.method = method
+        self.key = key
+        self.mode = mode
+        self.block_size = self.algorithm.block_size // 8
+        self.iv = None
+        self.text = ''
+        self.data = b''  # UTF-8 plaintext
+        self.ciphertext = bytearray()
+
+    def start(self, plaintext, with_steps=True):
+        if self.method == 'aes':
+            ciphertext_b64, iv_b64, steps = aes_encryption(plaintext, self.key, self.mode, with_steps)
+        else:
+            ciphertext_b64, iv_b64, steps = des3_encryption(plaintext, self.key, with_steps)
+        self.iv = base64.b64decode(iv_b64) if iv_b64 else None
+        self.text = plaintext
+        self.data = plaintext.encode('utf-8')
+        self.ciphertext = bytearray(base64.b64decode(ciphertext_b64))
+        return {"ciphertext": ciphertext_b64, "iv": iv_b64, "steps": steps}
+
+    def _pad(self, data):
+        padder = padding.PKCS7(self.algorithm.block_size).padder()
+        return padder.update(data) + padder.finalize()
+
+    def _encrypt_blocks(self, data, first_block):
+        """Encrypt data that starts at block `first_block` of the stream."""
+        bs = self.block_size
+        if self.mode == 'ecb':
+            mode = modes.ECB()
+        elif self.mode == 'ctr':
+            counter = (int.from_bytes(self.iv, 'big') + first_block) % (1 << (8 * bs))
+            mode = modes.CTR(counter.to_bytes(bs, 'big'))
+        else:
+            previous = self.ciphertext[(first_block - 1) * bs:first_block * bs] if first_block else self.iv
+            mode = modes.CBC(bytes(previous))
+        encryptor = Cipher(self.algorithm(self.key_bytes), mode).encryptor()
+        return encryptor.update(data) + encryptor.finalize()
+
+    def edit(self, offset, delete, insert, with_steps=True):
+        """
+        Apply an edit and re-encrypt only the blocks (or bytes, for CTR) it changes.
+
+        Returns:
+            dict: The splice to apply to the previous ciphertext bytes:
+                - offset, delete: where the replaced bytes start and how many there were
+                - ciphertext: Base64 of the replacement bytes
+                - steps: one step describing the re-encrypted region
+                - ciphertext_length: the new ciphertext length in bytes
+                - length: the new plaintext length in characters
+        """
+        old_text = self.text
+        _check_edit(len(old_text), offset, delete)
+        byte_offset = len(old_text[:offset].encode('utf-8'))
+        inserted = insert.encode('utf-8')
+        deleted = len(old_text[offset:offset + delete].encode('utf-8'))
+        data = self.data[:byte_offset] + inserted + self.data[byte_offset + deleted:]
+        moved = len(inserted) - deleted
+
+        bs = self.block_size
+        first_block = byte_offset // bs
+        start = first_block * bs
+
+        if self.mode == 'ctr':
+            stream = data
+            if moved == 0:
+                # Same length: only the edited bytes change
+                end, old_end = byte_offset + len(inserted), byte_offset + len(inserted)
+            else:
+                end, old_end = len(data), len(self.ciphertext)
+            region = self._encrypt_blocks(stream[start:end], first_block)[byte_offset - start:]
+            splice_start = byte_offset
+        else:
+            stream = self._pad(data)
+            if self.mode == 'ecb' and moved % bs == 0:
+                # Later blocks only move by whole blocks; their ciphertext is unchanged
+                end = -(-(byte_offset + len(inserted)) // bs) * bs
+                old_end = -(-(byte_offset + deleted) // bs) * bs
+                if end > len(stream) or old_end > len(self.ciphertext):
+                    end, old_end = len(stream), len(self.ciphertext)
+            else:
+                end, old_end = len(stream), len(self.ciphertext)
+            region = self._encrypt_blocks(stream[start:end], first_block)
+            splice_start = start
+
+        self.ciphertext[splice_start:old_end] = region
+        self.data = data
+        self.text = old_text[:offset] + insert + old_text[offset + delete:]
+
+        steps = []
+        if with_steps:
+            steps.append({
+                "step": "Incremental Encryption",
+                "mode": self.mode.upper(),
+                "block_size_bytes": bs,
+                "first_block": first_block,
+                "blocks_encrypted": -(-(end - start) // bs),
+                "total_blocks": -(-len(self.ciphertext) // bs),
+                "input_hex": stream[splice_start:end].hex(),
+                "output_hex": region.hex()
+            })
+
+        return {
+            "offset": splice_start,
+            "delete": old_end - splice_start,
+            "ciphertext": base64.b64encode(region).decode('utf-8'),
+            "steps": steps,
+            "ciphertext_length": len(self.ciphertext),
+            "length": len(self.text)
+        }
+
+    def full_ciphertext(self):
+        return base64.b64encode(bytes(self.ciphertext)).decode('utf-8')
+
+    def state(self):
+        return {
+            "method": self.method, "key": self.key, "mode": self.mode, "text": self.text,
+            "iv": base64.b64encode(self.iv).decode('utf-8') if self.iv else None,
+            "ciphertext": self.full_ciphertext()
+        }
+
+    def restore(self, state):
+        self.iv = base64.b64decode(state["iv"]) if state["iv"] else None
+        self.text = state["text"]
+        self.data = self.text.encode('utf-8')
+        self.ciphertext = bytearray(base64.b64decode(state["ciphertext"]))
+
+
+def incremental_encoder(method, key, mode=None):
+    """
+    Create an incremental encoder for a method.
+
+    Args:
+        method (str): caesar, substitution, vigenere, aes or 3des
+        key (str): The encryption key (the shift for Caesar)
+        mode (str, optional): AES mode (ecb, cbc or ctr)
+
+    Returns:
+        IncrementalClassical or IncrementalBlockCipher
+    """
+    method = method.lower()
+    if method in ('caesar', 'substitution', 'vigenere'):
+        return IncrementalClassical(method, key)
+    if method in ('aes', '3des'):
+        return IncrementalBlockCipher(method, key, mode)
+    raise ValueError(f"Incremental encryption is not available for {method}")
+
+
+def encoder_from_state(state):
+    """Rebuild an encoder from the dictionary its state() returned."""
+    encoder = incremental_encoder(state["method"], state["key"], state.get("mode"))
+    encoder.restore(state)
+    return encoder
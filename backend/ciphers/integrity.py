@@ -3,15 +3,29 @@ import hmac
 import base64
 import binascii
 import json
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Optional, Callable
 
-def compute_hash(message: str, algorithm: str = 'sha256') -> Dict[str, Any]:
+# Bytes hashed per call, so a checkpoint can run between pieces
+BULK_CHUNK_SIZE = 1024 * 1024
+
+def _update_in_chunks(hash_obj, data: bytes, checkpoint: Optional[Callable] = None) -> None:
+    """Feed data to a hash or HMAC object one piece at a time, calling checkpoint(bytes done) after each."""
+    view = memoryview(data)
+    for start in range(0, len(view), BULK_CHUNK_SIZE):
+        hash_obj.update(view[start:start + BULK_CHUNK_SIZE])
+        if checkpoint is not None:
+            checkpoint(min(len(view), start + BULK_CHUNK_SIZE))
+
+def compute_hash(message: str, algorithm: str = 'sha256', with_steps: bool = True,
+                 checkpoint: Optional[Callable] = None) -> Dict[str, Any]:
     """
     Compute a hash of the input message using the specified algorithm.
     
     Args:
         message: The input message to hash
         algorithm: The hash algorithm to use (sha256, sha1, md5, etc.)
+        with_steps: Whether to generate the visualization steps (empty list when False)
+        checkpoint: Called with the number of bytes hashed after each piece; it may raise to stop
         
     Returns:
         Dictionary containing the hash result and visualization steps
@@ -32,11 +46,11 @@ def compute_hash(message: str, algorithm: str = 'sha256') -> Dict[str, Any]:
         raise ValueError(f"Unsupported hash algorithm: {algorithm}")
     
     # Compute hash
-    hash_obj.update(message_bytes)
+    _update_in_chunks(hash_obj, message_bytes, checkpoint)
     hash_result = hash_obj.hexdigest()
     
     # Generate visualization steps
-    steps = generate_hash_steps(message, algorithm)
+    steps = generate_hash_steps(message, algorithm) if with_steps else []
     
     return {
         "hash": hash_result,
@@ -46,7 +60,8 @@ def compute_hash(message: str, algorithm: str = 'sha256') -> Dict[str, Any]:
         "steps": steps
     }
 
-def compute_mac(message: str, key: str, algorithm: str = 'sha256') -> Dict[str, Any]:
+def compute_mac(message: str, key: str, algorithm: str = 'sha256', with_steps: bool = True,
+                checkpoint: Optional[Callable] = None) -> Dict[str, Any]:
     """
     Compute an HMAC of the input message using the specified key and algorithm.
     
@@ -54,6 +69,8 @@ def compute_mac(message: str, key: str, algorithm: str = 'sha256') -> Dict[str,
         message: The input message
         key: The secret key
         algorithm: The hash algorithm to use (sha256, sha1, md5, etc.)
+        with_steps: Whether to generate the visualization steps (empty list when False)
+        checkpoint: Called with the number of bytes hashed after each piece; it may raise to stop
         
     Returns:
         Dictionary containing the HMAC result and visualization steps
@@ -75,11 +92,12 @@ def compute_mac(message: str, key: str, algorithm: str = 'sha256') -> Dict[str,
         raise ValueError(f"Unsupported hash algorithm: {algorithm}")
     
     # Compute HMAC
-    hmac_obj = hmac.new(key_bytes, message_bytes, hash_func)
+    hmac_obj = hmac.new(key_bytes, digestmod=hash_func)
+    _update_in_chunks(hmac_obj, message_bytes, checkpoint)
     hmac_result = hmac_obj.hexdigest()
     
     # Generate visualization steps
-    steps = generate_hmac_steps(message, key, algorithm)
+    steps = generate_hmac_steps(message, key, algorithm) if with_steps else []
     
     return {
         "hmac": hmac_result,
@@ -104,8 +122,8 @@ def validate_mac(message: str, key: str, mac: str, algorithm: str = 'sha256') ->
     Returns:
         Dictionary containing the validation result and explanation
     """
-    # Compute the expected HMAC
-    computed_result = compute_mac(message, key, algorithm)
+    # Compute the expected HMAC (the visualization steps aren't needed here)
+    computed_result = compute_mac(message, key, algorithm, with_steps=False)
     computed_hmac = computed_result["hmac"]
     
     # Compare with the provided MAC
@@ -2,15 +2,61 @@
 Implementation of modern ciphers:
 - AES (ECB, CBC, CTR modes)
 - 3DES
+- AEAD: AES-GCM and ChaCha20-Poly1305 (authenticated encryption with associated data)
 """
 
 import os
 import base64
 import json
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
 from cryptography.hazmat.primitives import padding
 
-def aes_encryption(plaintext, key, mode_name):
+# AEAD algorithms: (implementation, display name, description)
+AEAD_ALGORITHMS = {
+    'aes-gcm': (
+        AESGCM,
+        "AES-256-GCM (Galois/Counter Mode)",
+        "Encrypts with AES in counter mode and authenticates the ciphertext and associated data "
+        "with GHASH in the same pass"
+    ),
+    'chacha20-poly1305': (
+        ChaCha20Poly1305,
+        "ChaCha20-Poly1305",
+        "Encrypts with the ChaCha20 stream cipher and authenticates the ciphertext and associated data "
+        "with Poly1305 in the same pass; fast in software on CPUs without AES instructions"
+    )
+}
+
+AEAD_NONCE_SIZE = 12  # 96-bit nonces for both algorithms
+AEAD_TAG_SIZE = 16  # 128-bit authentication tags
+
+# Bytes given to a block cipher per call, so a checkpoint can run between pieces
+BULK_CHUNK_SIZE = 1024 * 1024
+
+def transform_in_chunks(context, data, checkpoint=None):
+    """
+    Run an encryptor or decryptor over data one piece at a time.
+    
+    Args:
+        context: A CipherContext from Cipher.encryptor() or Cipher.decryptor()
+        data (bytes): The input
+        checkpoint (callable, optional): Called with the number of bytes done after
+            each piece; it may raise to stop
+    
+    Returns:
+        bytes: The same as context.update(data) + context.finalize()
+    """
+    view = memoryview(data)
+    parts = []
+    for start in range(0, len(view), BULK_CHUNK_SIZE):
+        parts.append(context.update(view[start:start + BULK_CHUNK_SIZE]))
+        if checkpoint is not None:
+            checkpoint(min(len(view), start + BULK_CHUNK_SIZE))
+    parts.append(context.finalize())
+    return b''.join(parts)
+
+def aes_encryption(plaintext, key, mode_name, with_steps=True, checkpoint=None):
     """
     Implements AES encryption with different modes.
     
@@ -18,6 +64,8 @@ def aes_encryption(plaintext, key, mode_name):
         plaintext (str): The text to encrypt
         key (str): The encryption key
         mode_name (str): The mode of operation (ecb, cbc, ctr)
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+        checkpoint (callable, optional): Called between pieces of the input (see transform_in_chunks)
     
     Returns:
         tuple: (ciphertext, iv, steps)
@@ -40,28 +88,30 @@ def aes_encryption(plaintext, key, mode_name):
     
     # Initialize steps
     steps = []
-    steps.append({
-        "step": "Input Preparation",
-        "plaintext": plaintext,
-        "plaintext_hex": plaintext_bytes.hex(),
-        "key": key,
-        "key_hex": key_bytes.hex(),
-        "key_length_bits": len(key_bytes) * 8
-    })
+    if with_steps:
+        steps.append({
+            "step": "Input Preparation",
+            "plaintext": plaintext,
+            "plaintext_hex": plaintext_bytes.hex(),
+            "key": key,
+            "key_hex": key_bytes.hex(),
+            "key_length_bits": len(key_bytes) * 8
+        })
     
     # Apply padding (except for CTR mode which doesn't require it)
     if mode_name != 'ctr':
         padder = padding.PKCS7(algorithms.AES.block_size).padder()
         padded_data = padder.update(plaintext_bytes) + padder.finalize()
         
-        steps.append({
-            "step": "Padding",
-            "algorithm": "PKCS7",
-            "block_size_bytes": algorithms.AES.block_size // 8,
-            "original_length": len(plaintext_bytes),
-            "padded_length": len(padded_data),
-            "padded_data_hex": padded_data.hex()
-        })
+        if with_steps:
+            steps.append({
+                "step": "Padding",
+                "algorithm": "PKCS7",
+                "block_size_bytes": algorithms.AES.block_size // 8,
+                "original_length": len(plaintext_bytes),
+                "padded_length": len(padded_data),
+                "padded_data_hex": padded_data.hex()
+            })
     else:
         padded_data = plaintext_bytes
     
@@ -70,64 +120,70 @@ def aes_encryption(plaintext, key, mode_name):
     if mode_name in ['cbc', 'ctr']:
         iv = os.urandom(16)  # AES block size is 128 bits (16 bytes)
         
-        steps.append({
-            "step": "IV Generation",
-            "iv_hex": iv.hex(),
-            "iv_length_bytes": len(iv)
-        })
+        if with_steps:
+            steps.append({
+                "step": "IV Generation",
+                "iv_hex": iv.hex(),
+                "iv_length_bytes": len(iv)
+            })
     
     # Create the appropriate mode object
     if mode_name == 'ecb':
         mode_obj = modes.ECB()
-        steps.append({
-            "step": "Mode Selection",
-            "mode": "ECB (Electronic Codebook)",
-            "description": "Each block is encrypted independently"
-        })
+        if with_steps:
+            steps.append({
+                "step": "Mode Selection",
+                "mode": "ECB (Electronic Codebook)",
+                "description": "Each block is encrypted independently"
+            })
     elif mode_name == 'cbc':
         mode_obj = modes.CBC(iv)
-        steps.append({
-            "step": "Mode Selection",
-            "mode": "CBC (Cipher Block Chaining)",
-            "description": "Each block is XORed with the previous ciphertext block before encryption"
-        })
+        if with_steps:
+            steps.append({
+                "step": "Mode Selection",
+                "mode": "CBC (Cipher Block Chaining)",
+                "description": "Each block is XORed with the previous ciphertext block before encryption"
+            })
     elif mode_name == 'ctr':
         mode_obj = modes.CTR(iv)
-        steps.append({
-            "step": "Mode Selection",
-            "mode": "CTR (Counter)",
-            "description": "Encrypts a counter value and XORs the result with the plaintext"
-        })
+        if with_steps:
+            steps.append({
+                "step": "Mode Selection",
+                "mode": "CTR (Counter)",
+                "description": "Encrypts a counter value and XORs the result with the plaintext"
+            })
     
     # Create the cipher object
     cipher = Cipher(algorithms.AES(key_bytes), mode_obj)
     encryptor = cipher.encryptor()
     
     # Encrypt the data
-    ciphertext = encryptor.update(padded_data) + encryptor.finalize()
+    ciphertext = transform_in_chunks(encryptor, padded_data, checkpoint)
     
     # Record the encryption step
-    steps.append({
-        "step": "Encryption",
-        "input_hex": padded_data.hex(),
-        "output_hex": ciphertext.hex(),
-        "output_length_bytes": len(ciphertext)
-    })
+    if with_steps:
+        steps.append({
+            "step": "Encryption",
+            "input_hex": padded_data.hex(),
+            "output_hex": ciphertext.hex(),
+            "output_length_bytes": len(ciphertext)
+        })
     
     # Encode the results as base64 for easier transmission
     ciphertext_b64 = base64.b64encode(ciphertext).decode('utf-8')
     iv_b64 = base64.b64encode(iv).decode('utf-8') if iv else None
     
-    steps.append({
-        "step": "Output Encoding",
-        "encoding": "Base64",
-        "ciphertext_base64": ciphertext_b64,
-        "iv_base64": iv_b64
-    })
+    if with_steps:
+        steps.append({
+            "step": "Output Encoding",
+            "encoding": "Base64",
+            "ciphertext_base64": ciphertext_b64,
+            "iv_base64": iv_b64
+        })
     
     return ciphertext_b64, iv_b64, steps
 
-def aes_decryption(ciphertext_b64, key, mode_name, iv_b64=None):
+def aes_decryption(ciphertext_b64, key, mode_name, iv_b64=None, with_steps=True, checkpoint=None):
     """
     Implements AES decryption with different modes.
     
@@ -136,6 +192,8 @@ def aes_decryption(ciphertext_b64, key, mode_name, iv_b64=None):
         key (str): The decryption key
         mode_name (str): The mode of operation (ecb, cbc, ctr)
         iv_b64 (str, optional): Base64-encoded initialization vector
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+        checkpoint (callable, optional): Called between pieces of the input (see transform_in_chunks)
     
     Returns:
         tuple: (plaintext, steps)
@@ -162,16 +220,17 @@ def aes_decryption(ciphertext_b64, key, mode_name, iv_b64=None):
     
     # Initialize steps
     steps = []
-    steps.append({
-        "step": "Input Preparation",
-        "ciphertext_base64": ciphertext_b64,
-        "ciphertext_hex": ciphertext.hex(),
-        "iv_base64": iv_b64,
-        "iv_hex": iv.hex() if iv else None,
-        "key": key,
-        "key_hex": key_bytes.hex(),
-        "key_length_bits": len(key_bytes) * 8
-    })
+    if with_steps:
+        steps.append({
+            "step": "Input Preparation",
+            "ciphertext_base64": ciphertext_b64,
+            "ciphertext_hex": ciphertext.hex(),
+            "iv_base64": iv_b64,
+            "iv_hex": iv.hex() if iv else None,
+            "key": key,
+            "key_hex": key_bytes.hex(),
+            "key_length_bits": len(key_bytes) * 8
+        })
     
     # Create the appropriate mode object
     if mode_name == 'ecb':
@@ -181,57 +240,63 @@ def aes_decryption(ciphertext_b64, key, mode_name, iv_b64=None):
     elif mode_name == 'ctr':
         mode_obj = modes.CTR(iv)
     
-    steps.append({
-        "step": "Mode Selection",
-        "mode": mode_name.upper()
-    })
+    if with_steps:
+        steps.append({
+            "step": "Mode Selection",
+            "mode": mode_name.upper()
+        })
     
     # Create the cipher object
     cipher = Cipher(algorithms.AES(key_bytes), mode_obj)
     decryptor = cipher.decryptor()
     
     # Decrypt the data
-    decrypted_data = decryptor.update(ciphertext) + decryptor.finalize()
+    decrypted_data = transform_in_chunks(decryptor, ciphertext, checkpoint)
     
-    steps.append({
-        "step": "Decryption",
-        "input_hex": ciphertext.hex(),
-        "output_hex": decrypted_data.hex(),
-        "output_length_bytes": len(decrypted_data)
-    })
+    if with_steps:
+        steps.append({
+            "step": "Decryption",
+            "input_hex": ciphertext.hex(),
+            "output_hex": decrypted_data.hex(),
+            "output_length_bytes": len(decrypted_data)
+        })
     
     # Remove padding (except for CTR mode)
     if mode_name != 'ctr':
         unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
         unpadded_data = unpadder.update(decrypted_data) + unpadder.finalize()
         
-        steps.append({
-            "step": "Unpadding",
-            "algorithm": "PKCS7",
-            "padded_length": len(decrypted_data),
-            "unpadded_length": len(unpadded_data),
-            "unpadded_data_hex": unpadded_data.hex()
-        })
+        if with_steps:
+            steps.append({
+                "step": "Unpadding",
+                "algorithm": "PKCS7",
+                "padded_length": len(decrypted_data),
+                "unpadded_length": len(unpadded_data),
+                "unpadded_data_hex": unpadded_data.hex()
+            })
     else:
         unpadded_data = decrypted_data
     
     # Convert bytes back to string
     plaintext = unpadded_data.decode('utf-8')
     
-    steps.append({
-        "step": "Output Decoding",
-        "plaintext": plaintext
-    })
+    if with_steps:
+        steps.append({
+            "step": "Output Decoding",
+            "plaintext": plaintext
+        })
     
     return plaintext, steps
 
-def des3_encryption(plaintext, key):
+def des3_encryption(plaintext, key, with_steps=True, checkpoint=None):
     """
     Implements 3DES encryption.
     
     Args:
         plaintext (str): The text to encrypt
         key (str): The encryption key
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+        checkpoint (callable, optional): Called between pieces of the input (see transform_in_chunks)
     
     Returns:
         tuple: (ciphertext, iv, steps)
@@ -247,66 +312,71 @@ def des3_encryption(plaintext, key):
     
     # Initialize steps
     steps = []
-    steps.append({
-        "step": "Input Preparation",
-        "plaintext": plaintext,
-        "plaintext_hex": plaintext_bytes.hex(),
-        "key": key,
-        "key_hex": key_bytes.hex(),
-        "key_length_bits": len(key_bytes) * 8
-    })
+    if with_steps:
+        steps.append({
+            "step": "Input Preparation",
+            "plaintext": plaintext,
+            "plaintext_hex": plaintext_bytes.hex(),
+            "key": key,
+            "key_hex": key_bytes.hex(),
+            "key_length_bits": len(key_bytes) * 8
+        })
     
     # Apply padding
     padder = padding.PKCS7(algorithms.TripleDES.block_size).padder()
     padded_data = padder.update(plaintext_bytes) + padder.finalize()
     
-    steps.append({
-        "step": "Padding",
-        "algorithm": "PKCS7",
-        "block_size_bytes": algorithms.TripleDES.block_size // 8,
-        "original_length": len(plaintext_bytes),
-        "padded_length": len(padded_data),
-        "padded_data_hex": padded_data.hex()
-    })
+    if with_steps:
+        steps.append({
+            "step": "Padding",
+            "algorithm": "PKCS7",
+            "block_size_bytes": algorithms.TripleDES.block_size // 8,
+            "original_length": len(plaintext_bytes),
+            "padded_length": len(padded_data),
+            "padded_data_hex": padded_data.hex()
+        })
     
     # Generate IV
     iv = os.urandom(8)  # 3DES block size is 64 bits (8 bytes)
     
-    steps.append({
-        "step": "IV Generation",
-        "iv_hex": iv.hex(),
-        "iv_length_bytes": len(iv)
-    })
+    if with_steps:
+        steps.append({
+            "step": "IV Generation",
+            "iv_hex": iv.hex(),
+            "iv_length_bytes": len(iv)
+        })
     
     # Create the cipher object (using CBC mode)
     cipher = Cipher(algorithms.TripleDES(key_bytes), modes.CBC(iv))
     encryptor = cipher.encryptor()
     
     # Encrypt the data
-    ciphertext = encryptor.update(padded_data) + encryptor.finalize()
+    ciphertext = transform_in_chunks(encryptor, padded_data, checkpoint)
     
-    steps.append({
-        "step": "Encryption",
-        "mode": "CBC (Cipher Block Chaining)",
-        "input_hex": padded_data.hex(),
-        "output_hex": ciphertext.hex(),
-        "output_length_bytes": len(ciphertext)
-    })
+    if with_steps:
+        steps.append({
+            "step": "Encryption",
+            "mode": "CBC (Cipher Block Chaining)",
+            "input_hex": padded_data.hex(),
+            "output_hex": ciphertext.hex(),
+            "output_length_bytes": len(ciphertext)
+        })
     
     # Encode the results as base64 for easier transmission
     ciphertext_b64 = base64.b64encode(ciphertext).decode('utf-8')
     iv_b64 = base64.b64encode(iv).decode('utf-8')
     
-    steps.append({
-        "step": "Output Encoding",
-        "encoding": "Base64",
-        "ciphertext_base64": ciphertext_b64,
-        "iv_base64": iv_b64
-    })
+    if with_steps:
+        steps.append({
+            "step": "Output Encoding",
+            "encoding": "Base64",
+            "ciphertext_base64": ciphertext_b64,
+            "iv_base64": iv_b64
+        })
     
     return ciphertext_b64, iv_b64, steps
 
-def des3_decryption(ciphertext_b64, key, iv_b64):
+def des3_decryption(ciphertext_b64, key, iv_b64, with_steps=True, checkpoint=None):
     """
     Implements 3DES decryption.
     
@@ -314,6 +384,8 @@ def des3_decryption(ciphertext_b64, key, iv_b64):
         ciphertext_b64 (str): Base64-encoded encrypted text
         key (str): The decryption key
         iv_b64 (str): Base64-encoded initialization vector
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+        checkpoint (callable, optional): Called between pieces of the input (see transform_in_chunks)
     
     Returns:
         tuple: (plaintext, steps)
@@ -329,51 +401,227 @@ def des3_decryption(ciphertext_b64, key, iv_b64):
     
     # Initialize steps
     steps = []
-    steps.append({
-        "step": "Input Preparation",
-        "ciphertext_base64": ciphertext_b64,
-        "ciphertext_hex": ciphertext.hex(),
-        "iv_base64": iv_b64,
-        "iv_hex": iv.hex(),
-        "key": key,
-        "key_hex": key_bytes.hex(),
-        "key_length_bits": len(key_bytes) * 8
-    })
+    if with_steps:
+        steps.append({
+            "step": "Input Preparation",
+            "ciphertext_base64": ciphertext_b64,
+            "ciphertext_hex": ciphertext.hex(),
+            "iv_base64": iv_b64,
+            "iv_hex": iv.hex(),
+            "key": key,
+            "key_hex": key_bytes.hex(),
+            "key_length_bits": len(key_bytes) * 8
+        })
     
     # Create the cipher object
     cipher = Cipher(algorithms.TripleDES(key_bytes), modes.CBC(iv))
     decryptor = cipher.decryptor()
     
     # Decrypt the data
-    decrypted_data = decryptor.update(ciphertext) + decryptor.finalize()
+    decrypted_data = transform_in_chunks(decryptor, ciphertext, checkpoint)
     
-    steps.append({
-        "step": "Decryption",
-        "mode": "CBC (Cipher Block Chaining)",
-        "input_hex": ciphertext.hex(),
-        "output_hex": decrypted_data.hex(),
-        "output_length_bytes": len(decrypted_data)
-    })
+    if with_steps:
+        steps.append({
+            "step": "Decryption",
+            "mode": "CBC (Cipher Block Chaining)",
+            "input_hex": ciphertext.hex(),
+            "output_hex": decrypted_data.hex(),
+            "output_length_bytes": len(decrypted_data)
+        })
     
     # Remove padding
     unpadder = padding.PKCS7(algorithms.TripleDES.block_size).unpadder()
     unpadded_data = unpadder.update(decrypted_data) + unpadder.finalize()
     
-    steps.append({
-        "step": "Unpadding",
-        "algorithm": "PKCS7",
-        "padded_length": len(decrypted_data),
-        "unpadded_length": len(unpadded_data),
-        "unpadded_data_hex": unpadded_data.hex()
-    })
+    if with_steps:
+        steps.append({
+            "step": "Unpadding",
+            "algorithm": "PKCS7",
+            "padded_length": len(decrypted_data),
+            "unpadded_length": len(unpadded_data),
+            "unpadded_data_hex": unpadded_data.hex()
+        })
     
     # Convert bytes back to string
     plaintext = unpadded_data.decode('utf-8')
     
-    steps.append({
-        "step": "Output Decoding",
-        "plaintext": plaintext
-    })
+    if with_steps:
+        steps.append({
+            "step": "Output Decoding",
+            "plaintext": plaintext
+        })
+    
+    return plaintext, steps
+
+def aead_encryption(plaintext, key, algorithm, aad='', with_steps=True):
+    """
+    Implements authenticated encryption with associated data (AES-GCM or ChaCha20-Poly1305).
+    
+    Args:
+        plaintext (str): The text to encrypt
+        key (str): The encryption key
+        algorithm (str): 'aes-gcm' or 'chacha20-poly1305'
+        aad (str): Associated data that is authenticated but not encrypted
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+    
+    Returns:
+        tuple: (ciphertext, nonce, tag, steps)
+            - ciphertext (str): Base64-encoded encrypted text
+            - nonce (str): Base64-encoded 96-bit nonce
+            - tag (str): Base64-encoded 128-bit authentication tag
+            - steps (list): List of dictionaries containing step-by-step information
+    """
+    algorithm = algorithm.lower()
+    if algorithm not in AEAD_ALGORITHMS:
+        raise ValueError(f"Unsupported AEAD algorithm: {algorithm}")
+    implementation, name, description = AEAD_ALGORITHMS[algorithm]
+    
+    key_bytes = derive_key(key, 32)  # 256-bit key for both algorithms
+    plaintext_bytes = plaintext.encode('utf-8')
+    aad_bytes = aad.encode('utf-8')
+    
+    steps = []
+    if with_steps:
+        steps.append({
+            "step": "Input Preparation",
+            "plaintext": plaintext,
+            "plaintext_hex": plaintext_bytes.hex(),
+            "associated_data": aad,
+            "associated_data_hex": aad_bytes.hex(),
+            "key": key,
+            "key_hex": key_bytes.hex(),
+            "key_length_bits": len(key_bytes) * 8
+        })
+    
+    # A nonce must never repeat under the same key
+    nonce = os.urandom(AEAD_NONCE_SIZE)
+    
+    if with_steps:
+        steps.append({
+            "step": "Nonce Generation",
+            "nonce_hex": nonce.hex(),
+            "nonce_length_bytes": len(nonce)
+        })
+        steps.append({
+            "step": "Mode Selection",
+            "mode": name,
+            "description": description,
+            "padding": "None (stream encryption, ciphertext is the same length as the plaintext)"
+        })
+    
+    # Encryption and authentication happen in a single pass; the tag is appended to the output
+    sealed = implementation(key_bytes).encrypt(nonce, plaintext_bytes, aad_bytes or None)
+    ciphertext, tag = sealed[:-AEAD_TAG_SIZE], sealed[-AEAD_TAG_SIZE:]
+    
+    if with_steps:
+        steps.append({
+            "step": "Authenticated Encryption",
+            "input_hex": plaintext_bytes.hex(),
+            "output_hex": ciphertext.hex(),
+            "output_length_bytes": len(ciphertext),
+            "tag_hex": tag.hex(),
+            "tag_length_bytes": len(tag),
+            "authenticated_bytes": len(aad_bytes) + len(ciphertext)
+        })
+    
+    ciphertext_b64 = base64.b64encode(ciphertext).decode('utf-8')
+    nonce_b64 = base64.b64encode(nonce).decode('utf-8')
+    tag_b64 = base64.b64encode(tag).decode('utf-8')
+    
+    if with_steps:
+        steps.append({
+            "step": "Output Encoding",
+            "encoding": "Base64",
+            "ciphertext_base64": ciphertext_b64,
+            "nonce_base64": nonce_b64,
+            "tag_base64": tag_b64
+        })
+    
+    return ciphertext_b64, nonce_b64, tag_b64, steps
+
+def aead_decryption(ciphertext_b64, key, algorithm, nonce_b64, tag_b64=None, aad='', with_steps=True):
+    """
+    Implements authenticated decryption (AES-GCM or ChaCha20-Poly1305).
+    
+    Args:
+        ciphertext_b64 (str): Base64-encoded encrypted text
+        key (str): The decryption key
+        algorithm (str): 'aes-gcm' or 'chacha20-poly1305'
+        nonce_b64 (str): Base64-encoded nonce
+        tag_b64 (str, optional): Base64-encoded authentication tag (if omitted, the last 16
+            bytes of the ciphertext are used as the tag)
+        aad (str): Associated data supplied at encryption
+        with_steps (bool): Whether to build the step-by-step trace (steps is empty when False)
+    
+    Returns:
+        tuple: (plaintext, steps)
+            - plaintext (str): The decrypted text
+            - steps (list): List of dictionaries containing step-by-step information
+    
+    Raises:
+        cryptography.exceptions.InvalidTag: If the ciphertext, nonce, tag or associated data was altered
+    """
+    algorithm = algorithm.lower()
+    if algorithm not in AEAD_ALGORITHMS:
+        raise ValueError(f"Unsupported AEAD algorithm: {algorithm}")
+    if not nonce_b64:
+        raise ValueError(f"Nonce (iv) is required for {algorithm.upper()}")
+    implementation, name, description = AEAD_ALGORITHMS[algorithm]
+    
+    key_bytes = derive_key(key, 32)
+    ciphertext = base64.b64decode(ciphertext_b64)
+    nonce = base64.b64decode(nonce_b64)
+    aad_bytes = aad.encode('utf-8')
+    
+    if tag_b64:
+        tag = base64.b64decode(tag_b64)
+    else:
+        ciphertext, tag = ciphertext[:-AEAD_TAG_SIZE], ciphertext[-AEAD_TAG_SIZE:]
+    
+    steps = []
+    if with_steps:
+        steps.append({
+            "step": "Input Preparation",
+            "ciphertext_base64": ciphertext_b64,
+            "ciphertext_hex": ciphertext.hex(),
+            "nonce_hex": nonce.hex(),
+            "tag_hex": tag.hex(),
+            "associated_data": aad,
+            "associated_data_hex": aad_bytes.hex(),
+            "key": key,
+            "key_hex": key_bytes.hex(),
+            "key_length_bits": len(key_bytes) * 8
+        })
+        steps.append({
+            "step": "Mode Selection",
+            "mode": name,
+            "description": description
+        })
+    
+    # Verification and decryption happen together; nothing is returned unless the tag matches
+    decrypted_data = implementation(key_bytes).decrypt(nonce, ciphertext + tag, aad_bytes or None)
+    
+    if with_steps:
+        steps.append({
+            "step": "Tag Verification",
+            "tag_hex": tag.hex(),
+            "valid": True,
+            "description": "The tag recomputed over the associated data and ciphertext matches"
+        })
+        steps.append({
+            "step": "Decryption",
+            "input_hex": ciphertext.hex(),
+            "output_hex": decrypted_data.hex(),
+            "output_length_bytes": len(decrypted_data)
+        })
+    
+    plaintext = decrypted_data.decode('utf-8')
+    
+    if with_steps:
+        steps.append({
+            "step": "Output Decoding",
+            "plaintext": plaintext
+        })
     
     return plaintext, steps
 
@@ -0,0 +1,58 @@
+"""
+Process pools for CPU-bound cipher work.
+
+get_executor() returns the one pool a server process shares between the
+substitution solver and parallel_apply() in classical.py. It is created on
+first use under a lock, and replaced by a larger one if a caller asks for
+more processes than it has. create_executor() builds a pool with the same
+settings for callers that need workers of their own (the job runner in
+jobs.py).
+
+Workers are started with spawn, so they don't inherit the server's threads,
+locks or open files.
+
+Every gunicorn worker has its own shared pool. default_processes() divides
+the cores between them (gunicorn.conf.py exports GUNICORN_WORKERS), so all
+pools together stay within the CPU count.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_executor = None
+_lock = threading.Lock()
+
+
+def default_processes():
+    """Pool size for one server process: the cores divided between the GUNICORN_WORKERS processes."""
+    workers = max(1, int(os.getenv('GUNICORN_WORKERS') or 1))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def create_executor(processes, initializer=None, initargs=()):
+    """A new process pool with spawned workers."""
+    return ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+        initializer=initializer, initargs=initargs
+    )
+
+
+def get_executor(processes):
+    """
+    The pool shared by this server process.
+
+    Args:
+        processes (int): Worker processes the caller wants to use
+
+    Returns:
+        ProcessPoolExecutor: A pool with at least that many workers
+    """
+    global _executor
+    with _lock:
+        if _executor is None or _executor._max_workers < processes:
+            previous, _executor = _executor, create_executor(processes)
+            if previous is not None:
+                previous.shutdown(wait=False)  # Work already submitted to it still finishes
+        return _executor
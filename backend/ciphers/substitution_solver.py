@@ -0,0 +1,237 @@
+"""
+Substitution cipher solver.
+
+Hill climbing over decryption keys, scored with English quadgram
+log-probabilities. The quadgram table is a flat float32 array of 26**4
+entries stored as a .npy file and memory-mapped, so loading it is nearly
+free and worker processes share the same pages. After each key swap only
+the quadgrams that contain one of the two swapped ciphertext letters are
+rescored. Random restarts run in a process pool until the best key has been
+reached by CONFIRMATIONS independent restarts, or the time budget is spent.
+
+A result is only trustworthy when it is "converged": the best key was found
+by at least two restarts. An unconverged result on a short text (a few
+hundred letters) or with a small budget is often wrong; retry with a larger
+time_budget. Letters that never occur in the ciphertext can't be recovered,
+and are listed as "undetermined" (their places in the key are guesses).
+"""
+
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from .cryptanalysis import ENGLISH_FREQUENCIES, UPPERCASE, LOWERCASE, letter_indices
+from .pool import default_processes, get_executor
+
+QUADGRAM_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'english_quadgrams.npy')
+
+# Letters used for scoring; longer texts are truncated (the statistics converge well before this)
+MAX_SCORED_LETTERS = 3000
+
+# Non-improving swaps before a hill climb is considered stuck and restarted
+MAX_STALE_SWAPS = 1500
+
+# Restarts that must reach the best score before a search stops early
+CONFIRMATIONS = 3
+
+# Scores closer than this are the same optimum
+SCORE_TOLERANCE = 1e-3
+
+
+def build_quadgram_table(corpus):
+    """
+    Build a quadgram log10-probability table from English text.
+
+    Args:
+        corpus (str): Training text (non-letters are ignored)
+
+    Returns:
+        numpy.ndarray: float32 array of 26**4 log10 probabilities
+    """
+    letters = letter_indices(corpus).astype(np.int64)
+    codes = letters[:-3] * 17576 + letters[1:-2] * 676 + letters[2:-1] * 26 + letters[3:]
+    counts = np.bincount(codes, minlength=26 ** 4).astype(np.float64)
+    total = counts.sum()
+    # Unseen quadgrams get a floor well below any observed one
+    floor = np.log10(0.01 / total)
+    with np.errstate(divide='ignore'):
+        table = np.where(counts > 0, np.log10(counts / total), floor)
+    return table.astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def load_quadgram_table(path=QUADGRAM_TABLE_PATH):
+    """Memory-map the quadgram table (cached per process)."""
+    return np.load(path, mmap_mode='r')
+
+
+def _affected_positions(cipher):
+    """For each ciphertext letter, the sorted start positions of quadgrams containing it."""
+    starts = len(cipher) - 3
+    affected = []
+    for letter in range(26):
+        positions = np.flatnonzero(cipher == letter)
+        candidates = (positions[:, None] - np.arange(4)[None, :]).ravel()
+        affected.append(np.unique(candidates[(candidates >= 0) & (candidates < starts)]))
+    return affected
+
+
+def _frequency_key(cipher):
+    """Initial decryption key matching ciphertext letter frequencies to English ones."""
+    counts = np.bincount(cipher, minlength=26)
+    key = np.empty(26, dtype=np.int64)
+    key[np.argsort(-counts, kind='stable')] = np.argsort(-ENGLISH_FREQUENCIES, kind='stable')
+    return key
+
+
+def _hill_climb(cipher, table, affected, key, deadline, rng):
+    """
+    Improve a decryption key (key[cipher letter] = plaintext letter) by swapping pairs.
+
+    Returns:
+        tuple: (score, key)
+    """
+    c0, c1, c2, c3 = cipher[:-3], cipher[1:-2], cipher[2:-1], cipher[3:]
+    codes = key[c0] * 17576 + key[c1] * 676 + key[c2] * 26 + key[c3]
+    score = float(table[codes].sum())
+
+    stale = 0
+    iterations = 0
+    while stale < MAX_STALE_SWAPS:
+        # Checking the clock every swap is measurable; every 64 is enough
+        iterations += 1
+        if iterations % 64 == 0 and time.time() > deadline:
+            break
+
+        a, b = rng.choice(26, size=2, replace=False)
+        positions = np.union1d(affected[a], affected[b])
+        if len(positions) == 0:
+            stale += 1
+            continue
+
+        key[a], key[b] = key[b], key[a]
+        new_codes = key[c0[positions]] * 17576 + key[c1[positions]] * 676 + key[c2[positions]] * 26 + key[c3[positions]]
+        delta = float(table[new_codes].sum() - table[codes[positions]].sum())
+
+        if delta > 0:
+            codes[positions] = new_codes
+            score += delta
+            stale = 0
+        else:
+            key[a], key[b] = key[b], key[a]
+            stale += 1
+
+    return score, key
+
+
+def _solve_until(cipher, deadline, seed, table_path, first_key=None):
+    """
+    Run hill climbs with random restarts until CONFIRMATIONS of them reach the best score, or the deadline.
+
+    Returns:
+        tuple: (best score, best decryption key as a list, restarts completed, restarts that reached the best score)
+    """
+    table = load_quadgram_table(table_path)
+    affected = _affected_positions(cipher)
+    rng = np.random.default_rng(seed)
+
+    best_score, best_key = float('-inf'), None
+    restarts = 0
+    confirmations = 0
+    while True:
+        if first_key is not None:
+            key, first_key = np.array(first_key, dtype=np.int64), None
+        else:
+            key = rng.permutation(26).astype(np.int64)
+        score, key = _hill_climb(cipher, table, affected, key, deadline, rng)
+        restarts += 1
+        if score > best_score + SCORE_TOLERANCE:
+            best_score, best_key = score, key.copy()
+            confirmations = 1
+        elif score >= best_score - SCORE_TOLERANCE:
+            confirmations += 1
+        if confirmations >= CONFIRMATIONS or time.time() > deadline:
+            break
+
+    return best_score, best_key.tolist(), restarts, confirmations
+
+
+def decryption_key_to_key(decryption_key):
+    """Convert a decryption key (cipher -> plain) into substitution_cipher's key format (plain -> cipher)."""
+    key = [''] * 26
+    for cipher_letter, plain_letter in enumerate(decryption_key):
+        key[plain_letter] = UPPERCASE[cipher_letter]
+    return ''.join(key)
+
+
+def apply_substitution(text, key, encrypt=True):
+    """Apply a 26-letter substitution key to a whole text without building steps."""
+    upper_key = key.upper()
+    lower_key = key.lower()
+    if encrypt:
+        table = str.maketrans(UPPERCASE + LOWERCASE, upper_key + lower_key)
+    else:
+        table = str.maketrans(upper_key + lower_key, UPPERCASE + LOWERCASE)
+    return text.translate(table)
+
+
+def solve_substitution(ciphertext, time_budget=5.0, processes=None, seed=None,
+                       table_path=QUADGRAM_TABLE_PATH, preview_length=80):
+    """
+    Break a simple substitution cipher.
+
+    Args:
+        ciphertext (str): The encrypted text
+        time_budget (float): Seconds to spend searching
+        processes (int, optional): Worker processes for restarts (defaults to default_processes(), 1 runs inline)
+        seed (int, optional): Random seed for reproducible runs
+        table_path (str): Path of the quadgram table
+        preview_length (int): Characters of decrypted text to include
+
+    Returns:
+        dict: Recovered key (in substitution_cipher format), score, whether the search
+        converged, the undetermined letters and statistics
+    """
+    cipher = letter_indices(ciphertext)[:MAX_SCORED_LETTERS].astype(np.int64)
+    if len(cipher) < 4:
+        raise ValueError("Ciphertext must contain at least 4 letters")
+
+    if processes is None:
+        processes = default_processes()
+
+    started = time.time()
+    deadline = started + time_budget
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    first_key = _frequency_key(cipher).tolist()
+
+    if processes == 1:
+        results = [_solve_until(cipher, deadline, seeds[0], table_path, first_key)]
+    else:
+        executor = get_executor(processes)
+        futures = [
+            executor.submit(_solve_until, cipher, deadline, seeds[i], table_path, first_key if i == 0 else None)
+            for i in range(processes)
+        ]
+        results = [future.result() for future in futures]
+
+    best_score, best_decryption_key, _, _ = max(results, key=lambda result: result[0])
+    key = decryption_key_to_key(best_decryption_key)
+    confirmations = sum(result[3] for result in results if result[0] >= best_score - SCORE_TOLERANCE)
+    seen = np.bincount(cipher, minlength=26) > 0
+
+    return {
+        "key": key,
+        "score": round(best_score, 4),
+        "score_per_quadgram": round(best_score / (len(cipher) - 3), 4),
+        "converged": confirmations >= 2,
+        "confirmations": confirmations,
+        # Plaintext letters whose ciphertext letter never occurs
+        "undetermined": ''.join(sorted(UPPERCASE[best_decryption_key[c]] for c in range(26) if not seen[c])),
+        "letters_scored": int(len(cipher)),
+        "restarts": sum(result[2] for result in results),
+        "processes": processes,
+        "elapsed_seconds": round(time.time() - started, 3),
+        "preview": apply_substitution(ciphertext[:preview_length], key, encrypt=False)
+    }
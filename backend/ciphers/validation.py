@@ -0,0 +1,125 @@
+"""
+Ciphertext validation.
+
+Checks that a ciphertext is the encryption of a plaintext under a key. The
+plaintext is encrypted once, with the IV or nonce that came with the
+ciphertext and without building a step trace, and the two ciphertexts are
+compared in constant time. A validator is built once per key so a batch of
+pairs shares the key derivation.
+"""
+
+import base64
+import hmac
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from .classical import compile_cipher
+from .modern import AEAD_ALGORITHMS, AEAD_TAG_SIZE, derive_key
+
+CLASSICAL_METHODS = ('caesar', 'substitution', 'vigenere')
+AES_MODES = ('ecb', 'cbc', 'ctr', 'gcm')
+
+
+def _b64decode(value, field):
+    try:
+        return base64.b64decode(value, validate=True)
+    except ValueError:
+        raise ValueError(f"{field} is not valid Base64")
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('utf-8')
+
+
+def _classical_validator(method, key):
+    if method == 'caesar':
+        key = int(key) if key else 3
+    cipher = compile_cipher(method, key, encrypt=True)
+
+    def validate(plaintext, ciphertext, iv=None, tag=None, aad=''):
+        expected, _ = cipher.apply(plaintext, with_steps=False)
+        return {
+            "valid": hmac.compare_digest(expected.encode('utf-8'), ciphertext.encode('utf-8')),
+            "expected": expected
+        }
+
+    return validate
+
+
+def _block_validator(algorithm, key_bytes, mode):
+    block_bits = algorithm.block_size
+
+    def validate(plaintext, ciphertext, iv=None, tag=None, aad=''):
+        data = plaintext.encode('utf-8')
+        if mode == 'ecb':
+            mode_obj = modes.ECB()
+        else:
+            if not iv:
+                raise ValueError("The IV used for encryption is required")
+            iv_bytes = _b64decode(iv, 'iv')
+            mode_obj = modes.CBC(iv_bytes) if mode == 'cbc' else modes.CTR(iv_bytes)
+        if mode != 'ctr':
+            padder = padding.PKCS7(block_bits).padder()
+            data = padder.update(data) + padder.finalize()
+
+        encryptor = Cipher(algorithm(key_bytes), mode_obj).encryptor()
+        expected = encryptor.update(data) + encryptor.finalize()
+        return {
+            "valid": hmac.compare_digest(expected, _b64decode(ciphertext, 'ciphertext')),
+            "expected": _b64encode(expected)
+        }
+
+    return validate
+
+
+def _aead_validator(algorithm, key_bytes):
+    aead = AEAD_ALGORITHMS[algorithm][0](key_bytes)
+
+    def validate(plaintext, ciphertext, iv=None, tag=None, aad=''):
+        if not iv:
+            raise ValueError("The nonce (iv) used for encryption is required")
+        sealed = aead.encrypt(_b64decode(iv, 'iv'), plaintext.encode('utf-8'), aad.encode('utf-8') or None)
+        supplied = _b64decode(ciphertext, 'ciphertext')
+        if tag:
+            # Without a separate tag, the ciphertext is expected to end with it
+            supplied += _b64decode(tag, 'tag')
+        return {
+            "valid": hmac.compare_digest(sealed, supplied),
+            "expected": _b64encode(sealed[:-AEAD_TAG_SIZE]),
+            "expected_tag": _b64encode(sealed[-AEAD_TAG_SIZE:])
+        }
+
+    return validate
+
+
+def ciphertext_validator(method, key, mode=None):
+    """
+    Build a validator for ciphertexts produced with one method and key.
+
+    Args:
+        method (str): caesar, substitution, vigenere, aes, chacha20 or 3des
+        key (str): The encryption key (the shift for Caesar)
+        mode (str, optional): AES mode (ecb, cbc, ctr or gcm)
+
+    Returns:
+        callable: validate(plaintext, ciphertext, iv=None, tag=None, aad='') returning a dict
+        with "valid" and "expected" (plus "expected_tag" for AEAD ciphers). Modern ciphertexts,
+        IVs and tags are Base64, as returned by /encrypt. Raises ValueError for missing or
+        malformed inputs.
+    """
+    method = method.lower()
+    if method in CLASSICAL_METHODS:
+        return _classical_validator(method, key)
+    if method == 'aes':
+        mode = (mode or '').lower()
+        if mode not in AES_MODES:
+            raise ValueError("AES mode not specified (ECB, CBC, CTR, GCM)")
+        if mode == 'gcm':
+            return _aead_validator('aes-gcm', derive_key(key, 32))
+        return _block_validator(algorithms.AES, derive_key(key, 32), mode)
+    if method == 'chacha20':
+        return _aead_validator('chacha20-poly1305', derive_key(key, 32))
+    if method == '3des':
+        return _block_validator(algorithms.TripleDES, derive_key(key, 24), 'cbc')
+    raise ValueError(f"Unsupported encryption method: {method}")
@@ -0,0 +1,340 @@
+"""
+HTTP access to seekable encrypted containers (see ciphers/container.py).
+
+- POST /containers encrypts the request body into a container stored under
+  CONTAINER_DIR, streaming it chunk by chunk, and returns its ID.
+- GET /containers/<id> serves the container itself and honours Range
+  headers, so a client holding the key can fetch just the header, the index
+  and the chunk records it needs, then decrypt them locally.
+- GET /containers/<id>/index describes the layout and lists every chunk.
+- GET /containers/<id>/plaintext decrypts on the server. With a Range header
+  only the chunks covering the range are read and decrypted, and the response
+  is 206 Partial Content.
+
+- DELETE /containers/<id> removes a container.
+
+Every route needs a login, and a container can only be read or deleted by the
+user who stored it. Each user may keep CONTAINER_MAX_PER_USER containers
+holding at most CONTAINER_QUOTA_BYTES together, and containers are deleted
+CONTAINER_TTL seconds after they were stored.
+
+The key travels in the X-Container-Key header rather than the URL so it
+stays out of access logs.
+"""
+
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+
+from cryptography.exceptions import InvalidTag
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from ciphers.container import ALGORITHM_IDS, ContainerError, ContainerLayout, ContainerReader, encrypt_stream
+from jobs import FileLock
+
+containers_bp = Blueprint('containers', __name__)
+
+KEY_HEADER = 'X-Container-Key'
+CONTAINER_ID = re.compile(r'^[A-Za-z0-9_-]{22}$')
+
+
+class _LimitedReader:
+    """Wraps the request stream and stops once more than `limit` bytes have been read."""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise RequestEntityTooLarge()
+        return data
+
+
+class ContainerLimitError(OverflowError):
+    """A container refused by one of the per-user limits, with the HTTP status to report."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class ContainerStore:
+    """
+    Stored containers and their owners.
+
+    A container is <id>.clxc with <id>.json beside it holding the owner, the
+    bytes it uses and when it was stored. An upload reserves its byte limit in
+    the metadata before it starts, so concurrent uploads by one user can't
+    exceed the quota together. A lock file covers reserving and sweeping
+    expired containers.
+    """
+
+    def __init__(self):
+        self.directory = None
+
+    def configure(self, directory, ttl_seconds=7 * 24 * 3600, max_per_owner=20,
+                  quota_bytes=8 * 1024 ** 3, max_bytes=4 * 1024 ** 3):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_per_owner = max_per_owner
+        self.quota_bytes = quota_bytes
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = FileLock(os.path.join(directory, 'containers.lock'))
+
+    def reserve(self, owner):
+        """
+        Start storing a container for owner.
+
+        Raises ContainerLimitError when the owner has too many containers or no quota left.
+
+        Returns:
+            tuple: (container_id, most plaintext bytes the upload may send)
+        """
+        with self._lock:
+            owned = [meta for meta in self._sweep_locked() if meta["owner"] == owner]
+            if len(owned) >= self.max_per_owner:
+                raise ContainerLimitError(f"At most {self.max_per_owner} containers can be stored at once", 429)
+            remaining = self.quota_bytes - sum(meta["bytes"] for meta in owned)
+            if remaining <= 0:
+                raise ContainerLimitError("Container storage quota reached; delete a container first", 413)
+
+            container_id = secrets.token_urlsafe(16)
+            limit = min(self.max_bytes, remaining)
+            self._write_meta(container_id, {"owner": owner, "bytes": limit, "created": time.time(), "stored": False})
+        return container_id, limit
+
+    def store(self, container_id, partial):
+        """Move a finished upload into place and charge its real size to the owner."""
+        meta = self._read_meta(container_id)
+        os.replace(partial, self._container_file(container_id))
+        meta.update(bytes=os.path.getsize(self._container_file(container_id)), stored=True)
+        self._write_meta(container_id, meta)
+
+    def discard(self, container_id):
+        """Remove a container (or a failed upload's reservation)."""
+        for path in (self._container_file(container_id), self._meta_file(container_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def path(self, container_id, owner):
+        """Path of a stored container of owner, or None."""
+        if not isinstance(container_id, str) or not CONTAINER_ID.match(container_id):
+            return None
+        meta = self._read_meta(container_id)
+        if meta is None or meta["owner"] != owner or not meta["stored"] or self._expired(meta):
+            return None
+        path = self._container_file(container_id)
+        return path if os.path.isfile(path) else None
+
+    def _container_file(self, container_id):
+        return os.path.join(self.directory, f"{container_id}.clxc")
+
+    def _meta_file(self, container_id):
+        return os.path.join(self.directory, f"{container_id}.json")
+
+    def _read_meta(self, container_id):
+        try:
+            with open(self._meta_file(container_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_meta(self, container_id, meta):
+        descriptor, partial = tempfile.mkstemp(dir=self.directory, suffix='.meta')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(meta, f)
+            os.replace(partial, self._meta_file(container_id))
+        except BaseException:
+            os.unlink(partial)
+            raise
+
+    def _expired(self, meta):
+        return meta["created"] < time.time() - self.ttl_seconds
+
+    def _sweep_locked(self):
+        """Delete expired containers and leftovers of failed uploads; return the metadata of the others."""
+        cutoff = time.time() - self.ttl_seconds
+        active = []
+        for name in os.listdir(self.directory):
+            container_id, extension = os.path.splitext(name)
+            path = os.path.join(self.directory, name)
+            if extension == '.json' and CONTAINER_ID.match(container_id):
+                meta = self._read_meta(container_id)
+                if meta is None or self._expired(meta):
+                    self.discard(container_id)
+                else:
+                    active.append(meta)
+            elif extension in ('.clxc', '.partial', '.meta'):
+                # Containers without metadata and temporary files of interrupted uploads
+                try:
+                    orphaned = extension != '.clxc' or not os.path.exists(self._meta_file(container_id))
+                    if orphaned and os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        return active
+
+
+container_store = ContainerStore()
+
+
+def init_containers(app):
+    config = app.config
+    container_store.configure(
+        directory=config['CONTAINER_DIR'],
+        ttl_seconds=config['CONTAINER_TTL'],
+        max_per_owner=config['CONTAINER_MAX_PER_USER'],
+        quota_bytes=config['CONTAINER_QUOTA_BYTES'],
+        max_bytes=config['CONTAINER_MAX_BYTES']
+    )
+
+
+def _own_container(container_id):
+    return container_store.path(container_id, get_jwt_identity())
+
+
+def _key():
+    return request.headers.get(KEY_HEADER, '')
+
+
+@containers_bp.route('', methods=['POST'])
+@jwt_required()
+def create_container():
+    key = _key()
+    if not key:
+        return jsonify({"error": f"The key is required in the {KEY_HEADER} header"}), 400
+
+    config = current_app.config
+    algorithm = request.args.get('algorithm', 'aes-gcm').lower()
+    if algorithm not in ALGORITHM_IDS:
+        return jsonify({"error": f"Unsupported algorithm: {algorithm}"}), 400
+    chunk_size = request.args.get('chunk_size', config['CONTAINER_CHUNK_SIZE'], type=int)
+
+    limit = config['CONTAINER_MAX_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({"error": f"Containers are limited to {limit} bytes"}), 413
+
+    try:
+        container_id, limit = container_store.reserve(get_jwt_identity())
+    except ContainerLimitError as e:
+        return jsonify({"error": str(e)}), e.status
+    if request.content_length is not None and request.content_length > limit:
+        container_store.discard(container_id)
+        return jsonify({"error": f"Only {limit} bytes of your container quota are left"}), 413
+
+    descriptor, partial = tempfile.mkstemp(dir=container_store.directory, suffix='.partial')
+    try:
+        with os.fdopen(descriptor, 'wb') as destination:
+            result = encrypt_stream(
+                _LimitedReader(request.stream, limit), destination, key,
+                algorithm, chunk_size, config['CONTAINER_WORKERS']
+            )
+        container_store.store(container_id, partial)
+    except RequestEntityTooLarge:
+        os.unlink(partial)
+        container_store.discard(container_id)
+        return jsonify({"error": f"Containers are limited to {limit} bytes"}), 413
+    except ValueError as e:
+        os.unlink(partial)
+        container_store.discard(container_id)
+        return jsonify({"error": str(e)}), 400
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        container_store.discard(container_id)
+        raise
+
+    return jsonify({"id": container_id, **result}), 201
+
+
+@containers_bp.route('/<container_id>', methods=['DELETE'])
+@jwt_required()
+def delete_container(container_id):
+    if _own_container(container_id) is None:
+        return jsonify({"error": "Container not found"}), 404
+    container_store.discard(container_id)
+    return '', 204
+
+
+@containers_bp.route('/<container_id>', methods=['GET'])
+@jwt_required()
+def get_container(container_id):
+    path = _own_container(container_id)
+    if path is None:
+        return jsonify({"error": "Container not found"}), 404
+    # conditional=True answers Range requests with 206 and the requested bytes
+    return send_file(path, mimetype='application/octet-stream', conditional=True, etag=True)
+
+
+@containers_bp.route('/<container_id>/index', methods=['GET'])
+@jwt_required()
+def get_container_index(container_id):
+    path = _own_container(container_id)
+    if path is None:
+        return jsonify({"error": "Container not found"}), 404
+    try:
+        with open(path, 'rb') as f:
+            return jsonify(ContainerLayout.read(f).describe(with_index=True))
+    except ContainerError as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@containers_bp.route('/<container_id>/plaintext', methods=['GET'])
+@jwt_required()
+def get_container_plaintext(container_id):
+    path = _own_container(container_id)
+    if path is None:
+        return jsonify({"error": "Container not found"}), 404
+    key = _key()
+    if not key:
+        return jsonify({"error": f"The key is required in the {KEY_HEADER} header"}), 400
+
+    f = open(path, 'rb')
+    try:
+        reader = ContainerReader(f, key, current_app.config['CONTAINER_WORKERS'])
+    except InvalidTag:
+        f.close()
+        return jsonify({"error": "Authentication failed: wrong key, or the container has been modified"}), 400
+    except ContainerError as e:
+        f.close()
+        return jsonify({"error": str(e)}), 500
+
+    size = reader.size
+    start, stop, status = 0, size, 200
+    if request.range is not None:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            f.close()
+            response = jsonify({"error": "Only a single satisfiable byte range is supported"})
+            response.status_code = 416
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        start, stop = byte_range
+        status = 206
+
+    def generate():
+        # A chunk that fails authentication mid-stream aborts the response
+        try:
+            yield from reader.iter_range(start, stop)
+        finally:
+            f.close()
+
+    response = Response(generate(), status=status, mimetype='application/octet-stream')
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(stop - start)
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    return response
@@ -0,0 +1,166 @@
+"""
+Database connection pool settings and metrics.
+
+Engine options are read from the environment (see build_engine_options) and
+the QueuePool is replaced with InstrumentedQueuePool, which records how long
+requests wait to check out a connection and how often the pool times out.
+Those go to the metrics registry as well as pool_metrics (used by the load
+test); publish_pool_gauges adds pool usage and saturation at scrape time.
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from metrics import metrics
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Thread-safe counters for connection checkouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)  # last bucket is +Inf
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool=None):
+        """
+        Return the current metrics as a dictionary.
+
+        Args:
+            pool: Optional pool to report size, usage and saturation for
+
+        Returns:
+            dict: Checkout counts, wait times and pool usage
+        """
+        with self._lock:
+            result = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_total_seconds": self.wait_total,
+                "wait_histogram": {
+                    **{str(bound): count for bound, count in zip(WAIT_BUCKETS, self.wait_buckets)},
+                    "+Inf": self.wait_buckets[-1]
+                }
+            }
+
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            result.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else 0.0
+            })
+
+        return result
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait times to pool_metrics."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            metrics.inc('db_pool_timeouts_total')
+            raise
+        waited = time.perf_counter() - started
+        pool_metrics.record_checkout(waited)
+        metrics.observe('db_pool_checkout_wait_seconds', waited)
+        return connection
+
+
+def publish_pool_gauges(pool):
+    """
+    Set the db_pool_* gauges from a pool's current usage.
+
+    Args:
+        pool: The engine's pool; only QueuePools have a size to report
+    """
+    if not isinstance(pool, QueuePool):
+        return
+    usage = pool_metrics.snapshot(pool)
+    for state in ('checked_out', 'checked_in', 'overflow'):
+        metrics.set('db_pool_connections', usage[state], state=state)
+    metrics.set('db_pool_capacity', usage['pool_size'] + max(usage['max_overflow'], 0))
+    metrics.set('db_pool_saturation', usage['saturation'])
+
+
+def _is_memory_sqlite(uri):
+    return uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') in ('sqlite:', 'sqlite:/'))
+
+
+def build_engine_options(uri):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from environment variables.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE (seconds),
+    DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT_MS (PostgreSQL only, 0 disables).
+
+    Args:
+        uri (str): The database URI the options are for
+
+    Returns:
+        dict: Keyword arguments for sqlalchemy.create_engine
+    """
+    options = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))
+    }
+
+    # In-memory SQLite uses a single shared connection; there is no pool to size
+    if _is_memory_sqlite(uri):
+        return options
+
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10))
+    })
+
+    statement_timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    if uri.startswith('postgres') and statement_timeout_ms > 0:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout_ms}'}
+
+    return options
@@ -0,0 +1,139 @@
+"""
+Live-typing sessions for incremental encryption (see ciphers/incremental.py).
+
+Each session holds one document's incremental encoder and a version number
+that goes up with every edit, so a client that sent edits out of order can
+notice and start over. Sessions expire after a period of inactivity.
+
+Sessions are kept in INCREMENTAL_SESSION_DIR, which every server process must
+share, so consecutive edits can reach different gunicorn workers. A session
+is <id>.json (the encoder state and version; it holds the cipher key, so the
+directory is private to the server user) with <id>.lock beside it, which
+keeps edits of one session from being applied at the same time. Another lock
+covers starting sessions and sweeping expired ones.
+"""
+
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+from contextlib import contextmanager
+
+from ciphers.incremental import encoder_from_state
+from jobs import FileLock
+
+SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{22}$')
+
+
+class EditSession:
+    def __init__(self, encoder, version=0):
+        self.encoder = encoder
+        self.version = version
+
+
+class EditSessions:
+    """Incremental encryption sessions in progress."""
+
+    def __init__(self):
+        self.directory = None
+
+    def configure(self, directory, ttl_seconds=900, max_sessions=1000):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._lock = FileLock(os.path.join(directory, 'sessions.lock'))
+
+    def create(self, encoder):
+        """
+        Store a new session.
+
+        Returns:
+            tuple: (session_id, session)
+        """
+        with self._lock:
+            if self._sweep_locked() >= self.max_sessions:
+                raise OverflowError("Too many editing sessions in progress")
+            session_id = secrets.token_urlsafe(16)
+            session = EditSession(encoder)
+            self._save(session_id, session)
+        return session_id, session
+
+    @contextmanager
+    def edit(self, session_id):
+        """
+        Lock a session and yield it; its state is saved when the block exits without an error.
+
+        Raises KeyError for unknown or expired sessions.
+        """
+        path = self._path(session_id)
+        with FileLock(path + '.lock'):
+            try:
+                if os.path.getmtime(path + '.json') < time.time() - self.ttl_seconds:
+                    raise KeyError(session_id)
+                with open(path + '.json') as f:
+                    stored = json.load(f)
+            except (FileNotFoundError, ValueError):  # Closed or swept
+                raise KeyError(session_id)
+            session = EditSession(encoder_from_state(stored["encoder"]), stored["version"])
+            yield session
+            # Also marks the session as active
+            self._save(session_id, session)
+
+    def close(self, session_id):
+        try:
+            path = self._path(session_id)
+        except KeyError:
+            return
+        for extension in ('.json', '.lock'):
+            try:
+                os.unlink(path + extension)
+            except FileNotFoundError:
+                pass
+
+    def _path(self, session_id):
+        if not isinstance(session_id, str) or not SESSION_ID.match(session_id):
+            raise KeyError(session_id)
+        return os.path.join(self.directory, session_id)
+
+    def _save(self, session_id, session):
+        descriptor, partial = tempfile.mkstemp(dir=self.directory, suffix='.partial')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump({"version": session.version, "encoder": session.encoder.state()}, f)
+            os.replace(partial, self._path(session_id) + '.json')
+        except BaseException:
+            os.unlink(partial)
+            raise
+
+    def _sweep_locked(self):
+        """Delete expired sessions and return the number of the others."""
+        cutoff = time.time() - self.ttl_seconds
+        active = 0
+        for name in os.listdir(self.directory):
+            session_id, extension = os.path.splitext(name)
+            if extension != '.json' or not SESSION_ID.match(session_id):
+                continue
+            try:
+                expired = os.path.getmtime(os.path.join(self.directory, name)) < cutoff
+            except FileNotFoundError:
+                continue
+            if expired:
+                self.close(session_id)
+            else:
+                active += 1
+        return active
+
+
+edit_sessions = EditSessions()
+
+
+def init_edit_sessions(app):
+    config = app.config
+    edit_sessions.configure(
+        directory=config['INCREMENTAL_SESSION_DIR'],
+        ttl_seconds=config['INCREMENTAL_SESSION_TTL'],
+        max_sessions=config['INCREMENTAL_MAX_SESSIONS']
+    )
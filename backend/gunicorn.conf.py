@@ -0,0 +1,55 @@
+"""
+Gunicorn settings for the CryptoLearn API.
+
+Run schema creation once before starting the server:
+
+    flask --app app init-db
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+All settings can be overridden with environment variables.
+"""
+
+import multiprocessing
+import os
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Cipher endpoints are CPU bound, so scale workers with cores and keep a few
+# threads per worker for requests that wait on the database or SMTP.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Process pools in the workers size themselves from this (see ciphers/pool.py),
+# and the realtime channel caps its connections by the thread count (realtime.py)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+
+# Each worker would only see the email OTPs it issued itself
+if workers > 1 and os.getenv('OTP_STORE', 'database').lower() == 'memory':
+    raise RuntimeError("OTP_STORE=memory only works with one worker; use OTP_STORE=database")
+
+# Preloading builds the app once in the master and forks it into the workers
+preload_app = os.getenv('GUNICORN_PRELOAD', 'False') == 'True'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    worker.cold_start_began = time.perf_counter()
+
+
+def post_worker_init(worker):
+    # Time from fork until the worker can accept requests (includes loading
+    # the app when preload_app is off)
+    elapsed_ms = (time.perf_counter() - worker.cold_start_began) * 1000
+    worker.log.info("Worker %s ready in %.1f ms (preload=%s)", worker.pid, elapsed_ms, preload_app)
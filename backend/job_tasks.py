@@ -0,0 +1,214 @@
+"""
+Work that background jobs can run (see jobs.py).
+
+Each task takes the job's parameters and a progress callback, and returns a
+JSON-serializable result. Tasks run inside the job worker processes and call
+report(fraction, message) every so often; report raises JobCancelled when
+the job has been cancelled, so the task stops at its next report.
+
+Tasks wrap the existing cipher functions:
+
+- encrypt, decrypt: classical.py (in chunks, with progress) and modern.py
+- hash, mac: integrity.py
+- crack-caesar, crack-vigenere, crack-substitution: the cryptanalysis modules
+- avalanche: how many output bits of a hash or HMAC change when one input
+  bit is flipped, over many random trials
+"""
+
+import hmac
+import random
+
+from ciphers.classical import apply_in_chunks, compile_cipher
+from ciphers.cryptanalysis import crack_caesar, crack_vigenere
+from ciphers.integrity import compute_hash, compute_mac, get_hash_function
+from ciphers.modern import aes_encryption, aes_decryption, des3_encryption, des3_decryption, aead_encryption, aead_decryption
+from ciphers.substitution_solver import solve_substitution, apply_substitution
+
+# Trials between progress reports in an avalanche analysis
+AVALANCHE_BATCH = 10000
+MAX_AVALANCHE_TRIALS = 10_000_000
+
+MAX_TIME_BUDGET = 600  # seconds, for substitution cracking
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _required(params, name):
+    value = params.get(name)
+    if not value:
+        raise ValueError(f"No {name} provided")
+    return value
+
+
+def _classical(method, key, text, encrypt, with_steps, report):
+    if method == 'caesar':
+        key = int(key) if key else 3  # Default shift of 3
+    elif not key:
+        raise ValueError("No key provided")
+    cipher = compile_cipher(method, key, encrypt)
+    return apply_in_chunks(cipher, text, None if with_steps else 0, lambda done: report(done / len(text)))
+
+
+def encrypt_task(params, report):
+    plaintext = _required(params, 'plaintext')
+    method = _required(params, 'method').lower()
+    key = params.get('key', '')
+    mode = (params.get('mode') or 'cbc').lower()
+    aad = params.get('aad', '')
+    with_steps = bool(params.get('with_steps', False))
+
+    if method in ('caesar', 'substitution', 'vigenere'):
+        ciphertext, steps = _classical(method, key, plaintext, True, with_steps, report)
+        return {"ciphertext": ciphertext, "steps": steps}
+
+    if not key:
+        raise ValueError("No key provided")
+    if method == 'aes' and mode == 'gcm' or method == 'chacha20':
+        algorithm = 'aes-gcm' if method == 'aes' else 'chacha20-poly1305'
+        ciphertext, iv, tag, steps = aead_encryption(plaintext, key, algorithm, aad, with_steps)
+        return {"ciphertext": ciphertext, "iv": iv, "tag": tag, "aad": aad, "steps": steps}
+    if method == 'aes':
+        ciphertext, iv, steps = aes_encryption(plaintext, key, mode, with_steps)
+    elif method == '3des':
+        ciphertext, iv, steps = des3_encryption(plaintext, key, with_steps)
+    else:
+        raise ValueError(f"Unsupported encryption method: {method}")
+    return {"ciphertext": ciphertext, "iv": iv, "steps": steps}
+
+
+def decrypt_task(params, report):
+    ciphertext = _required(params, 'ciphertext')
+    method = _required(params, 'method').lower()
+    key = params.get('key', '')
+    mode = (params.get('mode') or 'cbc').lower()
+    iv = params.get('iv', '')
+    tag = params.get('tag', '')
+    aad = params.get('aad', '')
+    with_steps = bool(params.get('with_steps', False))
+
+    if method in ('caesar', 'substitution', 'vigenere'):
+        plaintext, steps = _classical(method, key, ciphertext, False, with_steps, report)
+        return {"plaintext": plaintext, "steps": steps}
+
+    if not key:
+        raise ValueError("No key provided")
+    if method == 'aes' and mode == 'gcm' or method == 'chacha20':
+        algorithm = 'aes-gcm' if method == 'aes' else 'chacha20-poly1305'
+        plaintext, steps = aead_decryption(ciphertext, key, algorithm, _required(params, 'iv'), tag, aad, with_steps)
+    elif method == 'aes':
+        if mode != 'ecb' and not iv:
+            raise ValueError(f"IV required for AES {mode.upper()} mode")
+        plaintext, steps = aes_decryption(ciphertext, key, mode, iv, with_steps)
+    elif method == '3des':
+        plaintext, steps = des3_decryption(ciphertext, key, _required(params, 'iv'), with_steps)
+    else:
+        raise ValueError(f"Unsupported decryption method: {method}")
+    return {"plaintext": plaintext, "steps": steps}
+
+
+def hash_task(params, report):
+    algorithm = params.get('algorithm', 'sha256').lower()
+    return compute_hash(_required(params, 'message'), algorithm, bool(params.get('with_steps', False)))
+
+
+def mac_task(params, report):
+    algorithm = params.get('algorithm', 'sha256').lower()
+    return compute_mac(_required(params, 'message'), _required(params, 'key'), algorithm,
+                       bool(params.get('with_steps', False)))
+
+
+def crack_caesar_task(params, report):
+    return crack_caesar(_required(params, 'ciphertext'), top=int(params.get('top', 5)))
+
+
+def crack_vigenere_task(params, report):
+    key_length = params.get('key_length')
+    return crack_vigenere(
+        _required(params, 'ciphertext'),
+        max_key_length=int(params.get('max_key_length', 20)),
+        key_length=int(key_length) if key_length not in (None, '') else None
+    )
+
+
+def crack_substitution_task(params, report):
+    ciphertext = _required(params, 'ciphertext')
+    time_budget = float(params.get('time_budget', 30))
+    if not 0 < time_budget <= MAX_TIME_BUDGET:
+        raise ValueError(f"time_budget must be between 0 and {MAX_TIME_BUDGET} seconds")
+    # Already inside a worker process, so the restarts run inline
+    result = solve_substitution(ciphertext, time_budget=time_budget, processes=1,
+                                seed=params.get('seed'))
+    if params.get('include_plaintext'):
+        result["plaintext"] = apply_substitution(ciphertext, result["key"], encrypt=False)
+    return result
+
+
+def avalanche_task(params, report):
+    """
+    Flip one random bit of the message per trial and count the output bits that change.
+
+    Params: message, algorithm (md5, sha1, sha256, sha512), key (computes an HMAC when
+    given), trials (default 100000) and seed.
+    """
+    message = _required(params, 'message').encode('utf-8')
+    algorithm = params.get('algorithm', 'sha256').lower()
+    hash_function = get_hash_function(algorithm)
+    key = params.get('key', '')
+    trials = int(params.get('trials', 100000))
+    if not 1 <= trials <= MAX_AVALANCHE_TRIALS:
+        raise ValueError(f"trials must be between 1 and {MAX_AVALANCHE_TRIALS}")
+    rng = random.Random(params.get('seed'))
+
+    if key:
+        key_bytes = key.encode('utf-8')
+
+        def digest(data):
+            return hmac.new(key_bytes, data, hash_function).digest()
+    else:
+        def digest(data):
+            return hash_function(data).digest()
+
+    original = int.from_bytes(digest(message), 'big')
+    output_bits = hash_function().digest_size * 8
+    input_bits = len(message) * 8
+    histogram = [0] * (output_bits + 1)
+    flipped = bytearray(message)
+
+    for done in range(0, trials, AVALANCHE_BATCH):
+        for _ in range(min(AVALANCHE_BATCH, trials - done)):
+            bit = rng.randrange(input_bits)
+            flipped[bit >> 3] ^= 0x80 >> (bit & 7)
+            changed = (int.from_bytes(digest(flipped), 'big') ^ original).bit_count()
+            flipped[bit >> 3] ^= 0x80 >> (bit & 7)
+            histogram[changed] += 1
+        report(min(done + AVALANCHE_BATCH, trials) / trials)
+
+    total = sum(changed * count for changed, count in enumerate(histogram))
+    mean = total / trials
+    variance = sum(count * (changed - mean) ** 2 for changed, count in enumerate(histogram)) / trials
+    return {
+        "algorithm": f"hmac-{algorithm}" if key else algorithm,
+        "trials": trials,
+        "output_bits": output_bits,
+        "mean_bits_changed": round(mean, 4),
+        "mean_fraction_changed": round(mean / output_bits, 6),
+        "stdev_bits_changed": round(variance ** 0.5, 4),
+        "min_bits_changed": next(changed for changed, count in enumerate(histogram) if count),
+        "max_bits_changed": max(changed for changed, count in enumerate(histogram) if count),
+        # Only the populated part of the distribution
+        "histogram": {str(changed): count for changed, count in enumerate(histogram) if count}
+    }
+
+
+JOB_TASKS = {
+    'encrypt': encrypt_task,
+    'decrypt': decrypt_task,
+    'hash': hash_task,
+    'mac': mac_task,
+    'crack-caesar': crack_caesar_task,
+    'crack-vigenere': crack_vigenere_task,
+    'crack-substitution': crack_substitution_task,
+    'avalanche': avalanche_task
+}
@@ -0,0 +1,706 @@
+"""
+Background jobs for crypto work too long for a single request.
+
+- POST /jobs submits {"type", "params", "priority"} and returns 202 with the
+  job's ID. The types and their params are listed in job_tasks.py.
+- GET /jobs lists the caller's jobs and GET /jobs/<id> reports one job's
+  status and progress (0 to 1).
+- GET /jobs/<id>/events streams the same status as Server-Sent Events until
+  the job finishes. EventSource can't send headers, so this route also takes
+  a stream token in the `token` query parameter. POST /jobs/<id>/events/token
+  issues one; it is only good for opening that job's events, and only for
+  EVENT_TOKEN_TTL seconds, so it is harmless in an access log.
+  A stream holds a request thread while it is open, so each worker keeps at
+  most JOBS_MAX_EVENT_STREAMS open (JOBS_MAX_EVENT_STREAMS_PER_USER per
+  user) and answers 503 beyond that; polling GET /jobs/<id> always works.
+  A stream ends after JOBS_EVENT_STREAM_SECONDS with a `reconnect` event
+  carrying a fresh stream token.
+- GET /jobs/<id>/result returns the result once the job has succeeded.
+- DELETE /jobs/<id> cancels a queued or running job, or deletes a finished
+  one. A running job stops at its next progress report.
+
+The queue lives in JOBS_DIR, so every server worker shares it:
+
+- <id>.json: the job's status
+- <id>.params.json: its parameters, from submission until it finishes
+- <id>.result.json: the result of a job that succeeded
+- <id>.cancel: asks a running job to stop
+
+Any worker accepts jobs and answers for them. The per-user queue limit
+(JOBS_MAX_QUEUED_PER_USER) is checked under a lock on queue.lock. Only one
+worker runs jobs: the one holding the lock on runner.lock owns a pool of
+JOBS_PROCESSES processes and starts queued jobs in priority order (high,
+normal, low, then oldest first), with no user having more than
+JOBS_MAX_RUNNING_PER_USER jobs running at once; the next job in line from
+another user goes first instead. If that worker exits, the next worker to
+handle a jobs request takes over and marks the jobs that were running as
+failed.
+
+Files are deleted JOBS_RESULT_TTL seconds after the job finishes.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from ciphers.pool import create_executor
+from job_tasks import JOB_TASKS, JobCancelled
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows, where a single process serves and runs jobs
+    fcntl = None
+
+jobs_bp = Blueprint('jobs', __name__)
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+FINISHED = frozenset(['succeeded', 'failed', 'cancelled'])
+JOB_ID = re.compile(r'^[A-Za-z0-9_-]{22}$')
+
+# Seconds between progress reports sent from a worker process
+PROGRESS_INTERVAL = 0.25
+
+# Seconds between checks for changes in /events, and between keep-alive comments
+EVENT_POLL_INTERVAL = 0.5
+EVENT_KEEPALIVE = 15
+
+# Seconds a stream token can be used to open /events
+EVENT_TOKEN_TTL = 60
+
+# Milliseconds an EventSource waits before reconnecting after a stream ends
+EVENT_RETRY_MS = 1000
+
+# Seconds between checks for jobs queued by other server workers
+DISPATCH_INTERVAL = 0.5
+
+# Seconds between sweeps for expired job files
+SWEEP_INTERVAL = 60
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def _write_json(path, value):
+    """Write a JSON file atomically, so readers never see a partial file."""
+    descriptor, partial = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.partial')
+    try:
+        with os.fdopen(descriptor, 'w') as f:
+            json.dump(value, f)
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _status_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.json")
+
+
+def _params_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.params.json")
+
+
+def _result_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.result.json")
+
+
+def _cancel_path(directory, job_id):
+    return os.path.join(directory, f"{job_id}.cancel")
+
+
+class FileLock:
+    """Exclusive lock on a file, held across threads and processes while in a with block."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()  # flock doesn't keep out other threads of this process
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            self._file.close()  # Releases the lock
+            self._file = None
+        self._lock.release()
+
+
+# Worker process side
+
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_job(job_id, job_type, directory):
+    """Run one job in a worker process and write its result file. Returns the result size in bytes."""
+    cancel_marker = _cancel_path(directory, job_id)
+    last_report = 0.0
+
+    def report(fraction, message=None):
+        nonlocal last_report
+        if os.path.exists(cancel_marker):
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            _progress_queue.put((job_id, min(float(fraction), 1.0), message))
+
+    report(0.0)
+    with open(_params_path(directory, job_id)) as f:
+        params = json.load(f)
+    result = JOB_TASKS[job_type](params, report)
+    path = _result_path(directory, job_id)
+    _write_json(path, result)
+    return os.path.getsize(path)
+
+
+# Server side
+
+class WorkerPool:
+    """A process pool and the thread that receives its workers' progress reports."""
+
+    def __init__(self, processes, on_progress):
+        # Workers are spawned (see ciphers/pool.py), so they don't inherit the runner lock
+        self.progress_queue = multiprocessing.get_context('spawn').Queue()
+        self.executor = create_executor(processes, _init_worker, (self.progress_queue,))
+        self._receiver = threading.Thread(target=self._receive, args=(on_progress,), daemon=True)
+        self._receiver.start()
+
+    def _receive(self, on_progress):
+        while True:
+            report = self.progress_queue.get()
+            if report is None:
+                return
+            on_progress(*report)
+
+    def close(self):
+        """Stop the pool and its progress receiver (must not be called holding a lock on_progress takes)."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.progress_queue.put(None)
+        self._receiver.join()
+        self.progress_queue.close()
+
+
+class JobQueue:
+    """Priority queue of jobs in JOBS_DIR in front of a process pool, with per-user limits."""
+
+    def __init__(self):
+        self.directory = None
+        self.processes = 1
+        self.max_running_per_user = 1
+        self.max_queued_per_user = 10
+        self.result_ttl = 86400
+        self.logger = None
+        self._queue_lock = None
+        self._runner_file = None  # Open (and locked) while this process runs jobs
+        self._runner = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._pool = None
+        self._active = {}  # job ID -> status of the jobs this process is running
+        self._running = Counter()  # user -> jobs running
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, directory, processes, max_running_per_user, max_queued_per_user, result_ttl, logger=None):
+        self.shutdown()
+        self.directory = directory
+        self.processes = processes
+        self.max_running_per_user = max_running_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.result_ttl = result_ttl
+        self.logger = logger
+        self._queue_lock = FileLock(os.path.join(directory, 'queue.lock'))
+
+    def submit(self, user, job_type, params, priority='normal'):
+        """
+        Queue a job.
+
+        Args:
+            user (str): Owner's JWT identity
+            job_type (str): A key of JOB_TASKS
+            params (dict): The task's parameters
+            priority (str): high, normal or low
+
+        Returns:
+            dict: The job's status
+        """
+        if job_type not in JOB_TASKS:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if priority not in PRIORITIES:
+            raise ValueError("priority must be high, normal or low")
+        if not isinstance(params, dict):
+            raise ValueError("params must be an object")
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Checked again under the lock; this spares writing the params of a job that will be refused
+        self._check_queued(user)
+
+        status = {
+            "id": secrets.token_urlsafe(16),
+            "user": user,
+            "type": job_type,
+            "priority": priority,
+            "status": 'queued',
+            "progress": 0.0,
+            "message": None,
+            "error": None,
+            "result_bytes": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None
+        }
+        params_path = _params_path(self.directory, status["id"])
+        _write_json(params_path, params)
+        try:
+            with self._queue_lock:
+                self._check_queued(user)
+                self._save(status)
+        except BaseException:
+            os.unlink(params_path)
+            raise
+
+        self._ensure_runner()
+        self._wake.set()
+        return status
+
+    def status(self, job_id):
+        """A job's status, from its status file."""
+        return _read_json(_status_path(self.directory, job_id))
+
+    def list(self, user):
+        self._ensure_runner()
+        jobs = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            job_id, extension = os.path.splitext(name)
+            if extension == '.json' and JOB_ID.match(job_id):
+                status = self.status(job_id)
+                if status is not None and status["user"] == user:
+                    jobs.append(status)
+        return sorted(jobs, key=lambda status: status["created_at"], reverse=True)
+
+    def result_path(self, job_id):
+        return _result_path(self.directory, job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+
+        Queued jobs are cancelled at once. A running job gets a marker file
+        that it notices at its next progress report.
+        """
+        with self._queue_lock:
+            status = self.status(job_id)
+            if status is not None and status["status"] == 'queued':
+                self._finish(status, 'cancelled')
+                return
+        open(_cancel_path(self.directory, job_id), 'a').close()
+
+    def delete(self, job_id):
+        """Delete a finished job's files."""
+        for path in (_status_path(self.directory, job_id), _params_path(self.directory, job_id),
+                     _result_path(self.directory, job_id), _cancel_path(self.directory, job_id)):
+            _unlink(path)
+
+    def shutdown(self):
+        """Stop running jobs in this process and give up the runner lock (for tests and reconfiguration)."""
+        with self._lock:
+            runner, pool = self._runner, self._pool
+            self._stopping = True
+        self._wake.set()
+        if runner is not None:
+            runner.join()
+        if pool is not None:
+            pool.close()
+        with self._lock:
+            if self._runner_file is not None:
+                self._runner_file.close()
+            self._runner_file = self._runner = self._pool = None
+            self._active.clear()
+            self._running.clear()
+            self._stopping = False
+            self._wake.clear()
+
+    def _save(self, status):
+        _write_json(_status_path(self.directory, status["id"]), status)
+
+    def _finish(self, status, state):
+        status["status"] = state
+        status["finished_at"] = _now()
+        self._save(status)
+        _unlink(_params_path(self.directory, status["id"]))
+        _unlink(_cancel_path(self.directory, status["id"]))
+
+    def _queued(self):
+        """Statuses of the queued jobs, in the order they should start."""
+        jobs = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.params.json'):
+                status = self.status(name[:-len('.params.json')])
+                if status is not None and status["status"] == 'queued':
+                    jobs.append(status)
+        return sorted(jobs, key=lambda status: (PRIORITIES[status["priority"]], status["created_at"], status["id"]))
+
+    def _check_queued(self, user):
+        queued = sum(1 for status in self._queued() if status["user"] == user)
+        if queued >= self.max_queued_per_user:
+            raise OverflowError(f"At most {self.max_queued_per_user} jobs can be queued per user")
+
+    def _ensure_runner(self):
+        """Run jobs in this process if no other server process does."""
+        with self._lock:
+            if self._runner is not None or self._stopping:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            runner_file = open(os.path.join(self.directory, 'runner.lock'), 'a')
+            if fcntl is not None:
+                try:
+                    fcntl.flock(runner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    runner_file.close()
+                    return
+            self._runner_file = runner_file
+            self._runner = threading.Thread(target=self._run, daemon=True)
+            self._runner.start()
+
+    def _run(self):
+        self._recover()
+        while not self._stopping:
+            try:
+                self._dispatch()
+                self._sweep()
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception("Job dispatch failed")
+            self._wake.wait(DISPATCH_INTERVAL)
+            self._wake.clear()
+
+    def _recover(self):
+        """Fail the jobs a previous runner left running when its process exited."""
+        with self._queue_lock:
+            for name in os.listdir(self.directory):
+                if name.endswith('.params.json'):
+                    status = self.status(name[:-len('.params.json')])
+                    if status is not None and status["status"] == 'running':
+                        status["error"] = "The job was interrupted by a server restart"
+                        self._finish(status, 'failed')
+
+    def _dispatch(self):
+        """Start queued jobs while there are idle workers, skipping users at their limit."""
+        with self._lock:
+            idle = self.processes - len(self._active)
+        if idle <= 0:
+            return
+        started = []
+        # Claimed under the queue lock, so a cancel from another server process can't race the start
+        with self._queue_lock:
+            for status in self._queued():
+                if idle == 0:
+                    break
+                if os.path.exists(_cancel_path(self.directory, status["id"])):
+                    self._finish(status, 'cancelled')
+                    continue
+                with self._lock:
+                    if self._stopping or self._running[status["user"]] >= self.max_running_per_user:
+                        continue
+                    if self._pool is None:
+                        self._pool = WorkerPool(self.processes, self._progress)
+                    pool = self._pool
+                    status["status"] = 'running'
+                    status["started_at"] = _now()
+                    self._save(status)
+                    self._active[status["id"]] = status
+                    self._running[status["user"]] += 1
+                    future = pool.executor.submit(_run_job, status["id"], status["type"], self.directory)
+                started.append((status, pool, future))
+                idle -= 1
+        # A callback added to a future that has already finished runs at once, so no lock may be held
+        for status, pool, future in started:
+            future.add_done_callback(lambda future, status=status, pool=pool: self._completed(status, pool, future))
+
+    def _completed(self, status, pool, future):
+        broken = None
+        with self._lock:
+            self._active.pop(status["id"], None)
+            self._running[status["user"]] -= 1
+            try:
+                status["result_bytes"] = future.result()
+                status["progress"] = 1.0
+                self._finish(status, 'succeeded')
+            except JobCancelled:
+                self._finish(status, 'cancelled')
+            except BrokenProcessPool:
+                # A worker died (killed, or out of memory); the next job gets a fresh pool
+                if self._pool is pool:
+                    broken, self._pool = pool, None
+                status["error"] = "The job's worker process exited unexpectedly"
+                self._finish(status, 'failed')
+            except Exception as e:
+                status["error"] = str(e) or type(e).__name__
+                self._finish(status, 'failed')
+        if broken is not None:
+            broken.close()
+        self._wake.set()
+
+    def _progress(self, job_id, progress, message):
+        with self._lock:
+            status = self._active.get(job_id)
+            if status is None:
+                return
+            status["progress"] = progress
+            status["message"] = message
+            self._save(status)
+
+    def _sweep(self):
+        """Delete the files of jobs that finished more than result_ttl seconds ago."""
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        cutoff = now - self.result_ttl
+        for name in os.listdir(self.directory):
+            job_id, extension = os.path.splitext(name)
+            if extension != '.json' or not JOB_ID.match(job_id):
+                continue
+            status = self.status(job_id)
+            path = _status_path(self.directory, job_id)
+            try:
+                expired = status is not None and status["status"] in FINISHED and os.path.getmtime(path) < cutoff
+            except FileNotFoundError:
+                continue
+            if expired:
+                self.delete(job_id)
+
+
+job_queue = JobQueue()
+
+
+def init_jobs(app):
+    config = app.config
+    job_queue.configure(
+        directory=config['JOBS_DIR'],
+        processes=config['JOBS_PROCESSES'],
+        max_running_per_user=config['JOBS_MAX_RUNNING_PER_USER'],
+        max_queued_per_user=config['JOBS_MAX_QUEUED_PER_USER'],
+        result_ttl=config['JOBS_RESULT_TTL'],
+        logger=app.logger
+    )
+
+
+class EventStreams:
+    """/events streams open in this process, by user."""
+
+    def __init__(self):
+        self._open = Counter()
+        self._lock = threading.Lock()
+
+    def open(self, user, max_streams, max_per_user):
+        """Count a new stream for user; False if a limit is reached."""
+        with self._lock:
+            if sum(self._open.values()) >= max_streams or self._open[user] >= max_per_user:
+                return False
+            self._open[user] += 1
+            return True
+
+    def close(self, user):
+        with self._lock:
+            self._open[user] -= 1
+            if self._open[user] <= 0:
+                del self._open[user]
+
+
+event_streams = EventStreams()
+
+
+def _event_tokens():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='job-events')
+
+
+def _own_job(job_id, user=None):
+    """The caller's job status, or None (also for other users' jobs, so IDs can't be probed)."""
+    if not JOB_ID.match(job_id):
+        return None
+    status = job_queue.status(job_id)
+    if status is None or status["user"] != (user if user is not None else get_jwt_identity()):
+        return None
+    job_queue._ensure_runner()
+    return status
+
+
+@jobs_bp.route('', methods=['POST'])
+@jwt_required()
+def submit_job():
+    limit = current_app.config['JOBS_MAX_REQUEST_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({"error": f"Job requests are limited to {limit} bytes"}), 413
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    try:
+        status = job_queue.submit(
+            get_jwt_identity(),
+            data.get('type', ''),
+            data.get('params', {}),
+            data.get('priority', 'normal')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except OverflowError as e:
+        return jsonify({"error": str(e)}), 429
+
+    response = jsonify(status)
+    response.status_code = 202
+    response.headers['Location'] = f"{request.path.rstrip('/')}/{status['id']}"
+    return response
+
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    return jsonify({"jobs": job_queue.list(get_jwt_identity())})
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    status = _own_job(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
+
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    status = _own_job(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    if status["status"] != 'succeeded':
+        return jsonify({"error": f"Job is {status['status']}", "status": status["status"]}), 409
+    try:
+        f = open(job_queue.result_path(job_id), 'rb')
+    except FileNotFoundError:
+        return jsonify({"error": "Job result has expired"}), 404
+    # The result file is already JSON, so it is streamed as is
+    return Response(f, mimetype='application/json')
+
+
+@jobs_bp.route('/<job_id>/events/token', methods=['POST'])
+@jwt_required()
+def create_events_token(job_id):
+    if _own_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    token = _event_tokens().dumps({"job": job_id, "user": get_jwt_identity()})
+    return jsonify({"token": token, "expires_in": EVENT_TOKEN_TTL})
+
+
+@jobs_bp.route('/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    token = request.args.get('token')
+    if token is not None:
+        try:
+            claims = _event_tokens().loads(token, max_age=EVENT_TOKEN_TTL)
+        except BadSignature:  # Also raised for expired tokens
+            return jsonify({"error": "Invalid or expired stream token"}), 401
+        if claims.get("job") != job_id:
+            return jsonify({"error": "Invalid or expired stream token"}), 401
+        user = claims["user"]
+    else:
+        verify_jwt_in_request()
+        user = get_jwt_identity()
+
+    status = _own_job(job_id, user)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    config = current_app.config
+    if not event_streams.open(user, config['JOBS_MAX_EVENT_STREAMS'], config['JOBS_MAX_EVENT_STREAMS_PER_USER']):
+        response = jsonify({"error": "Too many progress streams are open; poll GET /jobs/<id> instead"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(EVENT_KEEPALIVE)
+        return response
+
+    tokens = _event_tokens()
+    stream_seconds = config['JOBS_EVENT_STREAM_SECONDS']
+
+    def generate(status):
+        last_sent = None
+        last_write = time.monotonic()
+        # Each stream holds a request thread, so it is closed after a while and the client reconnects
+        ends = last_write + stream_seconds
+        yield f"retry: {EVENT_RETRY_MS}\n\n"
+        while status is not None:
+            if time.monotonic() >= ends:
+                token = tokens.dumps({"job": job_id, "user": user})
+                yield f"event: reconnect\ndata: {json.dumps({'token': token})}\n\n"
+                return
+            if status != last_sent:
+                event = 'done' if status["status"] in FINISHED else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(status)}\n\n"
+                last_sent = status
+                last_write = time.monotonic()
+                if event == 'done':
+                    return
+            elif time.monotonic() - last_write >= EVENT_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                last_write = time.monotonic()
+            time.sleep(EVENT_POLL_INTERVAL)
+            status = job_queue.status(job_id)
+
+    response = Response(generate(status), mimetype='text/event-stream')
+    response.call_on_close(lambda: event_streams.close(user))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
+
+@jobs_bp.route('/<job_id>', methods=['DELETE'])
+@jwt_required()
+def delete_job(job_id):
+    status = _own_job(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    if status["status"] in FINISHED:
+        job_queue.delete(job_id)
+        return '', 204
+    job_queue.cancel(job_id)
+    return jsonify(job_queue.status(job_id)), 202
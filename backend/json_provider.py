@@ -0,0 +1,108 @@
+"""
+JSON providers for the Flask app.
+
+Cipher and hash responses carry long step lists, so JSON encoding is a large
+share of request time. OrjsonProvider uses orjson when it is installed and
+writes response bodies as bytes directly; StdlibJSONProvider is the fallback.
+Both leave keys unsorted (sorting is pure overhead for these payloads) and
+hand off to negotiation.binary_response when the client asked for
+MessagePack or CBOR.
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import metrics
+from negotiation import binary_response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider without key sorting."""
+
+    sort_keys = False
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with metrics.time('json_serialization_duration_seconds', format='json'):
+            return binary_response(self._app, obj) or super().response(obj)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, producing the same document shapes."""
+
+    sort_keys = False
+
+    # Datetimes go through Flask's default() so they keep the HTTP date format
+    _base_options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps_bytes(self, obj, indent=False, sort_keys=None):
+        """Serialize obj to UTF-8 encoded JSON bytes."""
+        if sort_keys is None:
+            sort_keys = self.sort_keys
+
+        option = self._base_options
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except TypeError:
+            # orjson rejects some values the stdlib accepts (e.g. integers wider than 64 bits)
+            return json.dumps(
+                obj, default=self.default, ensure_ascii=False,
+                indent=2 if indent else None, sort_keys=sort_keys
+            ).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(
+            obj,
+            indent=kwargs.get('indent') is not None,
+            sort_keys=kwargs.get('sort_keys', self.sort_keys)
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with metrics.time('json_serialization_duration_seconds', format='json'):
+            binary = binary_response(self._app, obj)
+            if binary is not None:
+                return binary
+            indent = self.compact is False or (self.compact is None and self._app.debug)
+            body = self.dumps_bytes(obj, indent=indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+PROVIDERS = {
+    'orjson': OrjsonProvider,
+    'stdlib': StdlibJSONProvider
+}
+
+
+def create_json_provider(app):
+    """
+    Build the JSON provider selected by the JSON_PROVIDER config value.
+
+    'auto' picks orjson when it is importable and the standard library otherwise.
+    """
+    name = app.config.get('JSON_PROVIDER', 'auto').lower()
+
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+
+    if name not in PROVIDERS:
+        raise ValueError(f"Unsupported JSON provider: {name}")
+
+    if name == 'orjson' and orjson is None:
+        raise ValueError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+
+    return PROVIDERS[name](app)
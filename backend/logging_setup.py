@@ -0,0 +1,175 @@
+"""
+Structured, non-blocking logging.
+
+init_logging() routes every logger through a queue:
+
+- Request threads only check the level, apply sampling and enqueue the
+  LogRecord. Messages use %-style arguments, so nothing is formatted for
+  records that are dropped, and formatting happens on the listener thread.
+- A QueueListener thread redacts secrets (JWTs, bearer tokens and sensitive
+  `extra` fields), formats the record as text or one JSON object per line,
+  and writes it to stderr.
+
+High-volume events can be sampled by passing extra=sampled(rate); kept
+records carry the rate so counts can be scaled back up.
+
+Because arguments are formatted later on another thread, log immutable
+values (ids, strings, numbers) rather than objects that may change after the
+call.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask.logging import default_handler
+
+REDACTED = '[REDACTED]'
+
+# `extra` fields whose values are never written out
+SENSITIVE_FIELDS = frozenset([
+    'password', 'token', 'access_token', 'refresh_token', 'authorization',
+    'secret', 'totp_secret', 'otp', 'code', 'key', 'mac'
+])
+
+SECRET_PATTERNS = [
+    re.compile(r'eyJ[\w-]{5,}\.[\w-]{5,}\.[\w-]+'),  # JWTs
+    re.compile(r'(?i)(bearer\s+)\S+'),
+    re.compile(r'(?i)(otpauth://\S*?secret=)[A-Z2-7]+')
+]
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def sampled(rate):
+    """`extra` for a log call that should only be kept for a fraction `rate` of calls."""
+    return {'sample_rate': rate}
+
+
+def redact(text):
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(lambda match: (match.group(1) if match.groups() else '') + REDACTED, text)
+    return text
+
+
+class SamplingFilter(logging.Filter):
+    """Drops records carrying a sample_rate with probability 1 - sample_rate."""
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        return rate is None or random.random() < rate
+
+
+class RedactingFilter(logging.Filter):
+    """Removes secrets from the formatted message and from sensitive `extra` fields."""
+
+    def filter(self, record):
+        for field in SENSITIVE_FIELDS.intersection(record.__dict__):
+            setattr(record, field, REDACTED)
+        # Render the message here (on the listener thread) so arguments are redacted too
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = redact(logging.Formatter().formatException(record.exc_info))
+            record.exc_info = None
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record with the standard fields plus any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName
+        }
+        for field, value in record.__dict__.items():
+            if field not in _RECORD_FIELDS:
+                entry[field] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _start_listener(log_queue, *handlers):
+    global _listener
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork():
+    # The listener thread started in the parent doesn't exist in a forked child
+    if _listener is not None:
+        _start_listener(_listener.queue, *_listener.handlers)
+
+
+def init_logging(app):
+    """
+    Configure logging for the app from LOG_LEVEL, LOG_FORMAT and LOG_QUEUE.
+
+    Replaces Flask's default stderr handler with a queue handler on the root
+    logger, so the app, extension and module loggers all share it.
+    """
+    _stop_listener()
+
+    level = app.config['LOG_LEVEL'].upper()
+    output = logging.StreamHandler(sys.stderr)
+    output.addFilter(RedactingFilter())
+    if app.config['LOG_FORMAT'] == 'json':
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    if app.config['LOG_QUEUE']:
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        _start_listener(log_queue, output)
+    else:
+        handler = output
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if getattr(h, 'installed_by_init_logging', False)]:
+        root.removeHandler(existing)
+    handler.installed_by_init_logging = True
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(level)
+
+
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    # gunicorn with preload_app forks workers after the listener has started
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
@@ -0,0 +1,326 @@
+"""
+Request and hot-path metrics in the Prometheus text format.
+
+Histograms and counters are kept in process memory and served by GET
+/metrics. Timers wrap the expensive parts of a request:
+
+- http_request_duration_seconds: every request, by endpoint, method and status
+- cipher_duration_seconds: cipher execution (including the inline step trace
+  of the classical and block ciphers)
+- step_generation_duration_seconds: hash/HMAC visualization steps
+- json_serialization_duration_seconds: response body encoding
+- bcrypt_duration_seconds, db_query_duration_seconds, mail_send_duration_seconds
+
+Counters record how often things happen, e.g. totp_verifications_total by
+outcome and totp_hmac_computations_total. Gauges hold values set at scrape
+time, such as the db_pool_* connection pool usage (see db_pool.py).
+
+With METRICS_ENABLED=False no request hooks or database listeners are
+installed, metrics.time() hands back a shared no-op context manager and
+metrics.inc() does nothing.
+
+Each gunicorn worker keeps its own registry, so a scrape reports the worker
+that served it; scrape workers individually or run one worker per
+container when aggregating.
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (seconds) of the default histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Reused whenever metrics are disabled
+NULL_TIMER = contextlib.nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Histogram:
+    """A labelled histogram with fixed buckets."""
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        for labelvalues, counts, total in sorted(series):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            braces = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{braces} {total!r}')
+            lines.append(f'{self.name}_count{braces} {cumulative}')
+        return '\n'.join(lines)
+
+
+class Counter:
+    """A labelled counter."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount, labelvalues):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+
+        for labelvalues, count in series:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            braces = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}{braces} {count}')
+        return '\n'.join(lines)
+
+
+class Gauge:
+    """A labelled value that is set rather than accumulated."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> value
+        self._lock = threading.Lock()
+
+    def set(self, value, labelvalues):
+        with self._lock:
+            self._series[labelvalues] = value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            series = sorted(self._series.items())
+
+        for labelvalues, value in series:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            braces = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}{braces} {value!r}')
+        return '\n'.join(lines)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'started')
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.labelvalues)
+        return False
+
+
+class Metrics:
+    """Registry of histograms, counters and gauges; disabled until init_metrics() turns it on."""
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics = {}
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._metrics[name] = histogram
+        return histogram
+
+    def counter(self, name, documentation, labelnames=()):
+        counter = Counter(name, documentation, labelnames)
+        self._metrics[name] = counter
+        return counter
+
+    def gauge(self, name, documentation, labelnames=()):
+        gauge = Gauge(name, documentation, labelnames)
+        self._metrics[name] = gauge
+        return gauge
+
+    def time(self, name, **labels):
+        """
+        Context manager that records the duration of its block.
+
+        Args:
+            name (str): Histogram name
+            **labels: String values for each of the histogram's label names
+
+        Returns:
+            A timer, or a no-op context manager when metrics are disabled
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        histogram = self._metrics[name]
+        return _Timer(histogram, tuple([labels[label] for label in histogram.labelnames]))
+
+    def observe(self, name, seconds, **labels):
+        if self.enabled:
+            histogram = self._metrics[name]
+            histogram.observe(seconds, tuple([labels[label] for label in histogram.labelnames]))
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter."""
+        if self.enabled:
+            counter = self._metrics[name]
+            counter.inc(amount, tuple([labels[label] for label in counter.labelnames]))
+
+    def set(self, name, value, **labels):
+        """Set a gauge."""
+        if self.enabled:
+            gauge = self._metrics[name]
+            gauge.set(value, tuple([labels[label] for label in gauge.labelnames]))
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+metrics = Metrics()
+
+metrics.histogram('http_request_duration_seconds', 'Time spent handling HTTP requests.',
+                  ('endpoint', 'method', 'status'))
+metrics.histogram('cipher_duration_seconds', 'Time spent running ciphers, hashes and MACs.',
+                  ('method', 'operation'))
+metrics.histogram('step_generation_duration_seconds', 'Time spent building visualization steps.',
+                  ('method', 'operation'))
+metrics.histogram('json_serialization_duration_seconds', 'Time spent serializing response bodies.',
+                  ('format',))
+metrics.histogram('bcrypt_duration_seconds', 'Time spent hashing and checking passwords.',
+                  ('operation',), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0))
+metrics.histogram('db_query_duration_seconds', 'Time spent executing database statements.',
+                  ('statement',))
+metrics.histogram('mail_send_duration_seconds', 'Time spent sending email (including failed attempts).',
+                  (), buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+metrics.counter('totp_verifications_total', 'TOTP codes checked, by outcome.', ('outcome',))
+metrics.counter('totp_hmac_computations_total', 'HOTP values computed while checking TOTP codes.')
+metrics.histogram('db_pool_checkout_wait_seconds', 'Time spent waiting to check out a database connection.',
+                  (), buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+metrics.counter('db_pool_timeouts_total', 'Connection checkouts that timed out waiting for the pool.')
+metrics.gauge('db_pool_connections', 'Database connections by state (checked_out, checked_in, overflow).',
+              ('state',))
+metrics.gauge('db_pool_capacity', 'Most connections the pool will open (pool size plus max overflow).')
+metrics.gauge('db_pool_saturation', 'Fraction of the pool capacity that is checked out.')
+
+# Known methods/algorithms keep request-supplied values out of label sets
+CIPHER_METHODS = frozenset([
+    'caesar', 'substitution', 'vigenere', 'aes', 'chacha20', '3des', 'md5', 'sha1', 'sha256', 'sha512'
+])
+STATEMENT_TYPES = frozenset(['SELECT', 'INSERT', 'UPDATE', 'DELETE'])
+HTTP_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+_db_listeners_installed = False
+
+
+def cipher_label(method):
+    """Label value for a cipher method or hash algorithm taken from a request."""
+    return method if method in CIPHER_METHODS else 'other'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        rule = request.url_rule
+        metrics.observe(
+            'http_request_duration_seconds', time.perf_counter() - started,
+            endpoint=rule.rule if rule is not None else 'unmatched',
+            method=request.method if request.method in HTTP_METHODS else 'OTHER',
+            status=str(response.status_code)
+        )
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if metrics.enabled:
+        conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_query_started')
+    if started:
+        statement_type = statement.lstrip()[:6].upper()
+        metrics.observe(
+            'db_query_duration_seconds', time.perf_counter() - started.pop(),
+            statement=statement_type if statement_type in STATEMENT_TYPES else 'OTHER'
+        )
+
+
+def init_metrics(app):
+    """
+    Enable metrics for an app when METRICS_ENABLED is set.
+
+    Registers request timing hooks on the app and statement timing on every
+    SQLAlchemy engine. Call it before init_negotiation so request durations
+    include response compression.
+    """
+    global _db_listeners_installed
+
+    metrics.enabled = app.config.get('METRICS_ENABLED', False)
+    if not metrics.enabled:
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+
+    if not _db_listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _db_listeners_installed = True
@@ -1,11 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+import logging
 import pyotp
 import qrcode
 import base64
 from io import BytesIO
+from sqlalchemy.exc import IntegrityError
+from totp import totp_verifier
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -35,6 +39,9 @@ class User(db.Model):
     def generate_totp_secret(self):
         """Generate a new TOTP secret for the user"""
         self.totp_secret = pyotp.random_base32()
+        if self.id is not None:
+            # Time steps used with the old secret say nothing about the new one
+            TOTPCounter.query.filter_by(user_id=self.id).delete()
         return self.totp_secret
     
     def get_totp_uri(self):
@@ -48,35 +55,38 @@ class User(db.Model):
         )
     
     def verify_totp(self, token):
-        """Verify a TOTP token"""
+        """Verify a TOTP token (rejects codes that were already used)"""
         if not self.totp_secret:
-            print(f"No TOTP secret for user {self.id}")
             return False
 
-        try:
-            totp = pyotp.TOTP(self.totp_secret)
-            result = totp.verify(token)
-            print(f"TOTP verification for user {self.id}: {result}")
-
-            # For debugging, also check current valid token
-            current_token = totp.now()
-            print(f"Current valid TOTP token for user {self.id}: {current_token}")
-            print(f"Provided token: {token}")
-
-            return result
-        except Exception as e:
-            print(f"Error verifying TOTP for user {self.id}: {str(e)}")
-            return False
+        return totp_verifier.verify(self.id, self.totp_secret, token, self._accept_totp_counter)
+
+    def _accept_totp_counter(self, counter):
+        """Record counter as the last used TOTP time step; False if it (or a later one) was used already"""
+        # One conditional write, so two workers checking the same code cannot both accept it
+        updated = TOTPCounter.query.filter(
+            TOTPCounter.user_id == self.id,
+            TOTPCounter.last_counter < counter
+        ).update({'last_counter': counter}, synchronize_session=False)
+        if not updated:
+            try:
+                db.session.add(TOTPCounter(user_id=self.id, last_counter=counter))
+                db.session.flush()
+            except IntegrityError:
+                # A row exists, so the step (or a later one) was already used
+                db.session.rollback()
+                return False
+        db.session.commit()
+        return True
     
     def generate_qr_code(self):
         """Generate a QR code for TOTP setup"""
         if not self.totp_secret:
-            print(f"No TOTP secret for user {self.id}")
+            logger.debug("No TOTP secret for user %s", self.id)
             return None
 
         try:
             uri = self.get_totp_uri()
-            print(f"Generated TOTP URI for user {self.id}: {uri}")
 
             qr = qrcode.QRCode(
                 version=1,
@@ -93,10 +103,10 @@ class User(db.Model):
             img_str = base64.b64encode(buffered.getvalue()).decode()
 
             data_uri = f"data:image/png;base64,{img_str}"
-            print(f"Generated QR code for user {self.id}, length: {len(data_uri)}")
+            logger.debug("Generated QR code for user %s (%d characters)", self.id, len(data_uri))
             return data_uri
         except Exception as e:
-            print(f"Error generating QR code for user {self.id}: {str(e)}")
+            logger.warning("Error generating QR code for user %s: %s", self.id, e, exc_info=True)
             return None
     
     def to_dict(self, include_secrets=False):
@@ -116,5 +126,20 @@ class User(db.Model):
         return result
 
 
-# We'll use the User model for email OTP since it's already in the users table
-# No need for a separate EmailOTP model
\ No newline at end of file
+
+class EmailOTP(db.Model):
+    """Pending email OTP, kept out of the users table to avoid rewriting the user row on login"""
+    __tablename__ = 'email_otps'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    code = db.Column(db.String(6), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TOTPCounter(db.Model):
+    """Last accepted TOTP time step per user, shared by every worker for replay protection"""
+    __tablename__ = 'totp_counters'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    last_counter = db.Column(db.BigInteger, nullable=False)
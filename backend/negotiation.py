@@ -0,0 +1,252 @@
+"""
+Content negotiation for API requests and responses.
+
+- Responses larger than COMPRESS_MIN_SIZE are compressed with brotli or gzip
+  according to Accept-Encoding.
+- Clients that send `Accept: application/msgpack` (or `application/cbor`)
+  receive a binary encoding of the same document. Hex fields (keys ending in
+  `_hex`) are sent as raw bytes and byte lists (keys ending in `_bytes`) as
+  binary strings, which is much smaller than their JSON form.
+- Request bodies may use the same formats: JSON, MessagePack or CBOR,
+  optionally with `Content-Encoding: gzip` or `br` (br needs Brotli 1.2+).
+  Decompressed bodies are limited to MAX_DECOMPRESSED_REQUEST_BYTES.
+"""
+
+import base64
+import gzip
+import zlib
+
+from flask import Request, current_app, has_request_context, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+CBOR_MIMETYPE = 'application/cbor'
+
+# Request fields the cipher endpoints expect as base64 text for modern ciphers
+BASE64_REQUEST_FIELDS = ('ciphertext', 'iv', 'tag')
+MODERN_METHODS = ('aes', 'chacha20', '3des')
+
+
+def binary_mimetypes():
+    """Binary response formats available with the installed libraries."""
+    available = []
+    if msgpack is not None:
+        available.extend(MSGPACK_MIMETYPES)
+    if cbor2 is not None:
+        available.append(CBOR_MIMETYPE)
+    return available
+
+
+def _pack_value(key, value):
+    if isinstance(value, dict):
+        return {k: _pack_value(k, v) for k, v in value.items()}
+    if isinstance(value, list):
+        if isinstance(key, str) and key.endswith('_bytes'):
+            try:
+                return bytes(value)
+            except (TypeError, ValueError):
+                pass
+        return [_pack_value(None, v) for v in value]
+    if isinstance(value, str) and isinstance(key, str) and key.endswith('_hex'):
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            return value
+    return value
+
+
+def pack_binary(obj, mimetype, default=None):
+    """
+    Encode a response document as MessagePack or CBOR.
+
+    Args:
+        obj: The document (as it would be passed to jsonify)
+        mimetype (str): The negotiated binary mimetype
+        default (callable, optional): Fallback for types the encoder can't handle
+
+    Returns:
+        bytes: The encoded document
+    """
+    obj = _pack_value(None, obj)
+    if mimetype == CBOR_MIMETYPE:
+        return cbor2.dumps(obj, default=(lambda encoder, value: encoder.encode(default(value))) if default else None)
+    return msgpack.packb(obj, default=default, use_bin_type=True)
+
+
+def negotiated_mimetype():
+    """Return the binary mimetype the current request prefers, or None for JSON."""
+    candidates = binary_mimetypes()
+    if not candidates:
+        return None
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE] + candidates)
+    return best if best in candidates else None
+
+
+def binary_response(app, obj):
+    """
+    Build a MessagePack/CBOR response if the client asked for one.
+
+    Called by the JSON providers before they fall back to JSON.
+
+    Returns:
+        Response or None: The binary response, or None if JSON should be used
+    """
+    if not has_request_context():
+        return None
+    mimetype = negotiated_mimetype()
+    if mimetype is None:
+        return None
+    body = pack_binary(obj, mimetype, default=app.json.default)
+    return app.response_class(body, mimetype=mimetype)
+
+
+def _bounded_brotli():
+    # Brotli < 1.2 can't limit the output of a single process() call, so br bodies are refused
+    return brotli is not None and hasattr(brotli.Decompressor, 'can_accept_more_data')
+
+
+def _decompress(data, encoding, limit):
+    encoding = encoding.lower().strip()
+    if encoding in ('', 'identity'):
+        return data
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        # wbits=47 auto-detects gzip and zlib headers
+        decompressor = zlib.decompressobj(47)
+        result = decompressor.decompress(data, limit + 1)
+        if len(result) > limit or decompressor.unconsumed_tail:
+            raise RequestEntityTooLarge()
+        return result
+    if encoding == 'br' and _bounded_brotli():
+        decompressor = brotli.Decompressor()
+        # output_buffer_limit caps each call, so a bomb stops near the limit instead of expanding in one go
+        result = bytearray(decompressor.process(data, output_buffer_limit=limit + 1))
+        while len(result) <= limit and not decompressor.can_accept_more_data():
+            result += decompressor.process(b'', output_buffer_limit=limit + 1 - len(result))
+        if len(result) > limit:
+            raise RequestEntityTooLarge()
+        if not decompressor.is_finished():
+            raise ValueError("Truncated brotli request body")
+        return bytes(result)
+    raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def _unpack_value(key, value, modern):
+    if isinstance(value, dict):
+        return {k: _unpack_value(k, v, modern) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack_value(None, v, modern) for v in value]
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value)
+        if isinstance(key, str) and key.endswith('_hex'):
+            return value.hex()
+        if key in BASE64_REQUEST_FIELDS and modern:
+            return base64.b64encode(value).decode('utf-8')
+        if key == 'mac':
+            return value.hex()
+        return value.decode('utf-8')
+    return value
+
+
+class NegotiatingRequest(Request):
+    """Request class whose get_json() also understands binary and compressed bodies."""
+
+    def get_json(self, force=False, silent=False, cache=True):
+        encoding = self.headers.get('Content-Encoding', '')
+        mimetype = self.mimetype
+        is_binary = mimetype in MSGPACK_MIMETYPES or mimetype == CBOR_MIMETYPE
+
+        if not encoding and not is_binary:
+            return super().get_json(force=force, silent=silent, cache=cache)
+
+        cached = getattr(self, '_negotiated_json', None)
+        if cache and cached is not None:
+            return cached
+
+        if not (self.is_json or is_binary or force):
+            if not silent:
+                return self.on_json_mimetype_error()
+            return None
+
+        try:
+            limit = current_app.config.get('MAX_DECOMPRESSED_REQUEST_BYTES', 32 * 1024 * 1024)
+            body = _decompress(self.get_data(cache=cache), encoding, limit)
+
+            if mimetype in MSGPACK_MIMETYPES and msgpack is not None:
+                data = msgpack.unpackb(body, raw=False)
+            elif mimetype == CBOR_MIMETYPE and cbor2 is not None:
+                data = cbor2.loads(body)
+            elif is_binary:
+                raise ValueError(f"Unsupported request format: {mimetype}")
+            else:
+                data = current_app.json.loads(body)
+
+            if is_binary:
+                modern = isinstance(data, dict) and str(data.get('method', '')).lower() in MODERN_METHODS
+                data = _unpack_value(None, data, modern)
+        except RequestEntityTooLarge:
+            raise
+        except Exception as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e if isinstance(e, ValueError) else ValueError(str(e)))
+
+        if cache:
+            self._negotiated_json = data
+        return data
+
+
+def compress_response(response):
+    """after_request hook: compress large responses the client accepts compressed."""
+    # The body format depends on Accept once binary formats are negotiable
+    response.vary.add('Accept')
+
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    config = current_app.config
+    body = response.get_data()
+    if len(body) < config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    accepted = request.accept_encodings
+    for algorithm in config.get('COMPRESS_ALGORITHMS', 'br,gzip').split(','):
+        algorithm = algorithm.strip()
+        if algorithm == 'br' and brotli is not None and accepted['br']:
+            compressed = brotli.compress(body, quality=config.get('COMPRESS_BR_QUALITY', 4))
+            break
+        if algorithm == 'gzip' and accepted['gzip']:
+            compressed = gzip.compress(body, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6))
+            break
+    else:
+        response.vary.add('Accept-Encoding')
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = algorithm
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_negotiation(app):
+    """Install binary request decoding and response compression on the app."""
+    app.request_class = NegotiatingRequest
+    if app.config.get('COMPRESS_RESPONSES', True):
+        app.after_request(compress_response)
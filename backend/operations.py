@@ -0,0 +1,311 @@
+"""
+Cipher operations shared by the HTTP routes and the WebSocket channel.
+
+Each function takes the decoded request body, runs the operation and returns
+the result dict that is sent back to the client. Bad input raises
+OperationError with the HTTP status to report; anything else that goes wrong
+propagates and is reported as a server error by the caller.
+
+Every operation goes through admission control first (see admission.py),
+which can refuse it, build fewer steps than asked for, or stop it when it
+runs out of CPU time. Classical ciphers, AES (except GCM), 3DES, hashes and
+MACs run in chunks so the deadline is checked as they go; the one-shot AEAD
+ciphers are checked when they finish.
+"""
+
+import functools
+
+from cryptography.exceptions import InvalidTag
+
+from admission import AdmissionError, admit, steps_level
+from ciphers.classical import apply_in_chunks, compile_cipher
+from ciphers.modern import aes_encryption, aes_decryption, des3_encryption, des3_decryption, aead_encryption, aead_decryption
+from ciphers.integrity import compute_hash, compute_mac, generate_hash_steps, generate_hmac_steps
+from metrics import metrics, cipher_label
+
+
+class OperationError(ValueError):
+    """A request that can't be carried out as given."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _admitted(operation):
+    """Report admission control refusals like any other OperationError."""
+    @functools.wraps(operation)
+    def wrapper(data):
+        try:
+            return operation(data)
+        except AdmissionError as e:
+            raise OperationError(str(e), e.status)
+    return wrapper
+
+
+def _classical(method, key, text, encrypt, admission):
+    cipher = compile_cipher(method, key, encrypt)
+    return apply_in_chunks(cipher, text, admission.steps_length, admission.deadline.check)
+
+
+@_admitted
+def encrypt_data(data):
+    """
+    Encrypt a plaintext as described by an /encrypt request body.
+
+    Args:
+        data (dict): plaintext, method, key, and mode and aad where they apply; steps
+            (full or none) chooses whether to build the visualization steps
+
+    Returns:
+        dict: ciphertext and steps, plus iv, tag and aad for modern ciphers (and
+        steps_truncated when admission control built fewer steps)
+    """
+    plaintext = data.get('plaintext', '')
+    method = data.get('method', '').lower()
+    key = data.get('key', '')
+    mode = data.get('mode', '')  # For AES: ECB, CBC, CTR, GCM
+    aad = data.get('aad', '')  # Associated data for AES-GCM and ChaCha20-Poly1305
+
+    if not plaintext:
+        raise OperationError("No plaintext provided")
+
+    if not method:
+        raise OperationError("No encryption method specified")
+
+    if not key and method != 'caesar':  # Caesar can use default shift
+        raise OperationError("No encryption key provided")
+
+    admission = admit(method, len(plaintext), steps_level(data))
+    with_steps = admission.with_steps
+
+    with metrics.time('cipher_duration_seconds', method=cipher_label(method), operation='encrypt'):
+        # Classical ciphers
+        if method == 'caesar':
+            shift = int(key) if key else 3  # Default shift of 3
+            ciphertext, steps = _classical('caesar', shift, plaintext, True, admission)
+            result = {
+                "ciphertext": ciphertext,
+                "steps": steps
+            }
+
+        elif method == 'substitution':
+            ciphertext, steps = _classical('substitution', key, plaintext, True, admission)
+            result = {
+                "ciphertext": ciphertext,
+                "steps": steps
+            }
+
+        elif method == 'vigenere':
+            ciphertext, steps = _classical('vigenere', key, plaintext, True, admission)
+            result = {
+                "ciphertext": ciphertext,
+                "steps": steps
+            }
+
+        # Modern ciphers
+        elif method == 'aes':
+            if not mode:
+                mode = 'cbc'  # Default to CBC mode if not specified
+
+            if mode.lower() == 'gcm':
+                ciphertext, iv, tag, steps = aead_encryption(plaintext, key, 'aes-gcm', aad, with_steps)
+                result = {
+                    "ciphertext": ciphertext,
+                    "iv": iv,
+                    "tag": tag,
+                    "aad": aad,
+                    "steps": steps
+                }
+            else:
+                ciphertext, iv, steps = aes_encryption(plaintext, key, mode, with_steps, admission.deadline.check)
+                result = {
+                    "ciphertext": ciphertext,
+                    "iv": iv,
+                    "steps": steps
+                }
+
+        elif method == 'chacha20':
+            ciphertext, iv, tag, steps = aead_encryption(plaintext, key, 'chacha20-poly1305', aad, with_steps)
+            result = {
+                "ciphertext": ciphertext,
+                "iv": iv,
+                "tag": tag,
+                "aad": aad,
+                "steps": steps
+            }
+
+        elif method == '3des':
+            ciphertext, iv, steps = des3_encryption(plaintext, key, with_steps, admission.deadline.check)
+            result = {
+                "ciphertext": ciphertext,
+                "iv": iv,
+                "steps": steps
+            }
+
+        else:
+            raise OperationError(f"Unsupported encryption method: {method}")
+
+    admission.deadline.check()
+    return admission.annotate(result)
+
+
+@_admitted
+def decrypt_data(data):
+    """
+    Decrypt a ciphertext as described by a /decrypt request body.
+
+    Args:
+        data (dict): ciphertext, method, key, and mode, iv, tag and aad where they apply;
+            steps (full or none) chooses whether to build the visualization steps
+
+    Returns:
+        dict: plaintext and steps (and steps_truncated when admission control built fewer steps)
+    """
+    ciphertext = data.get('ciphertext', '')
+    method = data.get('method', '').lower()
+    key = data.get('key', '')
+    mode = data.get('mode', '')  # For AES: ECB, CBC, CTR, GCM
+    iv = data.get('iv', '')  # For AES CBC/CTR/GCM modes and ChaCha20 (the nonce)
+    tag = data.get('tag', '')  # For AES-GCM and ChaCha20-Poly1305 (else taken from the end of the ciphertext)
+    aad = data.get('aad', '')  # Associated data for AES-GCM and ChaCha20-Poly1305
+
+    if not ciphertext:
+        raise OperationError("No ciphertext provided")
+
+    if not method:
+        raise OperationError("No decryption method specified")
+
+    if not key and method != 'caesar':  # Caesar can use default shift
+        raise OperationError("No decryption key provided")
+
+    admission = admit(method, len(ciphertext), steps_level(data))
+    with_steps = admission.with_steps
+
+    try:
+        with metrics.time('cipher_duration_seconds', method=cipher_label(method), operation='decrypt'):
+            # Classical ciphers
+            if method == 'caesar':
+                shift = int(key) if key else 3  # Default shift of 3
+                plaintext, steps = _classical('caesar', shift, ciphertext, False, admission)
+
+            elif method == 'substitution':
+                plaintext, steps = _classical('substitution', key, ciphertext, False, admission)
+
+            elif method == 'vigenere':
+                plaintext, steps = _classical('vigenere', key, ciphertext, False, admission)
+
+            # Modern ciphers
+            elif method == 'aes':
+                if not mode:
+                    mode = 'cbc'  # Default to CBC mode if not specified
+
+                if mode in ['cbc', 'ctr', 'gcm'] and not iv:
+                    raise OperationError(f"IV required for AES {mode.upper()} mode")
+
+                # Call the appropriate decryption function
+                if mode.lower() == 'gcm':
+                    plaintext, steps = aead_decryption(ciphertext, key, 'aes-gcm', iv, tag, aad, with_steps)
+                else:
+                    plaintext, steps = aes_decryption(ciphertext, key, mode, iv, with_steps, admission.deadline.check)
+
+            elif method == 'chacha20':
+                if not iv:
+                    raise OperationError("IV (nonce) required for ChaCha20-Poly1305 decryption")
+
+                plaintext, steps = aead_decryption(ciphertext, key, 'chacha20-poly1305', iv, tag, aad, with_steps)
+
+            elif method == '3des':
+                if not iv:
+                    raise OperationError("IV required for 3DES decryption")
+
+                plaintext, steps = des3_decryption(ciphertext, key, iv, with_steps, admission.deadline.check)
+
+            else:
+                raise OperationError(f"Unsupported decryption method: {method}")
+
+    except InvalidTag:
+        raise OperationError("Authentication failed: the ciphertext, tag, IV or associated data has been altered")
+
+    admission.deadline.check()
+    return admission.annotate({
+        "plaintext": plaintext,
+        "steps": steps
+    })
+
+
+@_admitted
+def hash_data(data):
+    """
+    Hash a message as described by a /hash request body.
+
+    Args:
+        data (dict): message and algorithm (default sha256); steps (full or none)
+
+    Returns:
+        dict: The compute_hash result with visualization steps
+    """
+    message = data.get('message', '')
+    algorithm = data.get('algorithm', 'sha256').lower()
+
+    if not message:
+        raise OperationError("No message provided")
+
+    admission = admit('hash', len(message), steps_level(data))
+
+    # Compute hash, then the visualization steps
+    with metrics.time('cipher_duration_seconds', method=cipher_label(algorithm), operation='hash'):
+        result = compute_hash(message, algorithm, with_steps=False, checkpoint=admission.deadline.check)
+    admission.deadline.check()
+    if admission.with_steps:
+        with metrics.time('step_generation_duration_seconds', method=cipher_label(algorithm), operation='hash'):
+            result["steps"] = generate_hash_steps(message, algorithm)
+        admission.deadline.check()
+    else:
+        result["steps"] = []
+    return admission.annotate(result)
+
+
+@_admitted
+def mac_data(data):
+    """
+    Compute an HMAC as described by a /mac request body.
+
+    Args:
+        data (dict): message, key and algorithm (default sha256); steps (full or none)
+
+    Returns:
+        dict: The compute_mac result with visualization steps
+    """
+    message = data.get('message', '')
+    key = data.get('key', '')
+    algorithm = data.get('algorithm', 'sha256').lower()
+
+    if not message:
+        raise OperationError("No message provided")
+
+    if not key:
+        raise OperationError("No key provided")
+
+    admission = admit('mac', len(message), steps_level(data))
+
+    # Compute MAC, then the visualization steps
+    with metrics.time('cipher_duration_seconds', method=cipher_label(algorithm), operation='mac'):
+        result = compute_mac(message, key, algorithm, with_steps=False, checkpoint=admission.deadline.check)
+    admission.deadline.check()
+    if admission.with_steps:
+        with metrics.time('step_generation_duration_seconds', method=cipher_label(algorithm), operation='mac'):
+            result["steps"] = generate_hmac_steps(message, key, algorithm)
+        admission.deadline.check()
+    else:
+        result["steps"] = []
+    return admission.annotate(result)
+
+
+# Operations available by name (the WebSocket channel dispatches on these)
+OPERATIONS = {
+    'encrypt': encrypt_data,
+    'decrypt': decrypt_data,
+    'hash': hash_data,
+    'mac': mac_data
+}
@@ -0,0 +1,186 @@
+"""
+Storage for short-lived email OTPs.
+
+OTPs used to live in the users table (email_otp / email_otp_expiry), which
+meant every email-MFA login rewrote the user row. The stores here keep OTPs
+out of the users table:
+
+- MemoryOTPStore: in-process TTL map with a heap-based expiry index (only
+  for a single server process, such as the development server)
+- DatabaseOTPStore: small dedicated table keyed by user id, shared by all
+  worker processes (the default)
+
+Both compare codes in constant time and enforce a maximum number of attempts.
+"""
+
+import heapq
+import hmac
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Verification outcomes
+OTP_VALID = 'valid'
+OTP_MISSING = 'missing'
+OTP_EXPIRED = 'expired'
+OTP_INVALID = 'invalid'
+OTP_LOCKED = 'locked'
+
+# Seconds between sweeps of expired rows from the email_otps table
+SWEEP_INTERVAL = 60
+
+
+class MemoryOTPStore:
+    """In-memory OTP store with automatic expiry sweeping."""
+
+    def __init__(self, ttl_seconds, max_attempts=5):
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+        self._entries = {}  # key -> [code, expires_at, attempts]
+        self._expiry_index = []  # heap of (expires_at, key)
+        self._lock = threading.Lock()
+
+    def issue(self, key, code):
+        """Store a new OTP for key, replacing any previous one."""
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._sweep_locked(time.monotonic())
+            self._entries[key] = [code, expires_at, 0]
+            heapq.heappush(self._expiry_index, (expires_at, key))
+
+    def verify(self, key, code):
+        """
+        Verify and consume the OTP for key.
+
+        Returns:
+            str: One of OTP_VALID, OTP_MISSING, OTP_EXPIRED, OTP_INVALID, OTP_LOCKED
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return OTP_MISSING
+
+            stored_code, expires_at, attempts = entry
+            if now > expires_at:
+                del self._entries[key]
+                return OTP_EXPIRED
+
+            if hmac.compare_digest(stored_code.encode('utf-8'), code.encode('utf-8')):
+                del self._entries[key]
+                return OTP_VALID
+
+            entry[2] = attempts + 1
+            if entry[2] >= self.max_attempts:
+                del self._entries[key]
+                return OTP_LOCKED
+            return OTP_INVALID
+
+    def discard(self, key):
+        """Remove any OTP stored for key."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def sweep(self):
+        """Drop all expired OTPs. Returns the number of entries removed."""
+        with self._lock:
+            return self._sweep_locked(time.monotonic())
+
+    def _sweep_locked(self, now):
+        removed = 0
+        index = self._expiry_index
+        while index and index[0][0] <= now:
+            expires_at, key = heapq.heappop(index)
+            entry = self._entries.get(key)
+            # Skip stale index entries for OTPs that were reissued or consumed
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+                removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DatabaseOTPStore:
+    """OTP store backed by the email_otps table (see models.EmailOTP)."""
+
+    def __init__(self, db, model, ttl_seconds, max_attempts=5, sweep_interval=SWEEP_INTERVAL):
+        self.db = db
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    def issue(self, key, code):
+        """Store a new OTP for key, replacing any previous one (and every sweep_interval, drop expired OTPs)."""
+        now = datetime.utcnow()
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self._delete_expired(now)
+        self.db.session.merge(self.model(
+            user_id=key,
+            code=code,
+            expires_at=now + timedelta(seconds=self.ttl_seconds),
+            attempts=0
+        ))
+        self.db.session.commit()
+
+    def verify(self, key, code):
+        """
+        Verify and consume the OTP for key with a single primary-key lookup.
+
+        Returns:
+            str: One of OTP_VALID, OTP_MISSING, OTP_EXPIRED, OTP_INVALID, OTP_LOCKED
+        """
+        entry = self.db.session.get(self.model, key)
+        if entry is None:
+            return OTP_MISSING
+
+        if datetime.utcnow() > entry.expires_at:
+            result = OTP_EXPIRED
+        elif hmac.compare_digest(entry.code.encode('utf-8'), code.encode('utf-8')):
+            result = OTP_VALID
+        else:
+            entry.attempts += 1
+            if entry.attempts < self.max_attempts:
+                self.db.session.commit()
+                return OTP_INVALID
+            result = OTP_LOCKED
+
+        self.db.session.delete(entry)
+        self.db.session.commit()
+        return result
+
+    def discard(self, key):
+        """Remove any OTP stored for key."""
+        self.model.query.filter_by(user_id=key).delete()
+        self.db.session.commit()
+
+    def sweep(self):
+        """Drop all expired OTPs. Returns the number of rows removed."""
+        removed = self._delete_expired(datetime.utcnow())
+        self.db.session.commit()
+        return removed
+
+    def _delete_expired(self, now):
+        # Uses the expires_at index; the caller commits
+        return self.model.query.filter(
+            self.model.expires_at <= now
+        ).delete(synchronize_session=False)
+
+
+def create_otp_store(config):
+    """Build the OTP store selected by the OTP_STORE config value."""
+    ttl_seconds = config['OTP_EXPIRY_MINUTES'] * 60
+    max_attempts = config['OTP_MAX_ATTEMPTS']
+    backend = config['OTP_STORE'].lower()
+
+    if backend == 'memory':
+        return MemoryOTPStore(ttl_seconds, max_attempts)
+    if backend == 'database':
+        from models import db, EmailOTP
+        return DatabaseOTPStore(db, EmailOTP, ttl_seconds, max_attempts)
+
+    raise ValueError(f"Unsupported OTP store: {backend}")
@@ -0,0 +1,335 @@
+"""
+On-demand sampling profiler for production debugging.
+
+A background thread wakes every few milliseconds, reads the current stack of
+the threads being profiled with sys._current_frames() and counts identical
+stacks. The result is written in the collapsed-stack format used by
+flamegraph.pl, speedscope and similar tools ("frame;frame;frame count").
+
+Frames are named module:function. Frames from the cipher modules
+(ciphers.classical, ciphers.modern, ciphers.integrity and the rest of the
+ciphers package) also carry their line number so hot loops inside a cipher
+show up as separate frames, and the JSON output adds per-cipher-function
+totals.
+
+Admins (users listed in ADMIN_USERNAMES) can profile a worker for N seconds
+with POST /admin/profile, or profile a single request by sending the
+X-Profile header with it; the profile ID is returned in the X-Profile-Id
+response header and the stacks are fetched from GET /admin/profile/<id>.
+Everything is off unless PROFILER_ENABLED is set, and only the worker process
+that handles the request is sampled.
+"""
+
+import json
+import os
+import re
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from jobs import FileLock
+from models import db, User
+
+profiler_bp = Blueprint('profiler', __name__)
+
+CIPHER_PACKAGE = 'ciphers.'
+PROFILE_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# Single requests are short, so they are sampled more often than whole workers
+REQUEST_INTERVAL = 0.001
+
+# Leaf frames of threads that are waiting rather than working
+IDLE_FRAMES = frozenset([
+    'threading:wait', 'threading:_wait_for_tstate_lock', 'selectors:select',
+    'socket:accept', 'queue:get', 'time:sleep'
+])
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of other threads at a fixed interval."""
+
+    def __init__(self, interval=0.005, thread_ids=None, include_idle=False, max_depth=200):
+        """
+        Args:
+            interval (float): Seconds between samples
+            thread_ids (set, optional): Threads to sample (default: every thread but the caller and sampler)
+            include_idle (bool): Keep stacks of threads that are waiting on locks, sockets or queues
+            max_depth (int): Deepest stack to record (deeper frames are dropped from the root end)
+        """
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.include_idle = include_idle
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.ticks = 0
+        self.started = None
+        self.duration = 0.0
+        self._exclude = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.thread_ids is None:
+            self._exclude.add(threading.get_ident())
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        self._exclude.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        self.ticks += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in self._exclude:
+                continue
+            if self.thread_ids is not None and thread_id not in self.thread_ids:
+                continue
+            names = self._frame_names(frame)
+            if not self.include_idle and names and names[-1] in IDLE_FRAMES:
+                continue
+            self.stacks[';'.join(names)] += 1
+
+    def _frame_names(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            module = frame.f_globals.get('__name__', '?')
+            name = f"{module}:{frame.f_code.co_name}"
+            # f_lineno can be None for a frame caught mid-instruction in another thread
+            if module.startswith(CIPHER_PACKAGE) and frame.f_lineno:
+                name += f":{frame.f_lineno}"
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        return names
+
+    def collapsed(self):
+        """Stacks in collapsed format, most frequent first."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+    def summary(self, top=20):
+        """
+        Summarize the samples.
+
+        Returns:
+            dict: Sample counts, the functions with the most self and total
+            samples, and totals for each function in the cipher modules
+        """
+        own = Counter()
+        total = Counter()
+        ciphers = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[_function(frames[-1])] += count
+            seen = set()
+            for frame in frames:
+                function = _function(frame)
+                if function in seen:
+                    continue
+                seen.add(function)
+                total[function] += count
+                if function.startswith(CIPHER_PACKAGE):
+                    ciphers[function] += count
+
+        samples = sum(self.stacks.values())
+        return {
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "ticks": self.ticks,
+            "samples": samples,
+            "top_self": [{"function": f, "samples": c} for f, c in own.most_common(top)],
+            "top_total": [{"function": f, "samples": c} for f, c in total.most_common(top)],
+            "cipher_functions": {f: c for f, c in ciphers.most_common()}
+        }
+
+
+def _function(frame_name):
+    """Strip the line number that cipher frames carry."""
+    module, function = frame_name.split(':', 2)[:2]
+    return f"{module}:{function}"
+
+
+class ProfileStore:
+    """The most recent per-request profiles, by ID, in a directory shared by every worker."""
+
+    def __init__(self):
+        self.directory = None
+
+    def configure(self, directory, max_entries=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self._lock = FileLock(os.path.join(directory, 'profiles.lock'))
+
+    def add(self, profiler):
+        profile_id = secrets.token_urlsafe(8)
+        stored = {
+            "interval": profiler.interval,
+            "ticks": profiler.ticks,
+            "duration": profiler.duration,
+            "stacks": dict(profiler.stacks)
+        }
+        descriptor, partial = tempfile.mkstemp(dir=self.directory, suffix='.partial')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(stored, f)
+            os.replace(partial, os.path.join(self.directory, f"{profile_id}.json"))
+        except BaseException:
+            os.unlink(partial)
+            raise
+        with self._lock:
+            self._prune_locked()
+        return profile_id
+
+    def get(self, profile_id):
+        """
+        Load a stored profile.
+
+        Returns:
+            SamplingProfiler: The stopped profiler, or None if the ID is unknown or was pruned
+        """
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        profiler = SamplingProfiler(stored["interval"])
+        profiler.ticks = stored["ticks"]
+        profiler.duration = stored["duration"]
+        profiler.stacks = Counter(stored["stacks"])
+        return profiler
+
+    def _prune_locked(self):
+        """Delete all but the newest max_entries profiles."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                profiles.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+        profiles.sort(reverse=True)
+        for _, path in profiles[self.max_entries:]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+profile_store = ProfileStore()
+_running = threading.Lock()
+
+
+def is_admin(optional=False):
+    """Whether the request carries a JWT for a user listed in ADMIN_USERNAMES."""
+    verify_jwt_in_request(optional=optional)
+    identity = get_jwt_identity()
+    if identity is None:
+        return False
+    user = db.session.get(User, int(identity)) if str(identity).isdigit() else None
+    admins = {name.strip() for name in current_app.config['ADMIN_USERNAMES'].split(',') if name.strip()}
+    return user is not None and user.username in admins
+
+
+def profile_response(profiler, output_format):
+    if output_format == 'json':
+        return jsonify(dict(profiler.summary(), collapsed=profiler.collapsed()))
+    return Response(profiler.collapsed(), mimetype='text/plain')
+
+
+@profiler_bp.route('/profile', methods=['POST'])
+def profile_worker():
+    if not current_app.config['PROFILER_ENABLED']:
+        return jsonify({"error": "Profiling is disabled"}), 404
+    if not is_admin():
+        return jsonify({"error": "Admin access required"}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', 10))
+        interval_ms = float(data.get('interval_ms', current_app.config['PROFILER_INTERVAL_MS']))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+
+    max_seconds = current_app.config['PROFILER_MAX_SECONDS']
+    if not 0 < seconds <= max_seconds:
+        return jsonify({"error": f"seconds must be between 0 and {max_seconds}"}), 400
+    if interval_ms < 1:
+        return jsonify({"error": "interval_ms must be at least 1"}), 400
+
+    # One worker-wide profile at a time
+    if not _running.acquire(blocking=False):
+        return jsonify({"error": "A profile is already running in this worker"}), 409
+    try:
+        profiler = SamplingProfiler(interval_ms / 1000, include_idle=bool(data.get('include_idle', False)))
+        profiler.start()
+        time.sleep(seconds)
+        profiler.stop()
+    finally:
+        _running.release()
+
+    return profile_response(profiler, data.get('format', request.args.get('format', 'collapsed')))
+
+
+@profiler_bp.route('/profile/<profile_id>', methods=['GET'])
+def get_request_profile(profile_id):
+    if not current_app.config['PROFILER_ENABLED']:
+        return jsonify({"error": "Profiling is disabled"}), 404
+    if not is_admin():
+        return jsonify({"error": "Admin access required"}), 403
+
+    profiler = profile_store.get(profile_id)
+    if profiler is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return profile_response(profiler, request.args.get('format', 'collapsed'))
+
+
+def _start_request_profile():
+    if 'X-Profile' not in request.headers:
+        return
+    try:
+        allowed = is_admin(optional=True)
+    except Exception:
+        allowed = False
+    if allowed:
+        g.request_profiler = SamplingProfiler(
+            REQUEST_INTERVAL,
+            thread_ids={threading.get_ident()},
+            include_idle=True
+        ).start()
+
+
+def _finish_request_profile(response):
+    profiler = g.pop('request_profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        response.headers['X-Profile-Id'] = profile_store.add(profiler)
+    return response
+
+
+def init_profiler(app):
+    """Install the per-request profiling hooks when PROFILER_ENABLED is set."""
+    if app.config['PROFILER_ENABLED']:
+        profile_store.configure(app.config['PROFILER_DIR'], app.config['PROFILER_MAX_PROFILES'])
+        app.before_request(_start_request_profile)
+        app.after_request(_finish_request_profile)
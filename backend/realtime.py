@@ -0,0 +1,224 @@
+"""
+WebSocket channel for cipher operations (Socket.IO namespace /cipher).
+
+Interactive pages send many small requests a second. Over HTTP each one pays
+for its own request and JWT check; over this channel the client connects
+once with an access token and then sends as many messages as it likes on the
+same connection:
+
+    socket = io('/cipher', {auth: {token: accessToken}, transports: ['websocket']})
+    socket.emit('encrypt', {id: 1, method: 'caesar', key: '3', plaintext: 'HELLO'})
+    socket.emit('hash', {id: 2, message: 'HELLO', algorithm: 'sha256'})
+    socket.on('response', ({id, operation, result, error, status}) => ...)
+
+The events are encrypt, decrypt, hash and mac, and each takes the same body
+as the HTTP route of that name plus an `id` chosen by the client. Every
+message runs in its own background task and its response is pushed as soon
+as it is ready, so responses can arrive in a different order than the
+messages were sent; the `id` matches them up. A failed message gets a
+response with `error` and the HTTP status the route would have returned.
+
+Each connection has a token bucket (REALTIME_RATE messages a second, bursts
+of up to REALTIME_BURST) and at most REALTIME_MAX_IN_FLIGHT messages running
+at once. Messages over either limit are answered with status 429 and are not
+run. When the access token expires the connection is closed and the client
+reconnects with a fresh token.
+
+Connections are held by the worker process that accepted them. The server
+only accepts the websocket transport: long-polling would need sticky sessions
+across gunicorn workers. Under the gthread worker every open connection holds
+one of the worker's request threads until it closes, so a worker accepts at
+most REALTIME_MAX_CONNECTIONS of them (by default half of GUNICORN_THREADS)
+and refuses the rest; clients then fall back to HTTP. For many concurrent
+connections run a separate gunicorn instance for /socket.io with more threads
+(see the README). The channel needs Flask-SocketIO; without it (or with
+REALTIME_ENABLED=False) the app runs without it.
+"""
+
+import threading
+import time
+
+from flask import request
+from flask_jwt_extended import decode_token
+
+from metrics import metrics
+from operations import OPERATIONS, OperationError
+
+try:
+    from flask_socketio import Namespace, SocketIO, disconnect, emit
+except ImportError:  # pragma: no cover - optional dependency
+    SocketIO = None
+
+NAMESPACE = '/cipher'
+
+metrics.histogram('socket_message_duration_seconds',
+                  'Time from receiving a WebSocket message to pushing its response.',
+                  ('operation', 'status'))
+
+
+class TokenBucket:
+    """Allows `rate` events a second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Connection:
+    def __init__(self, identity, expires, bucket):
+        self.identity = identity
+        self.expires = expires  # Unix time at which the access token expires
+        self.bucket = bucket
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+
+def _token():
+    """The access token from an "Authorization: Bearer" header on the handshake request."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return ''
+
+
+if SocketIO is not None:
+    socketio = SocketIO()
+
+    class CipherNamespace(Namespace):
+        def __init__(self, namespace, app):
+            super().__init__(namespace)
+            self.app = app
+            self.connections = {}
+            self._lock = threading.Lock()
+
+        def on_connect(self, auth=None):
+            token = auth.get('token', '') if isinstance(auth, dict) else ''
+            try:
+                claims = decode_token(token or _token())
+            except Exception:
+                raise ConnectionRefusedError("A valid access token is required")
+            if claims.get('type') != 'access':
+                raise ConnectionRefusedError("A valid access token is required")
+
+            config = self.app.config
+            bucket = TokenBucket(config['REALTIME_RATE'], config['REALTIME_BURST'])
+            with self._lock:
+                # Each connection holds a request thread, so leave most of them for HTTP
+                if len(self.connections) >= config['REALTIME_MAX_CONNECTIONS']:
+                    raise ConnectionRefusedError("Too many realtime connections on this server; use HTTP")
+                # Tokens without an expiry stay valid for the life of the connection
+                self.connections[request.sid] = Connection(claims['sub'], claims.get('exp', float('inf')), bucket)
+
+        def on_disconnect(self, reason=None):
+            # python-socketio 5.12+ passes the reason; older versions pass nothing
+            with self._lock:
+                self.connections.pop(request.sid, None)
+
+        def on_encrypt(self, message):
+            self._submit('encrypt', message)
+
+        def on_decrypt(self, message):
+            self._submit('decrypt', message)
+
+        def on_hash(self, message):
+            self._submit('hash', message)
+
+        def on_mac(self, message):
+            self._submit('mac', message)
+
+        def _submit(self, operation, message):
+            received = time.perf_counter()
+            connection = self.connections.get(request.sid)
+            if connection is None:
+                return
+            if not isinstance(message, dict):
+                emit('response', {"id": None, "operation": operation, "error": "No data provided", "status": 400})
+                return
+            request_id = message.get('id')
+
+            if time.time() >= connection.expires:
+                emit('response', {
+                    "id": request_id, "operation": operation,
+                    "error": "Token has expired; reconnect with a new access token", "status": 401
+                })
+                disconnect()
+                return
+
+            # Handlers of one connection can run concurrently, so the bucket is only touched under the lock
+            with connection.lock:
+                wait = connection.bucket.take()
+                if wait:
+                    emit('response', {
+                        "id": request_id, "operation": operation,
+                        "error": "Rate limit exceeded", "status": 429, "retry_after": round(wait, 3)
+                    })
+                    return
+                if connection.in_flight >= self.app.config['REALTIME_MAX_IN_FLIGHT']:
+                    emit('response', {
+                        "id": request_id, "operation": operation,
+                        "error": "Too many messages in progress", "status": 429
+                    })
+                    return
+                connection.in_flight += 1
+
+            self.socketio.start_background_task(self._run, request.sid, connection, operation, message, received)
+
+        def _run(self, sid, connection, operation, message, received):
+            response = {"id": message.get('id'), "operation": operation}
+            try:
+                with self.app.app_context():
+                    response["result"] = OPERATIONS[operation](message)
+                response["status"] = 200
+            except OperationError as e:
+                response.update(error=str(e), status=e.status)
+            except Exception as e:
+                response.update(error=str(e), status=500)
+            finally:
+                with connection.lock:
+                    connection.in_flight -= 1
+
+            self.socketio.emit('response', response, to=sid, namespace=self.namespace)
+            metrics.observe('socket_message_duration_seconds', time.perf_counter() - received,
+                            operation=operation, status=str(response["status"]))
+else:
+    socketio = None
+
+
+def init_realtime(app):
+    """
+    Attach the /cipher namespace to the app.
+
+    Returns:
+        The SocketIO server, or None when the channel is disabled or Flask-SocketIO is missing
+    """
+    if socketio is None or not app.config['REALTIME_ENABLED']:
+        return None
+
+    origins = app.config['REALTIME_CORS_ORIGINS']
+    socketio.init_app(
+        app,
+        async_mode=app.config['REALTIME_ASYNC_MODE'],
+        cors_allowed_origins='*' if origins == '*' else origins.split(','),
+        max_http_buffer_size=app.config['REALTIME_MAX_MESSAGE_BYTES'],
+        # Polling sessions live in one worker and fail as "Invalid session" on the others
+        transports=['websocket']
+    )
+    socketio.on_namespace(CipherNamespace(NAMESPACE, app))
+    return socketio
@@ -0,0 +1,40 @@
+"""
+Build the English quadgram table used by the substitution cipher solver.
+
+    python scripts/build_quadgrams.py corpus1.txt [corpus2.txt ...]
+
+Writes ciphers/data/english_quadgrams.npy (26**4 float32 log10
+probabilities). The shipped table was built from about 3.9 MB of English
+prose: Wikipedia article text and the Lee news corpus.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ciphers.substitution_solver import QUADGRAM_TABLE_PATH, build_quadgram_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', nargs='+', help='Plain text files of English prose')
+    parser.add_argument('--output', default=QUADGRAM_TABLE_PATH)
+    args = parser.parse_args()
+
+    text = []
+    for path in args.corpus:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            text.append(f.read())
+
+    table = build_quadgram_table('\n'.join(text))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    np.save(args.output, table)
+    print(f"Wrote {args.output} ({table.nbytes // 1024} KB)")
+
+
+if __name__ == '__main__':
+    main()
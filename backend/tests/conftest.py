@@ -0,0 +1,92 @@
+"""
+Shared fixtures for the backend tests.
+
+Run from the backend directory:
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other by their flat names (app, config, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+ENGLISH_TEXT = (
+    "It was the best of times, it was the worst of times, it was the age of wisdom, it was the age of "
+    "foolishness, it was the epoch of belief, it was the epoch of incredulity, it was the season of light, "
+    "it was the season of darkness, it was the spring of hope, it was the winter of despair, we had "
+    "everything before us, we had nothing before us, we were all going direct to heaven, we were all going "
+    "direct the other way. In short, the period was so far like the present period, that some of its "
+    "noisiest authorities insisted on its being received, for good or for evil, in the superlative degree "
+    "of comparison only. There were a king with a large jaw and a queen with a plain face, on the throne "
+    "of England; there were a king with a large jaw and a queen with a fair face, on the throne of France."
+)
+
+
+class TestConfig(Config):
+    TESTING = True
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    LOG_QUEUE = False
+    REALTIME_ENABLED = False
+    PROFILER_ENABLED = False
+    OTP_STORE = 'database'
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    from jobs import job_queue
+    from models import db
+
+    class Settings(TestConfig):
+        JOBS_DIR = str(tmp_path / 'jobs')
+        CONTAINER_DIR = str(tmp_path / 'containers')
+        ANALYSIS_UPLOAD_DIR = str(tmp_path / 'uploads')
+        INCREMENTAL_SESSION_DIR = str(tmp_path / 'edit_sessions')
+
+    app = create_app(Settings)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    job_queue.shutdown()
+
+
+@pytest.fixture
+def enabled_metrics():
+    from metrics import metrics
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization headers for a user identity."""
+    from flask_jwt_extended import create_access_token
+
+    def headers(identity='1'):
+        return {'Authorization': 'Bearer ' + create_access_token(identity=identity)}
+    return headers
+
+
+@pytest.fixture
+def english_text():
+    """A few hundred letters of English prose."""
+    return ENGLISH_TEXT
@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import os
+
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import admission
+from admission import AdmissionError, admit, solver_slots
+from ciphers import integrity, modern
+
+LONG_TEXT = 'Attack at dawn. ' * 400  # 6400 characters
+
+
+@pytest.fixture
+def small_budget(app):
+    """About 10 microseconds of estimated CPU per request."""
+    app.config['ADMISSION_CPU_BUDGET'] = 1e-5
+    return app
+
+
+def test_admit_runs_small_requests_as_asked(app):
+    decision = admit('vigenere', 100, 'full')
+    assert decision.steps_length == 100 and not decision.truncated
+
+
+def test_admit_truncates_classical_steps_and_drops_modern_ones(app):
+    app.config['ADMISSION_CPU_BUDGET'] = 1e-3
+    vigenere = admit('vigenere', 1000, 'full')
+    assert vigenere.truncated and 0 < vigenere.steps_length < 1000
+    assert vigenere.whole_steps_only().steps_length == 0
+
+    app.config['ADMISSION_CPU_BUDGET'] = 1e-5
+    hashed = admit('hash', 1000, 'full')
+    assert hashed.truncated and hashed.steps_length == 0
+
+
+def test_admit_refuses_what_does_not_fit_without_steps(small_budget):
+    with pytest.raises(AdmissionError) as error:
+        admit('caesar', len(LONG_TEXT), 'none')
+    assert error.value.status == 413
+
+
+@pytest.mark.parametrize('kind', ['crack-caesar', 'crack-vigenere', 'crack-substitution', 'analyze'])
+def test_kinds_without_steps(app, kind):
+    decision = admit(kind, 1000, 'full')
+    assert decision.steps_length == 1000 and not decision.truncated
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/validate', {'method': 'caesar', 'key': '3', 'plaintext': LONG_TEXT, 'ciphertext': LONG_TEXT}),
+    ('/validate/batch', {'method': 'caesar', 'key': '3',
+                         'items': [{'plaintext': LONG_TEXT[:1000], 'ciphertext': LONG_TEXT[:1000]}] * 5}),
+    ('/crack/caesar', {'ciphertext': LONG_TEXT}),
+    ('/crack/vigenere', {'ciphertext': LONG_TEXT}),
+    ('/analyze', {'text': LONG_TEXT}),
+    ('/encrypt/incremental', {'method': 'caesar', 'key': '3', 'plaintext': LONG_TEXT}),
+])
+def test_routes_refuse_oversized_work(client, small_budget, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 413
+    assert '/jobs' in response.get_json()['error']
+
+
+def test_crack_substitution_is_admitted(client, small_budget, auth_headers):
+    response = client.post('/crack/substitution', json={'ciphertext': LONG_TEXT * 10}, headers=auth_headers())
+    assert response.status_code == 413
+
+
+def test_incremental_session_leaves_out_steps_it_cannot_afford(client, app):
+    app.config['ADMISSION_CPU_BUDGET'] = 1e-3
+    response = client.post('/encrypt/incremental', json={'method': 'vigenere', 'key': 'KEY', 'plaintext': 'a' * 1000})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['steps'] == [] and body['steps_truncated'] and body['steps_length'] == 0
+
+
+def test_solver_slots_limit_concurrent_searches(client, app, auth_headers):
+    app.config['SOLVER_MAX_CONCURRENT'] = 1
+    with solver_slots.slot():
+        with pytest.raises(AdmissionError) as error:
+            with solver_slots.slot():
+                pass
+        assert error.value.status == 503
+        response = client.post('/crack/substitution', json={'ciphertext': LONG_TEXT}, headers=auth_headers())
+        assert response.status_code == 503
+    with solver_slots.slot():
+        pass
+
+
+def test_block_ciphers_and_hashes_check_the_deadline_between_chunks(monkeypatch):
+    monkeypatch.setattr(modern, 'BULK_CHUNK_SIZE', 1000)
+    monkeypatch.setattr(integrity, 'BULK_CHUNK_SIZE', 1000)
+    data = os.urandom(4096)
+    key, iv = os.urandom(32), os.urandom(16)
+
+    done = []
+    encrypted = modern.transform_in_chunks(Cipher(algorithms.AES(key), modes.CTR(iv)).encryptor(), data, done.append)
+    reference = Cipher(algorithms.AES(key), modes.CTR(iv)).encryptor()
+    assert encrypted == reference.update(data) + reference.finalize()
+    assert done == [1000, 2000, 3000, 4000, 4096]
+
+    message = 'x' * 2500
+    done = []
+    result = integrity.compute_hash(message, 'sha256', with_steps=False, checkpoint=done.append)
+    assert result['hash'] == hashlib.sha256(message.encode()).hexdigest()
+    assert done == [1000, 2000, 2500]
+
+
+def test_operations_stop_when_the_deadline_passes(app, monkeypatch):
+    from operations import OperationError, encrypt_data, hash_data
+
+    monkeypatch.setattr(modern, 'BULK_CHUNK_SIZE', 1000)
+    monkeypatch.setattr(integrity, 'BULK_CHUNK_SIZE', 1000)
+    clock = iter(range(0, 10_000, 5))
+    monkeypatch.setattr(admission.time, 'thread_time', lambda: next(clock))
+    app.config['ADMISSION_CPU_DEADLINE'] = 12
+
+    for operation, body in [
+        (encrypt_data, {'method': '3des', 'key': 'secret', 'plaintext': 'p' * 10000, 'steps': 'none'}),
+        (hash_data, {'message': 'm' * 10000, 'steps': 'none'}),
+    ]:
+        with pytest.raises(OperationError) as error:
+            operation(body)
+        assert error.value.status == 503
+
+    # Without the fake clock the same request finishes
+    monkeypatch.undo()
+    result = encrypt_data({'method': 'aes', 'mode': 'cbc', 'key': 'secret', 'plaintext': 'p' * 10000, 'steps': 'none'})
+    assert len(base64.b64decode(result['ciphertext'])) == 10016
@@ -0,0 +1,94 @@
+import hashlib
+import os
+
+import pytest
+
+from analysis_cache import UploadLimitError, UploadSessions
+from ciphers.frequency import analyze_text
+
+TEXT = "It was the best of times, it was the worst of times, it was the age of wisdom. " * 20
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    uploads = UploadSessions()
+    uploads.configure(str(tmp_path), ttl_seconds=600, max_sessions=5, max_per_owner=2, max_bytes=4096)
+    return uploads
+
+
+def other_process(sessions):
+    """Another server process using the same upload directory."""
+    other = UploadSessions()
+    other.configure(sessions.directory, sessions.ttl_seconds, sessions.max_sessions, sessions.max_per_owner,
+                    sessions.max_bytes)
+    return other
+
+
+def test_chunks_can_go_to_different_processes(sessions):
+    upload_id, _ = sessions.add_chunk(None, TEXT[:333], 'alice')
+    other_process(sessions).add_chunk(upload_id, TEXT[333:1000], 'alice')
+    sessions.add_chunk(upload_id, TEXT[1000:], 'alice')
+
+    counts, digest = other_process(sessions).finish(upload_id, 'alice')
+    assert counts.summary() == analyze_text(TEXT)
+    assert digest == hashlib.sha256(TEXT.encode()).hexdigest()
+    assert not os.path.exists(os.path.join(sessions.directory, upload_id))
+
+
+def test_uploads_belong_to_their_owner(sessions):
+    upload_id, _ = sessions.add_chunk(None, 'abc', 'alice')
+    with pytest.raises(KeyError):
+        sessions.add_chunk(upload_id, 'def', 'bob')
+    with pytest.raises(KeyError):
+        sessions.finish(upload_id, 'bob')
+    with pytest.raises(KeyError):
+        sessions.add_chunk('../' + upload_id, 'def', 'alice')
+
+
+def test_limits(sessions):
+    sessions.add_chunk(None, 'abc', 'alice')
+    sessions.add_chunk(None, 'abc', 'alice')
+    with pytest.raises(UploadLimitError) as error:
+        sessions.add_chunk(None, 'abc', 'alice')
+    assert error.value.status == 429
+
+    upload_id, _ = sessions.add_chunk(None, 'abc', 'bob')
+    with pytest.raises(UploadLimitError) as error:
+        sessions.add_chunk(upload_id, 'x' * 5000, 'bob')
+    assert error.value.status == 413
+
+    sessions.add_chunk(None, 'abc', 'carol')
+    sessions.add_chunk(None, 'abc', 'dave')
+    with pytest.raises(UploadLimitError) as error:
+        sessions.add_chunk(None, 'abc', 'erin')
+    assert error.value.status == 503
+
+
+def test_inactive_uploads_expire(sessions):
+    upload_id, _ = sessions.add_chunk(None, 'abc', 'alice')
+    sessions.add_chunk(None, 'abc', 'alice')
+    old = os.path.getmtime(os.path.join(sessions.directory, upload_id, 'meta.json')) - 3600
+    os.utime(os.path.join(sessions.directory, upload_id, 'meta.json'), (old, old))
+
+    sessions.add_chunk(None, 'abc', 'alice')  # The expired upload no longer counts against the limit
+    with pytest.raises(KeyError):
+        sessions.add_chunk(upload_id, 'def', 'alice')
+
+
+def test_upload_route(client, auth_headers):
+    assert client.post('/analyze/upload', json={'chunk': TEXT}).status_code == 401
+
+    headers = auth_headers('1')
+    started = client.post('/analyze/upload', json={'chunk': TEXT[:500]}, headers=headers).get_json()
+    upload_id = started['upload_id']
+    assert started['characters_received'] == 500
+
+    other_user = client.post('/analyze/upload', json={'chunk': 'x', 'upload_id': upload_id}, headers=auth_headers('2'))
+    assert other_user.status_code == 404
+
+    client.post('/analyze/upload', json={'chunk': TEXT[500:], 'upload_id': upload_id}, headers=headers)
+    finished = client.post('/analyze/upload', json={'upload_id': upload_id, 'final': True}, headers=headers)
+    assert finished.status_code == 200
+    whole = client.post('/analyze', json={'text': TEXT}).get_json()
+    assert finished.get_json()['content_hash'] == whole['content_hash']
+    assert finished.get_json()['top_quadgrams'] == whole['top_quadgrams']
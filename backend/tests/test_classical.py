@@ -0,0 +1,15 @@
+from ciphers import classical
+from ciphers.classical import CACHED_KEY_MAX_LENGTH, compile_cipher, vigenere_cipher
+
+
+def test_short_keys_are_cached():
+    assert compile_cipher('vigenere', 'LEMON', True) is compile_cipher('vigenere', 'LEMON', True)
+
+
+def test_long_keys_are_not_cached():
+    classical._compile_cached.cache_clear()
+    key = 'LEMON' * (CACHED_KEY_MAX_LENGTH // 5 + 1)
+    assert compile_cipher('vigenere', key, True) is not compile_cipher('vigenere', key, True)
+    assert classical._compile_cached.cache_info().currsize == 0
+    # Still a working cipher
+    assert vigenere_cipher('ATTACKATDAWN', key)[0] == vigenere_cipher('ATTACKATDAWN', 'LEMON')[0]
@@ -0,0 +1,157 @@
+import io
+import os
+import time
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from ciphers.container import (
+    AEAD_TAG_SIZE, HEADER, ContainerLayout, ContainerReader, decrypt_stream, encrypt_stream
+)
+
+KEY = 'correct horse battery staple'
+CHUNK = 1024
+DATA = bytes(range(256)) * 41  # 10496 bytes: 10 full chunks and a short one
+
+
+def _encrypt(data=DATA, algorithm='aes-gcm', workers=1):
+    destination = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), destination, KEY, algorithm, CHUNK, workers)
+    destination.seek(0)
+    return destination
+
+
+@pytest.mark.parametrize('algorithm', ['aes-gcm', 'chacha20-poly1305'])
+@pytest.mark.parametrize('workers', [1, 3])
+def test_round_trip(algorithm, workers):
+    container = _encrypt(algorithm=algorithm, workers=workers)
+    output = io.BytesIO()
+    assert decrypt_stream(container, output, KEY, workers=workers) == len(DATA)
+    assert output.getvalue() == DATA
+
+
+def test_empty_input_round_trip():
+    assert ContainerReader(_encrypt(b''), KEY).read() == b''
+
+
+@pytest.mark.parametrize('start, stop', [(0, 1), (1000, 1100), (1023, 1025), (5000, 9000), (10400, 20000)])
+def test_range_reads_only_the_covering_chunks(start, stop):
+    reader = ContainerReader(_encrypt(), KEY)
+    opened = []
+    open_chunk = reader._open
+    reader._open = lambda number, record: opened.append(number) or open_chunk(number, record)
+
+    assert reader.read(start, stop) == DATA[start:stop]
+    last = (min(stop, len(DATA)) - 1) // CHUNK
+    assert opened == list(range(start // CHUNK, last + 1))
+
+
+def test_wrong_key_fails_before_any_plaintext():
+    with pytest.raises(InvalidTag):
+        ContainerReader(_encrypt(), 'not the key')
+
+
+def test_modified_chunk_fails_when_read():
+    data = bytearray(_encrypt().getvalue())
+    data[HEADER.size + CHUNK + AEAD_TAG_SIZE + 5] ^= 1  # second chunk
+    reader = ContainerReader(io.BytesIO(bytes(data)), KEY)
+    assert reader.read(0, CHUNK) == DATA[:CHUNK]
+    with pytest.raises(InvalidTag):
+        reader.read(CHUNK, 2 * CHUNK)
+
+
+def test_modified_index_fails_on_open():
+    container = _encrypt()
+    layout = ContainerLayout.read(container)
+    data = bytearray(container.getvalue())
+    data[layout.index_offset] ^= 1
+    with pytest.raises((InvalidTag, ValueError)):
+        ContainerReader(io.BytesIO(bytes(data)), KEY)
+
+
+# HTTP routes
+
+def _upload(client, headers, data=DATA):
+    return client.post(f'/containers?chunk_size={CHUNK}', data=data,
+                       headers={**headers, 'X-Container-Key': KEY})
+
+
+@pytest.fixture
+def alice(auth_headers):
+    return auth_headers('1')
+
+
+def test_upload_and_ranged_plaintext(client, alice):
+    response = _upload(client, alice)
+    assert response.status_code == 201
+    container_id = response.get_json()['id']
+
+    headers = {**alice, 'X-Container-Key': KEY}
+    response = client.get(f'/containers/{container_id}/plaintext', headers=headers)
+    assert response.status_code == 200 and response.data == DATA
+
+    response = client.get(f'/containers/{container_id}/plaintext', headers={**headers, 'Range': 'bytes=1000-2999'})
+    assert response.status_code == 206
+    assert response.data == DATA[1000:3000]
+    assert response.headers['Content-Range'] == f'bytes 1000-2999/{len(DATA)}'
+
+    raw = client.get(f'/containers/{container_id}', headers={**alice, 'Range': 'bytes=0-3'})
+    assert raw.status_code == 206 and raw.data == b'CLXC'
+
+
+def test_tampered_container_is_rejected(client, app, alice):
+    container_id = _upload(client, alice).get_json()['id']
+    path = os.path.join(app.config['CONTAINER_DIR'], f'{container_id}.clxc')
+    with open(path, 'r+b') as f:
+        f.seek(os.path.getsize(path) - 40)  # first byte of the index tag
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 1]))
+
+    response = client.get(f'/containers/{container_id}/plaintext', headers={**alice, 'X-Container-Key': KEY})
+    assert response.status_code == 400
+
+
+def test_routes_need_a_login_and_the_owner(client, alice, auth_headers):
+    container_id = _upload(client, alice).get_json()['id']
+    for suffix in ('', '/index', '/plaintext'):
+        assert client.get(f'/containers/{container_id}{suffix}').status_code == 401
+        response = client.get(f'/containers/{container_id}{suffix}', headers={**auth_headers('2'), 'X-Container-Key': KEY})
+        assert response.status_code == 404
+    assert client.delete(f'/containers/{container_id}', headers=auth_headers('2')).status_code == 404
+    assert client.get(f'/containers/{container_id}/index', headers=alice).status_code == 200
+
+
+def test_delete_frees_the_quota(client, app, alice):
+    app.config['CONTAINER_MAX_PER_USER'] = 1
+    from containers import init_containers
+    init_containers(app)
+
+    container_id = _upload(client, alice).get_json()['id']
+    assert _upload(client, alice).status_code == 429
+    assert client.delete(f'/containers/{container_id}', headers=alice).status_code == 204
+    assert client.get(f'/containers/{container_id}/index', headers=alice).status_code == 404
+    assert _upload(client, alice).status_code == 201
+
+
+def test_quota_limits_the_bytes_a_user_stores(client, app, alice, auth_headers):
+    app.config['CONTAINER_QUOTA_BYTES'] = len(DATA) * 2
+    from containers import init_containers
+    init_containers(app)
+
+    assert _upload(client, alice).status_code == 201
+    assert _upload(client, alice).status_code == 413  # the first container's tags and index use the rest
+    assert _upload(client, auth_headers('2')).status_code == 201
+
+
+def test_expired_containers_are_swept(client, app, alice):
+    from containers import container_store
+    container_id = _upload(client, alice).get_json()['id']
+    container_store.ttl_seconds = 60
+    meta = container_store._read_meta(container_id)
+    meta['created'] = time.time() - 120
+    container_store._write_meta(container_id, meta)
+
+    assert client.get(f'/containers/{container_id}/index', headers=alice).status_code == 404
+    _upload(client, alice)
+    assert not os.path.exists(os.path.join(app.config['CONTAINER_DIR'], f'{container_id}.clxc'))
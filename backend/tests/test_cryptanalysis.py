@@ -0,0 +1,58 @@
+import pytest
+
+from ciphers import cryptanalysis
+from ciphers.cryptanalysis import crack_vigenere, vigenere_text
+
+
+def test_crack_vigenere(english_text):
+    result = crack_vigenere(vigenere_text(english_text, 'LEMON'))
+    assert result['key'] == 'LEMON'
+    assert result['key_length_analysis']['key_length'] == 5
+
+
+def test_kasiski_check_replaces_a_multiple_chosen_by_ioc(english_text):
+    # On this short text the IoC alone prefers 10; the repeated trigrams are spaced by multiples of 5
+    analysis = crack_vigenere(vigenere_text(english_text[:240], 'LEMON'))['key_length_analysis']
+    ioc = analysis['ioc']
+    threshold = cryptanalysis.RANDOM_IOC + 0.75 * (max(ioc.values()) - cryptanalysis.RANDOM_IOC)
+    assert min(length for length, value in ioc.items() if value >= threshold) == 10
+
+    assert analysis['key_length'] == 5
+    assert analysis['kasiski_divisor']
+
+
+def test_given_key_length_skips_estimation(english_text, monkeypatch):
+    def estimate(*args, **kwargs):
+        raise AssertionError("estimation should be skipped")
+
+    monkeypatch.setattr(cryptanalysis, 'estimate_vigenere_key_length', estimate)
+    result = crack_vigenere(vigenere_text(english_text, 'LEMON'), key_length=5)
+    assert result['key'] == 'LEMON'
+    assert result['key_length_analysis'] is None
+
+
+@pytest.mark.parametrize('key_length', [0, -3])
+def test_key_length_must_be_positive(key_length):
+    with pytest.raises(ValueError):
+        crack_vigenere('SOME CIPHERTEXT', key_length=key_length)
+
+
+@pytest.mark.parametrize('body', [
+    {'max_key_length': 'twenty'},
+    {'max_key_length': None},
+    {'max_key_length': 0},
+    {'key_length': 'five'},
+    {'key_length': [5]},
+    {'key_length': 0},
+])
+def test_crack_vigenere_route_rejects_bad_lengths(client, body):
+    response = client.post('/crack/vigenere', json={'ciphertext': 'LXFOPVEFRNHR', **body})
+    assert response.status_code == 400
+
+
+def test_crack_vigenere_route_with_key_length(client, english_text):
+    response = client.post('/crack/vigenere', json={
+        'ciphertext': vigenere_text(english_text, 'LEMON'), 'key_length': '5', 'include_plaintext': True
+    })
+    assert response.status_code == 200
+    assert response.get_json()['plaintext'] == english_text
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from db_pool import InstrumentedQueuePool, publish_pool_gauges
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=0, pool_timeout=0.05
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_checkouts_and_timeouts_are_recorded(engine, enabled_metrics):
+    first = engine.connect()
+    second = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    text_output = enabled_metrics.render()
+    assert 'db_pool_checkout_wait_seconds_count 2' in text_output
+    assert 'db_pool_timeouts_total 1' in text_output
+    first.close()
+    second.close()
+
+
+def test_gauges_report_usage_and_saturation(engine, enabled_metrics):
+    connection = engine.connect()
+    connection.execute(text('SELECT 1'))
+    publish_pool_gauges(engine.pool)
+
+    text_output = enabled_metrics.render()
+    assert 'db_pool_connections{state="checked_out"} 1' in text_output
+    assert 'db_pool_capacity 2' in text_output
+    assert 'db_pool_saturation 0.5' in text_output
+    connection.close()
+
+
+def test_metrics_token_is_required_when_set(app, client):
+    app.config['METRICS_TOKEN'] = 'scrape-me'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'})
+    assert response.status_code == 200
+    assert b'db_pool_timeouts_total' in response.data
+
+
+def test_json_pool_route_is_gone(client):
+    assert client.get('/metrics/db-pool').status_code == 404
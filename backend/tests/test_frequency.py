@@ -0,0 +1,73 @@
+import io
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from ciphers.frequency import NgramCounts, SparseCounts, analyze_text
+
+TEXT = (
+    "The quick brown fox jumps over the lazy dog. Pack my box with five dozen liquor jugs! "
+    "How vexingly quick daft zebras jump; the five boxing wizards jump quickly. "
+) * 7
+
+
+def brute_force(text, n):
+    letters = [c for c in text.upper() if 'A' <= c <= 'Z']
+    return Counter(''.join(letters[i:i + n]) for i in range(len(letters) - n + 1))
+
+
+def as_counter(counts, n):
+    table = counts.counts[n - 1]
+    if isinstance(table, SparseCounts):
+        codes, values = table.codes, table.values
+    else:
+        codes = np.nonzero(table)[0]
+        values = table[codes]
+    result = Counter()
+    for code, value in zip(codes, values):
+        letters = []
+        for _ in range(n):
+            code, letter = divmod(int(code), 26)
+            letters.append(chr(65 + letter))
+        result[''.join(reversed(letters))] = int(value)
+    return result
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 4])
+def test_counts_match_brute_force(n):
+    assert as_counter(NgramCounts().update(TEXT), n) == brute_force(TEXT, n)
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 64])
+def test_chunked_updates_and_merges_match_the_whole_text(size):
+    pieces = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    updated = NgramCounts()
+    merged = NgramCounts()
+    for piece in pieces:
+        updated.update(piece)
+        merged = merged.merge(NgramCounts().update(piece))
+
+    whole = analyze_text(TEXT)
+    assert updated.summary() == whole
+    assert merged.summary() == whole
+    for n in (3, 4):
+        assert as_counter(merged, n) == brute_force(TEXT, n)
+
+
+def test_higher_orders_only_store_ngrams_that_occur():
+    counts = NgramCounts().update(TEXT)
+    assert isinstance(counts.counts[3], SparseCounts)
+    assert len(counts.counts[3].codes) == len(brute_force(TEXT, 4))
+    assert np.all(np.diff(counts.counts[3].codes) > 0)
+
+
+def test_save_and_load_continue_counting():
+    first, second = TEXT[:101], TEXT[101:]
+    buffer = io.BytesIO()
+    NgramCounts().update(first).save(buffer)
+    buffer.seek(0)
+
+    restored = NgramCounts.load(buffer).update(second)
+    assert restored.summary() == analyze_text(TEXT)
+    assert restored.characters == len(TEXT)
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+
+def _start(client, **body):
+    return client.post('/encrypt/incremental', json={'method': 'caesar', 'key': '3', 'plaintext': 'hello', **body})
+
+
+def test_session_applies_edits(client):
+    started = _start(client).get_json()
+    assert started['ciphertext'] == 'khoor' and len(started['steps']) == 5
+
+    response = client.post('/encrypt/incremental', json={
+        'session': started['session'], 'version': started['version'], 'offset': 5, 'insert': ' world'
+    })
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['ciphertext'] == ' zruog' and body['version'] == 1 and len(body['steps']) == 6
+
+
+@pytest.mark.parametrize('steps', ['none', False])
+def test_start_without_steps(client, steps):
+    body = _start(client, steps=steps).get_json()
+    assert body['ciphertext'] == 'khoor' and body['steps'] == []
+
+
+def test_edit_without_steps(client):
+    session = _start(client).get_json()['session']
+    response = client.post('/encrypt/incremental', json={
+        'session': session, 'offset': 5, 'insert': ' world', 'steps': 'none'
+    })
+    assert response.status_code == 200
+    assert response.get_json()['steps'] == []
+
+
+@pytest.mark.parametrize('steps', ['some', 'NONE', 0])
+def test_unknown_steps_level_is_rejected(client, steps):
+    response = _start(client, steps=steps)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'steps must be full or none'
+
+    session = _start(client).get_json()['session']
+    response = client.post('/encrypt/incremental', json={'session': session, 'offset': 5, 'insert': '!', 'steps': steps})
+    assert response.status_code == 400
+
+
+def test_edits_continue_in_another_process(client, app):
+    from edit_sessions import EditSessions, edit_sessions
+    started = client.post('/encrypt/incremental', json={
+        'method': 'aes', 'mode': 'cbc', 'key': 'secret', 'plaintext': 'attack at dawn'
+    }).get_json()
+
+    # A second worker only shares the session directory
+    other = EditSessions()
+    other.configure(app.config['INCREMENTAL_SESSION_DIR'])
+    with other.edit(started['session']) as session:
+        session.encoder.edit(7, 2, 'by', with_steps=False)
+        session.version += 1
+
+    response = client.post('/encrypt/incremental', json={
+        'session': started['session'], 'version': 1, 'offset': 14, 'insert': '!'
+    })
+    assert response.status_code == 200
+    with edit_sessions.edit(started['session']) as session:
+        assert session.encoder.text == 'attack by dawn!' and session.version == 2
+
+
+def test_closed_and_expired_sessions_are_gone(client):
+    from edit_sessions import edit_sessions
+    session = _start(client).get_json()['session']
+    assert client.delete(f'/encrypt/incremental/{session}').status_code == 204
+    assert client.post('/encrypt/incremental', json={'session': session, 'offset': 0}).status_code == 404
+
+    session = _start(client).get_json()['session']
+    edit_sessions.ttl_seconds = 0
+    assert client.post('/encrypt/incremental', json={'session': session, 'offset': 0}).status_code == 404
+
+
+@pytest.mark.parametrize('method, key, mode', [
+    ('caesar', '0', None), ('vigenere', 'LEMON', None), ('aes', 'secret', 'ecb'),
+    ('aes', 'secret', 'cbc'), ('aes', 'secret', 'ctr'), ('3des', 'secret', None),
+])
+def test_restored_encoder_edits_like_the_original(method, key, mode):
+    from ciphers.incremental import encoder_from_state, incremental_encoder
+    encoder = incremental_encoder(method, key, mode)
+    encoder.start('Meet me at the usual place.', with_steps=False)
+    restored = encoder_from_state(json.loads(json.dumps(encoder.state())))
+
+    assert restored.edit(8, 2, 'near', with_steps=False) == encoder.edit(8, 2, 'near', with_steps=False)
+    assert restored.state() == encoder.state()
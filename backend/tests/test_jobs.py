@@ -0,0 +1,223 @@
+import json
+import os
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import jobs
+from jobs import JobQueue
+
+
+class FakePool:
+    """Stands in for WorkerPool; jobs finish when the test resolves their futures."""
+
+    created = []
+
+    def __init__(self, processes, on_progress):
+        self.executor = self
+        self.on_progress = on_progress
+        self.futures = {}
+        self.closed = False
+        FakePool.created.append(self)
+
+    def submit(self, function, job_id, job_type, directory):
+        future = self.futures[job_id] = Future()
+        return future
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    FakePool.created = []
+    monkeypatch.setattr(jobs, 'WorkerPool', FakePool)
+    # Dispatch is driven by the tests rather than a runner thread
+    monkeypatch.setattr(JobQueue, '_ensure_runner', lambda self: None)
+    return FakePool
+
+
+def make_queue(directory, processes=2, max_running_per_user=1, max_queued_per_user=3):
+    queue = JobQueue()
+    queue.configure(str(directory), processes, max_running_per_user, max_queued_per_user, result_ttl=3600)
+    return queue
+
+
+def running_ids(queue):
+    return {job_id for job_id in queue._active}
+
+
+def test_queued_limit_is_shared_between_server_processes(tmp_path, fake_pool):
+    first, second = make_queue(tmp_path), make_queue(tmp_path)
+    first.submit('alice', 'hash', {'message': 'a'})
+    second.submit('alice', 'hash', {'message': 'b'})
+    first.submit('alice', 'hash', {'message': 'c'})
+    with pytest.raises(OverflowError):
+        second.submit('alice', 'hash', {'message': 'd'})
+    # Other users have their own limit
+    second.submit('bob', 'hash', {'message': 'e'})
+
+
+def test_invalid_submissions(tmp_path, fake_pool):
+    queue = make_queue(tmp_path)
+    with pytest.raises(ValueError):
+        queue.submit('alice', 'nope', {})
+    with pytest.raises(ValueError):
+        queue.submit('alice', 'hash', {}, priority='urgent')
+    with pytest.raises(ValueError):
+        queue.submit('alice', 'hash', ['not', 'a', 'dict'])
+
+
+def test_params_are_kept_on_disk_until_the_job_finishes(tmp_path, fake_pool):
+    queue = make_queue(tmp_path)
+    job = queue.submit('alice', 'hash', {'message': 'secret'})
+    params_path = jobs._params_path(str(tmp_path), job['id'])
+    assert os.path.exists(params_path)
+
+    queue._dispatch()
+    fake_pool.created[0].futures[job['id']].set_result(10)
+    assert queue.status(job['id'])['status'] == 'succeeded'
+    assert not os.path.exists(params_path)
+
+
+def test_dispatch_order_and_per_user_running_limit(tmp_path, fake_pool):
+    queue = make_queue(tmp_path, processes=2, max_running_per_user=1, max_queued_per_user=10)
+    low = queue.submit('alice', 'hash', {'message': 'a'}, priority='low')
+    high = queue.submit('alice', 'hash', {'message': 'b'}, priority='high')
+    other = queue.submit('bob', 'hash', {'message': 'c'}, priority='normal')
+
+    queue._dispatch()
+    # Alice's high priority job goes first; her low one waits and Bob's job takes the second worker
+    assert running_ids(queue) == {high['id'], other['id']}
+    assert queue.status(low['id'])['status'] == 'queued'
+
+    fake_pool.created[0].futures[high['id']].set_result(1)
+    queue._dispatch()
+    assert running_ids(queue) == {low['id'], other['id']}
+
+
+def test_running_limit_is_per_runner_not_per_submitting_process(tmp_path, fake_pool):
+    runner = make_queue(tmp_path, processes=4, max_running_per_user=1)
+    other_worker = make_queue(tmp_path, processes=4, max_running_per_user=1)
+    runner.submit('alice', 'hash', {'message': 'a'})
+    other_worker.submit('alice', 'hash', {'message': 'b'})
+    runner._dispatch()
+    assert len(running_ids(runner)) == 1
+
+
+def test_cancel_queued_job(tmp_path, fake_pool):
+    queue = make_queue(tmp_path)
+    job = queue.submit('alice', 'hash', {'message': 'a'})
+    queue.cancel(job['id'])
+    assert queue.status(job['id'])['status'] == 'cancelled'
+    assert not os.path.exists(jobs._params_path(str(tmp_path), job['id']))
+    queue._dispatch()
+    assert not running_ids(queue)
+
+
+def test_cancel_running_job_leaves_marker(tmp_path, fake_pool):
+    queue = make_queue(tmp_path)
+    job = queue.submit('alice', 'hash', {'message': 'a'})
+    queue._dispatch()
+    queue.cancel(job['id'])
+    assert os.path.exists(jobs._cancel_path(str(tmp_path), job['id']))
+    fake_pool.created[0].futures[job['id']].set_exception(jobs.JobCancelled())
+    assert queue.status(job['id'])['status'] == 'cancelled'
+
+
+def test_broken_pool_is_closed_and_replaced(tmp_path, fake_pool):
+    queue = make_queue(tmp_path, max_queued_per_user=10)
+    first = queue.submit('alice', 'hash', {'message': 'a'})
+    queue._dispatch()
+    broken = fake_pool.created[0]
+    broken.futures[first['id']].set_exception(BrokenProcessPool())
+
+    status = queue.status(first['id'])
+    assert status['status'] == 'failed'
+    assert broken.closed
+
+    second = queue.submit('alice', 'hash', {'message': 'b'})
+    queue._dispatch()
+    assert len(fake_pool.created) == 2
+    assert second['id'] in fake_pool.created[1].futures
+
+
+def test_new_runner_fails_jobs_left_running(tmp_path, fake_pool):
+    crashed = make_queue(tmp_path)
+    job = crashed.submit('alice', 'hash', {'message': 'a'})
+    crashed._dispatch()
+
+    make_queue(tmp_path)._recover()
+    status = crashed.status(job['id'])
+    assert status['status'] == 'failed'
+    assert 'restart' in status['error']
+
+
+def test_job_runs_in_worker_process(tmp_path):
+    queue = make_queue(tmp_path, processes=1)
+    try:
+        job = queue.submit('alice', 'hash', {'message': 'abc', 'algorithm': 'sha256'})
+        deadline = time.monotonic() + 60
+        while queue.status(job['id'])['status'] not in jobs.FINISHED and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert queue.status(job['id'])['status'] == 'succeeded'
+        result = jobs._read_json(queue.result_path(job['id']))
+        assert result['hash'] == 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+    finally:
+        queue.shutdown()
+
+
+def test_events_need_a_stream_token_for_that_job(client, auth_headers, fake_pool):
+    headers = auth_headers('1')
+    job = client.post('/jobs', json={'type': 'hash', 'params': {'message': 'a'}}, headers=headers).get_json()
+    other = client.post('/jobs', json={'type': 'hash', 'params': {'message': 'b'}}, headers=headers).get_json()
+    client.delete(f"/jobs/{job['id']}", headers=headers)  # Finished jobs end the stream at once
+
+    token = client.post(f"/jobs/{job['id']}/events/token", headers=headers).get_json()['token']
+    response = client.get(f"/jobs/{job['id']}/events?token={token}")
+    assert response.status_code == 200
+    assert b'event: done' in response.get_data()
+    response.close()  # As the WSGI server does; frees the stream slot
+
+    assert client.get(f"/jobs/{other['id']}/events?token={token}").status_code == 401
+    # Access tokens are not accepted in the query string
+    access_token = headers['Authorization'].split()[1]
+    assert client.get(f"/jobs/{job['id']}/events?token={access_token}").status_code == 401
+    assert client.get(f"/jobs/{job['id']}/events?jwt={access_token}").status_code == 401
+    # Someone else's job is not found
+    assert client.post(f"/jobs/{job['id']}/events/token", headers=auth_headers('2')).status_code == 404
+
+
+def test_event_streams_are_capped_per_user(client, app, auth_headers, fake_pool):
+    headers = auth_headers('1')
+    job = client.post('/jobs', json={'type': 'hash', 'params': {'message': 'a'}}, headers=headers).get_json()
+
+    stream = client.get(f"/jobs/{job['id']}/events", headers=headers, buffered=False)
+    assert stream.status_code == 200
+    refused = client.get(f"/jobs/{job['id']}/events", headers=headers)
+    assert refused.status_code == 503 and 'Retry-After' in refused.headers
+
+    stream.close()  # Frees the slot
+    client.delete(f"/jobs/{job['id']}", headers=headers)
+    response = client.get(f"/jobs/{job['id']}/events", headers=headers)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_event_streams_end_with_a_fresh_token(client, app, auth_headers, fake_pool):
+    app.config['JOBS_EVENT_STREAM_SECONDS'] = 0
+    headers = auth_headers('1')
+    job = client.post('/jobs', json={'type': 'hash', 'params': {'message': 'a'}}, headers=headers).get_json()
+
+    response = client.get(f"/jobs/{job['id']}/events", headers=headers)
+    body = response.get_data(as_text=True)
+    response.close()
+    assert body.startswith('retry: ')
+    reconnect = body.split('event: reconnect\ndata: ')[1]
+    token = json.loads(reconnect.split('\n')[0])['token']
+
+    response = client.get(f"/jobs/{job['id']}/events?token={token}", buffered=False)
+    assert response.status_code == 200
+    response.close()
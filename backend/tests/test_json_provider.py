@@ -0,0 +1,80 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask
+
+import json_provider
+from json_provider import OrjsonProvider, StdlibJSONProvider, create_json_provider
+
+pytestmark = pytest.mark.skipif(json_provider.orjson is None, reason="orjson is not installed")
+
+PAYLOAD = {
+    'ciphertext': 'khoor',
+    'steps': [{'step': 1, 'char': 'h', 'shift': 3, 'result': 'k'}],
+    'score': 0.25,
+    'ok': True,
+    'missing': None,
+    'text': 'naïve – ünïcode',
+}
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def provider(request):
+    app = Flask(__name__)
+    app.config['JSON_PROVIDER'] = request.param
+    return create_json_provider(app)
+
+
+def test_providers_write_the_same_document(provider):
+    assert json.loads(provider.dumps(PAYLOAD)) == PAYLOAD
+
+
+def test_keys_keep_their_order(provider):
+    document = provider.dumps({'z': 1, 'a': 2, 'm': 3})
+    assert list(json.loads(document)) == ['z', 'a', 'm']
+
+
+def test_datetimes_use_the_http_date_format(provider):
+    moment = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert json.loads(provider.dumps({'at': moment})) == {'at': 'Tue, 02 Jan 2024 03:04:05 GMT'}
+
+
+def test_integers_wider_than_64_bits_fall_back_to_the_stdlib(provider):
+    value = 2 ** 100
+    assert json.loads(provider.dumps({'n': value})) == {'n': value}
+
+
+def test_non_string_keys_are_written_as_strings():
+    provider = OrjsonProvider(Flask(__name__))
+    assert json.loads(provider.dumps({1: 'a'})) == {'1': 'a'}
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+def test_non_finite_floats(value):
+    # orjson writes valid JSON (null); the stdlib writes the NaN/Infinity extension
+    assert OrjsonProvider(Flask(__name__)).dumps({'x': value}) == '{"x":null}'
+    assert StdlibJSONProvider(Flask(__name__)).dumps({'x': value}) == json.dumps({'x': value})
+
+
+def test_responses_have_the_same_body(app):
+    with app.test_request_context():
+        bodies = [
+            json.loads(cls(app).response(PAYLOAD).get_data())
+            for cls in (OrjsonProvider, StdlibJSONProvider)
+        ]
+    assert bodies[0] == bodies[1] == PAYLOAD
+
+
+def test_unknown_or_unavailable_providers_are_rejected(monkeypatch):
+    app = Flask(__name__)
+    app.config['JSON_PROVIDER'] = 'simplejson'
+    with pytest.raises(ValueError):
+        create_json_provider(app)
+
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    app.config['JSON_PROVIDER'] = 'auto'
+    assert isinstance(create_json_provider(app), StdlibJSONProvider)
+    app.config['JSON_PROVIDER'] = 'orjson'
+    with pytest.raises(ValueError):
+        create_json_provider(app)
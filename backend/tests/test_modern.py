@@ -0,0 +1,83 @@
+import base64
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from ciphers.modern import AEAD_TAG_SIZE, aead_decryption, aead_encryption
+
+KEY = 'correct horse battery staple'
+ALGORITHMS = ['aes-gcm', 'chacha20-poly1305']
+
+
+def _flip(value_b64, index=0):
+    data = bytearray(base64.b64decode(value_b64))
+    data[index] ^= 1
+    return base64.b64encode(bytes(data)).decode('utf-8')
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_round_trip_with_associated_data(algorithm):
+    ciphertext, nonce, tag, steps = aead_encryption('attack at dawn', KEY, algorithm, aad='header')
+    assert len(base64.b64decode(tag)) == AEAD_TAG_SIZE
+    assert steps[-1]['tag_base64'] == tag
+
+    plaintext, steps = aead_decryption(ciphertext, KEY, algorithm, nonce, tag, aad='header')
+    assert plaintext == 'attack at dawn'
+    assert any(step['step'] == 'Tag Verification' and step['valid'] for step in steps)
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_tag_can_be_appended_to_the_ciphertext(algorithm):
+    ciphertext, nonce, tag, _ = aead_encryption('attack at dawn', KEY, algorithm, with_steps=False)
+    sealed = base64.b64encode(base64.b64decode(ciphertext) + base64.b64decode(tag)).decode('utf-8')
+    assert aead_decryption(sealed, KEY, algorithm, nonce, with_steps=False) == ('attack at dawn', [])
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+@pytest.mark.parametrize('altered', ['ciphertext', 'nonce', 'tag', 'aad', 'key'])
+def test_altered_input_fails_the_tag_check(algorithm, altered):
+    ciphertext, nonce, tag, _ = aead_encryption('attack at dawn', KEY, algorithm, aad='header', with_steps=False)
+    arguments = {'ciphertext_b64': ciphertext, 'key': KEY, 'nonce_b64': nonce, 'tag_b64': tag, 'aad': 'header'}
+    if altered == 'aad':
+        arguments['aad'] = 'Header'
+    elif altered == 'key':
+        arguments['key'] = KEY.upper()
+    else:
+        arguments[f'{altered}_b64'] = _flip(arguments[f'{altered}_b64'])
+
+    with pytest.raises(InvalidTag):
+        aead_decryption(algorithm=algorithm, **arguments)
+
+
+def test_truncated_tag_fails_the_tag_check():
+    ciphertext, nonce, tag, _ = aead_encryption('attack at dawn', KEY, 'aes-gcm', with_steps=False)
+    short_tag = base64.b64encode(base64.b64decode(tag)[:-1]).decode('utf-8')
+    with pytest.raises((InvalidTag, ValueError)):
+        aead_decryption(ciphertext, KEY, 'aes-gcm', nonce, short_tag)
+
+
+def test_nonces_are_not_reused():
+    nonces = {aead_encryption('x', KEY, 'aes-gcm', with_steps=False)[1] for _ in range(50)}
+    assert len(nonces) == 50
+
+
+def test_unsupported_algorithm_and_missing_nonce():
+    with pytest.raises(ValueError):
+        aead_encryption('x', KEY, 'aes-ocb')
+    with pytest.raises(ValueError):
+        aead_decryption('AAAA', KEY, 'aes-gcm', None)
+
+
+@pytest.mark.parametrize('method, mode', [('aes', 'gcm'), ('chacha20', None)])
+def test_decrypt_route_reports_a_failed_tag(client, method, mode):
+    body = {'method': method, 'mode': mode, 'key': KEY, 'plaintext': 'attack at dawn', 'aad': 'header'}
+    encrypted = client.post('/encrypt', json=body).get_json()
+
+    decrypt = {'method': method, 'mode': mode, 'key': KEY, 'ciphertext': encrypted['ciphertext'],
+               'iv': encrypted['iv'], 'tag': encrypted['tag'], 'aad': 'header'}
+    response = client.post('/decrypt', json=decrypt)
+    assert response.status_code == 200 and response.get_json()['plaintext'] == 'attack at dawn'
+
+    response = client.post('/decrypt', json={**decrypt, 'tag': _flip(encrypted['tag'])})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Authentication failed')
@@ -0,0 +1,130 @@
+import base64
+import gzip
+import json
+import zlib
+
+import brotli
+import cbor2
+import msgpack
+import pytest
+
+import negotiation
+
+LIMIT = 1024 * 1024
+BOMB = b'{"method": "caesar", "key": "3", "plaintext": "' + b'a' * (16 * LIMIT) + b'"}'
+AES_KEY = 'sixteen byte key'
+
+
+@pytest.fixture
+def small_limit(app):
+    app.config['MAX_DECOMPRESSED_REQUEST_BYTES'] = LIMIT
+
+
+def _post_compressed(client, body, encoding):
+    return client.post('/encrypt', data=body, headers={
+        'Content-Type': 'application/json', 'Content-Encoding': encoding
+    })
+
+
+@pytest.mark.parametrize('encoding, compress', [
+    ('gzip', gzip.compress),
+    ('deflate', zlib.compress),
+    ('br', brotli.compress),
+])
+def test_compressed_bodies_are_decoded(client, encoding, compress):
+    body = json.dumps({'method': 'caesar', 'key': '3', 'plaintext': 'hello'}).encode()
+    response = _post_compressed(client, compress(body), encoding)
+    assert response.status_code == 200
+    assert response.get_json()['ciphertext'] == 'khoor'
+
+
+@pytest.mark.parametrize('encoding, compress', [
+    ('gzip', gzip.compress),
+    ('deflate', zlib.compress),
+    ('br', brotli.compress),
+])
+def test_decompression_bombs_stop_at_the_limit(client, small_limit, encoding, compress):
+    response = _post_compressed(client, compress(BOMB), encoding)
+    assert response.status_code == 413
+
+
+def test_brotli_output_is_bounded_per_call(monkeypatch):
+    outputs = []
+    decompressor_class = brotli.Decompressor
+
+    class RecordingDecompressor:
+        def __init__(self):
+            self._decompressor = decompressor_class()
+
+        def can_accept_more_data(self):
+            return self._decompressor.can_accept_more_data()
+
+        def is_finished(self):
+            return self._decompressor.is_finished()
+
+        def process(self, data, **kwargs):
+            output = self._decompressor.process(data, **kwargs)
+            outputs.append(len(output))
+            return output
+
+    monkeypatch.setattr(negotiation.brotli, 'Decompressor', RecordingDecompressor)
+    # 16 MB of output from a few hundred bytes of input must not be expanded in one call
+    with pytest.raises(negotiation.RequestEntityTooLarge):
+        negotiation._decompress(brotli.compress(BOMB), 'br', LIMIT)
+    assert sum(outputs) < 2 * LIMIT
+
+
+def test_truncated_brotli_body_is_rejected(client):
+    body = brotli.compress(json.dumps({'method': 'caesar', 'key': '3', 'plaintext': 'hello' * 100}).encode())
+    assert _post_compressed(client, body[:-4], 'br').status_code == 400
+
+
+def test_brotli_bodies_are_refused_without_bounded_decompression(client, monkeypatch):
+    monkeypatch.setattr(negotiation, '_bounded_brotli', lambda: False)
+    body = brotli.compress(b'{"method": "caesar", "key": "3", "plaintext": "hello"}')
+    assert _post_compressed(client, body, 'br').status_code == 400
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('application/msgpack', 'application/msgpack'),
+    ('application/cbor', 'application/cbor'),
+    ('application/json, application/msgpack;q=0.5', 'application/json'),
+    ('application/msgpack;q=0.5, application/cbor', 'application/cbor'),
+    ('application/cbor;q=0.9, application/json', 'application/json'),
+    ('*/*', 'application/json'),
+])
+def test_accept_order_picks_the_response_format(client, accept, expected):
+    response = client.post('/encrypt', json={'method': 'caesar', 'key': '3', 'plaintext': 'hello'},
+                           headers={'Accept': accept})
+    assert response.status_code == 200
+    assert response.mimetype == expected
+    assert 'Accept' in response.headers['Vary']
+
+
+@pytest.mark.parametrize('mimetype, dumps, loads', [
+    ('application/msgpack', lambda obj: msgpack.packb(obj, use_bin_type=True), msgpack.unpackb),
+    ('application/cbor', cbor2.dumps, cbor2.loads),
+])
+def test_binary_round_trip(client, mimetype, dumps, loads):
+    headers = {'Content-Type': mimetype, 'Accept': mimetype}
+    response = client.post('/encrypt', data=dumps({'method': 'aes', 'key': AES_KEY, 'plaintext': 'attack at dawn'}),
+                           headers=headers)
+    assert response.mimetype == mimetype
+    encrypted = loads(response.data)
+    # Hex step fields travel as raw bytes
+    assert isinstance(encrypted['steps'][0]['plaintext_hex'], bytes)
+
+    # Base64 fields of modern ciphers can be sent back as raw bytes
+    response = client.post('/decrypt', data=dumps({
+        'method': 'aes', 'key': AES_KEY,
+        'ciphertext': base64.b64decode(encrypted['ciphertext']), 'iv': base64.b64decode(encrypted['iv'])
+    }), headers=headers)
+    assert response.status_code == 200
+    assert loads(response.data)['plaintext'] == 'attack at dawn'
+
+
+def test_large_responses_are_compressed(client):
+    response = client.post('/encrypt', json={'method': 'caesar', 'key': '3', 'plaintext': 'hello ' * 1000},
+                           headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['ciphertext'].startswith('khoor')
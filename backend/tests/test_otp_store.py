@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from otp_store import (
+    OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_MISSING, OTP_VALID,
+    DatabaseOTPStore, MemoryOTPStore, create_otp_store
+)
+
+
+@pytest.fixture
+def memory_store():
+    return MemoryOTPStore(ttl_seconds=60, max_attempts=3)
+
+
+@pytest.fixture
+def database_store(app):
+    from models import db, EmailOTP, User
+    for username in ('alice', 'bob'):  # user ids 1 and 2
+        db.session.add(User(username, f'{username}@example.com', 'not-a-real-hash'))
+    db.session.commit()
+    return DatabaseOTPStore(db, EmailOTP, ttl_seconds=60, max_attempts=3)
+
+
+@pytest.fixture(params=['memory', 'database'])
+def store(request):
+    return request.getfixturevalue(f'{request.param}_store')
+
+
+def test_valid_code_is_consumed(store):
+    store.issue(1, '123456')
+    assert store.verify(1, '123456') == OTP_VALID
+    assert store.verify(1, '123456') == OTP_MISSING
+
+
+def test_missing_code(store):
+    assert store.verify(1, '123456') == OTP_MISSING
+
+
+def test_wrong_codes_lock_after_max_attempts(store):
+    store.issue(1, '123456')
+    assert store.verify(1, '000000') == OTP_INVALID
+    assert store.verify(1, '000000') == OTP_INVALID
+    assert store.verify(1, '000000') == OTP_LOCKED
+    # The OTP is gone once locked, even for the right code
+    assert store.verify(1, '123456') == OTP_MISSING
+
+
+def test_reissue_replaces_code_and_resets_attempts(store):
+    store.issue(1, '111111')
+    assert store.verify(1, '000000') == OTP_INVALID
+    assert store.verify(1, '000000') == OTP_INVALID
+    store.issue(1, '222222')
+    assert store.verify(1, '111111') == OTP_INVALID
+    assert store.verify(1, '222222') == OTP_VALID
+
+
+def test_discard(store):
+    store.issue(1, '123456')
+    store.discard(1)
+    assert store.verify(1, '123456') == OTP_MISSING
+
+
+def test_memory_store_expiry(memory_store, monkeypatch):
+    import otp_store
+    now = [1000.0]
+    monkeypatch.setattr(otp_store.time, 'monotonic', lambda: now[0])
+    memory_store.issue(1, '123456')
+    memory_store.issue(2, '654321')
+    now[0] += 61
+    assert memory_store.verify(1, '123456') == OTP_EXPIRED
+    assert memory_store.sweep() == 1
+    assert len(memory_store) == 0
+
+
+def test_database_store_expiry(database_store):
+    from models import db, EmailOTP
+    database_store.issue(1, '123456')
+    db.session.get(EmailOTP, 1).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert database_store.verify(1, '123456') == OTP_EXPIRED
+    assert db.session.get(EmailOTP, 1) is None
+
+
+def test_database_store_sweeps_expired_rows_on_issue(database_store):
+    from models import db, EmailOTP
+    database_store.issue(1, '123456')
+    db.session.get(EmailOTP, 1).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    database_store._next_sweep = 0.0
+    database_store.issue(2, '654321')
+    assert db.session.get(EmailOTP, 1) is None
+    assert EmailOTP.query.count() == 1
+
+
+def test_default_store_is_shared_between_workers(app):
+    assert isinstance(create_otp_store(app.config), DatabaseOTPStore)
@@ -0,0 +1,55 @@
+import threading
+
+from ciphers import pool
+from ciphers.classical import parallel_apply, vigenere_cipher, caesar_cipher
+
+
+def test_default_processes_splits_cores_between_gunicorn_workers(monkeypatch):
+    monkeypatch.setattr(pool.os, 'cpu_count', lambda: 8)
+    monkeypatch.setenv('GUNICORN_WORKERS', '4')
+    assert pool.default_processes() == 2
+    monkeypatch.setenv('GUNICORN_WORKERS', '17')
+    assert pool.default_processes() == 1
+    monkeypatch.delenv('GUNICORN_WORKERS')
+    assert pool.default_processes() == 8
+
+
+def test_concurrent_callers_share_one_pool(monkeypatch):
+    created = []
+
+    class FakeExecutor:
+        def __init__(self, processes):
+            self._max_workers = processes
+            created.append(self)
+
+        def shutdown(self, wait=True):
+            pass
+
+    monkeypatch.setattr(pool, '_executor', None)
+    monkeypatch.setattr(pool, 'create_executor', FakeExecutor)
+    barrier = threading.Barrier(8)
+    executors = []
+
+    def get():
+        barrier.wait()
+        executors.append(pool.get_executor(2))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(executor is created[0] for executor in executors)
+    # A smaller request reuses the pool; a larger one replaces it
+    assert pool.get_executor(1) is created[0]
+    assert pool.get_executor(4)._max_workers == 4
+
+
+def test_parallel_apply_matches_serial(monkeypatch):
+    monkeypatch.setattr('ciphers.classical.PARALLEL_MIN_LENGTH', 1000)
+    monkeypatch.setattr('ciphers.classical.PARALLEL_MIN_CHUNK', 300)
+    text = 'Attack at dawn, über café! ' * 200
+    assert parallel_apply('vigenere', 'LEMON', text, processes=2) == vigenere_cipher(text, 'LEMON', with_steps=False)[0]
+    assert parallel_apply('caesar', 7, text, encrypt=False, processes=2) == caesar_cipher(text, 7, encrypt=False, with_steps=False)[0]
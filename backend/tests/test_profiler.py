@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from conftest import TestConfig
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    from app import create_app
+    from jobs import job_queue
+    from models import db, User
+
+    class Settings(TestConfig):
+        PROFILER_ENABLED = True
+        PROFILER_DIR = str(tmp_path / 'profiles')
+        PROFILER_MAX_PROFILES = 3
+        ADMIN_USERNAMES = 'admin'
+        JOBS_DIR = str(tmp_path / 'jobs')
+        CONTAINER_DIR = str(tmp_path / 'containers')
+        ANALYSIS_UPLOAD_DIR = str(tmp_path / 'uploads')
+        INCREMENTAL_SESSION_DIR = str(tmp_path / 'edit_sessions')
+
+    app = create_app(Settings)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User('admin', 'admin@example.com', 'password'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    job_queue.shutdown()
+
+
+def _headers(identity):
+    from flask_jwt_extended import create_access_token
+    return {'Authorization': 'Bearer ' + create_access_token(identity=identity)}
+
+
+@pytest.fixture
+def admin(profiled_app):
+    return _headers('1')
+
+
+def _profiled_request(client, admin):
+    response = client.post('/encrypt', json={'method': 'vigenere', 'key': 'LEMON', 'plaintext': 'attack ' * 2000},
+                           headers={**admin, 'X-Profile': '1'})
+    assert response.status_code == 200
+    return response.headers['X-Profile-Id']
+
+
+def test_request_profile_is_readable_from_another_worker(profiled_app, admin):
+    from profiler import ProfileStore, profile_store
+    client = profiled_app.test_client()
+    profile_id = _profiled_request(client, admin)
+
+    # Another worker only shares the profile directory
+    other = ProfileStore()
+    other.configure(profiled_app.config['PROFILER_DIR'])
+    assert other.get(profile_id).stacks == profile_store.get(profile_id).stacks
+
+    response = client.get(f'/admin/profile/{profile_id}?format=json', headers=admin)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['samples'] == sum(other.get(profile_id).stacks.values())
+    assert body['collapsed'] == other.get(profile_id).collapsed()
+
+
+def test_only_the_newest_profiles_are_kept(profiled_app, admin):
+    client = profiled_app.test_client()
+    ids = []
+    for age in range(4):
+        ids.append(_profiled_request(client, admin))
+        # Distinct modification times, oldest first
+        path = os.path.join(profiled_app.config['PROFILER_DIR'], f'{ids[-1]}.json')
+        os.utime(path, (1000 + age, 1000 + age))
+
+    ids.append(_profiled_request(client, admin))
+    statuses = [client.get(f'/admin/profile/{profile_id}', headers=admin).status_code for profile_id in ids]
+    assert statuses == [404, 404, 200, 200, 200]
+
+
+@pytest.mark.parametrize('profile_id', ['unknown1234', '../../etc/p', 'x'])
+def test_unknown_profiles_are_not_found(profiled_app, admin, profile_id):
+    response = profiled_app.test_client().get(f'/admin/profile/{profile_id}', headers=admin)
+    assert response.status_code == 404
+
+
+def test_profiles_need_an_admin(profiled_app, admin):
+    client = profiled_app.test_client()
+    profile_id = _profiled_request(client, admin)
+    assert client.get(f'/admin/profile/{profile_id}', headers=_headers('2')).status_code == 403
+    response = client.post('/encrypt', json={'method': 'caesar', 'key': '3', 'plaintext': 'hello'},
+                           headers={**_headers('2'), 'X-Profile': '1'})
+    assert 'X-Profile-Id' not in response.headers
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+import realtime
+from realtime import NAMESPACE, TokenBucket
+
+pytestmark = pytest.mark.skipif(realtime.socketio is None, reason="Flask-SocketIO is not installed")
+
+
+@pytest.fixture
+def server(app):
+    app.config.update(REALTIME_ENABLED=True, REALTIME_MAX_CONNECTIONS=2, REALTIME_RATE=1000, REALTIME_BURST=1000)
+    return realtime.init_realtime(app)
+
+
+@pytest.fixture
+def token(app):
+    from flask_jwt_extended import create_access_token
+    return create_access_token(identity='1')
+
+
+def _connect(app, server, token):
+    return server.test_client(app, namespace=NAMESPACE, auth={'token': token})
+
+
+def _responses(client, count, timeout=5):
+    received = []
+    deadline = time.monotonic() + timeout
+    while len(received) < count and time.monotonic() < deadline:
+        received += [packet['args'][0] for packet in client.get_received(NAMESPACE) if packet['name'] == 'response']
+        time.sleep(0.01)
+    return received
+
+
+def test_only_the_websocket_transport_is_accepted(server):
+    assert server.server.eio.transports == ['websocket']
+
+
+def test_connection_needs_an_access_token(app, server):
+    assert not _connect(app, server, 'not-a-token').is_connected(NAMESPACE)
+
+
+def test_messages_are_answered_by_id(app, server, token):
+    client = _connect(app, server, token)
+    client.emit('encrypt', {'id': 1, 'method': 'caesar', 'key': '3', 'plaintext': 'hello'}, namespace=NAMESPACE)
+    client.emit('hash', {'id': 2, 'message': 'hello', 'algorithm': 'sha256'}, namespace=NAMESPACE)
+
+    responses = {response['id']: response for response in _responses(client, 2)}
+    assert responses[1]['status'] == 200 and responses[1]['result']['ciphertext'] == 'khoor'
+    assert responses[2]['status'] == 200 and responses[2]['operation'] == 'hash'
+    client.disconnect(NAMESPACE)
+
+
+def test_connections_per_worker_are_capped(app, server, token):
+    clients = [_connect(app, server, token) for _ in range(3)]
+    assert [client.is_connected(NAMESPACE) for client in clients] == [True, True, False]
+
+    clients[0].disconnect(NAMESPACE)
+    replacement = _connect(app, server, token)
+    assert replacement.is_connected(NAMESPACE)
+    for client in (clients[1], replacement):
+        client.disconnect(NAMESPACE)
+
+
+def test_rate_limited_messages_are_refused(app, server, token):
+    app.config.update(REALTIME_RATE=0.001, REALTIME_BURST=1)
+    client = _connect(app, server, token)
+    for request_id in (1, 2):
+        client.emit('hash', {'id': request_id, 'message': 'x', 'algorithm': 'sha256'}, namespace=NAMESPACE)
+
+    statuses = {response['id']: response['status'] for response in _responses(client, 2)}
+    assert statuses == {1: 200, 2: 429}
+    client.disconnect(NAMESPACE)
+
+
+def test_bucket_is_taken_under_the_connection_lock(app, server, token, monkeypatch):
+    client = _connect(app, server, token)
+    namespace = server.server.namespace_handlers[NAMESPACE]
+    held = []
+    take = TokenBucket.take
+
+    def checked_take(bucket):
+        held.extend(connection.lock.locked() for connection in namespace.connections.values())
+        return take(bucket)
+
+    monkeypatch.setattr(TokenBucket, 'take', checked_take)
+    client.emit('hash', {'id': 1, 'message': 'x', 'algorithm': 'sha256'}, namespace=NAMESPACE)
+    assert _responses(client, 1)[0]['status'] == 200
+    assert held == [True]
+    client.disconnect(NAMESPACE)
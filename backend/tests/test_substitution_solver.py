@@ -0,0 +1,51 @@
+import itertools
+import string
+
+import pytest
+
+from ciphers import substitution_solver
+from ciphers.substitution_solver import apply_substitution, solve_substitution
+
+KEY = 'QWERTYUIOPASDFGHJKLZXCVBNM'
+
+
+def test_solver_recovers_key_and_reports_convergence(english_text):
+    ciphertext = apply_substitution(english_text, KEY)
+    result = solve_substitution(ciphertext, time_budget=20, processes=1, seed=1)
+
+    assert result['converged']
+    assert result['confirmations'] >= 2
+    assert apply_substitution(ciphertext, result['key'], encrypt=False) == english_text
+    # Stops once enough restarts agree instead of spending the whole budget
+    assert result['restarts'] <= 50 and result['elapsed_seconds'] < 20
+
+    missing = set(string.ascii_uppercase) - set(english_text.upper())
+    assert set(result['undetermined']) == missing
+
+
+def test_solver_is_unconverged_when_restarts_disagree(monkeypatch, english_text):
+    scores = itertools.count(-1000.0, 100.0)  # every restart finds a better, different optimum
+
+    def climb(cipher, table, affected, key, deadline, rng):
+        return next(scores), key
+
+    monkeypatch.setattr(substitution_solver, '_hill_climb', climb)
+    monkeypatch.setattr(substitution_solver.time, 'time', itertools.count().__next__)
+    result = solve_substitution(apply_substitution(english_text, KEY), time_budget=5, processes=1, seed=1)
+
+    assert not result['converged']
+    assert result['confirmations'] == 1
+
+
+def test_crack_substitution_requires_auth(client):
+    response = client.post('/crack/substitution', json={'ciphertext': 'ABCD'})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize('time_budget', ['soon', None, [], 0, -1, 10_000])
+def test_crack_substitution_rejects_bad_time_budget(client, auth_headers, time_budget):
+    response = client.post(
+        '/crack/substitution', json={'ciphertext': 'ABCD', 'time_budget': time_budget}, headers=auth_headers()
+    )
+    assert response.status_code == 400
+    assert 'time_budget' in response.get_json()['error']
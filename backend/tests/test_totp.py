@@ -0,0 +1,59 @@
+import pyotp
+import pytest
+
+from totp import TOTPVerifier
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def user(app):
+    from models import db, User
+    user = User('alice', 'alice@example.com', 'not-a-real-hash')
+    db.session.add(user)
+    db.session.commit()
+    user.generate_totp_secret()
+    db.session.commit()
+    return user
+
+
+def _code(user, for_time=NOW):
+    return pyotp.TOTP(user.totp_secret).at(for_time)
+
+
+def _verify(verifier, user, token, for_time=NOW):
+    return verifier.verify(user.id, user.totp_secret, token, user._accept_totp_counter, for_time)
+
+
+def test_replay_is_rejected_by_another_verifier(user):
+    # Two verifiers stand in for two gunicorn workers sharing the database
+    assert _verify(TOTPVerifier(), user, _code(user))
+    assert not _verify(TOTPVerifier(), user, _code(user))
+
+
+def test_earlier_step_is_rejected_after_a_later_one(user):
+    assert _verify(TOTPVerifier(), user, _code(user, NOW + 30), NOW)
+    assert not _verify(TOTPVerifier(), user, _code(user, NOW), NOW)
+
+
+def test_new_secret_clears_the_used_step(user):
+    from models import db, TOTPCounter
+    assert _verify(TOTPVerifier(), user, _code(user))
+    user.generate_totp_secret()
+    db.session.commit()
+    assert db.session.get(TOTPCounter, user.id) is None
+    assert _verify(TOTPVerifier(), user, _code(user))
+
+
+def test_outcomes_are_counted_in_the_registry(user, enabled_metrics):
+    verifier = TOTPVerifier()
+    _verify(verifier, user, _code(user))
+    _verify(verifier, user, _code(user))
+    _verify(verifier, user, 'abc')
+
+    text = enabled_metrics.render()
+    assert 'totp_verifications_total{outcome="valid"} 1' in text
+    assert 'totp_verifications_total{outcome="replayed"} 1' in text
+    assert 'totp_verifications_total{outcome="malformed"} 1' in text
+    # The current step is tried first, so each match costs one HMAC
+    assert 'totp_hmac_computations_total 2' in text
@@ -0,0 +1,111 @@
+import base64
+
+import pytest
+
+KEY = 'correct horse battery staple'
+PLAINTEXT = 'attack at dawn'
+
+
+def _encrypt(client, method, mode=None, key=KEY, plaintext=PLAINTEXT, **extra):
+    response = client.post('/encrypt', json={'method': method, 'mode': mode, 'key': key, 'plaintext': plaintext,
+                                             **extra})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def _pair(encrypted, plaintext=PLAINTEXT, **extra):
+    pair = {'plaintext': plaintext, 'ciphertext': encrypted['ciphertext']}
+    for field in ('iv', 'tag', 'aad'):
+        if encrypted.get(field):
+            pair[field] = encrypted[field]
+    return {**pair, **extra}
+
+
+@pytest.mark.parametrize('method, mode, key', [
+    ('caesar', None, '3'), ('vigenere', None, 'LEMON'), ('substitution', None, 'QWERTYUIOPASDFGHJKLZXCVBNM'),
+    ('aes', 'ecb', KEY), ('aes', 'cbc', KEY), ('aes', 'ctr', KEY), ('aes', 'gcm', KEY),
+    ('chacha20', None, KEY), ('3des', None, KEY),
+])
+def test_ciphertexts_from_encrypt_are_valid(client, method, mode, key):
+    encrypted = _encrypt(client, method, mode, key, aad='header')
+    body = {'method': method, 'mode': mode, 'key': key, **_pair(encrypted)}
+
+    response = client.post('/validate', json=body)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['valid'] is True and result['expected'] == encrypted['ciphertext']
+
+    response = client.post('/validate', json={**body, 'plaintext': 'attack at dusk'})
+    assert response.status_code == 200 and response.get_json()['valid'] is False
+
+
+def test_wrong_key_or_altered_tag_is_invalid(client):
+    encrypted = _encrypt(client, 'aes', 'gcm')
+    body = {'method': 'aes', 'mode': 'gcm', 'key': KEY, **_pair(encrypted)}
+    assert client.post('/validate', json={**body, 'key': 'another key'}).get_json()['valid'] is False
+
+    tag = bytearray(base64.b64decode(encrypted['tag']))
+    tag[0] ^= 1
+    result = client.post('/validate', json={**body, 'tag': base64.b64encode(bytes(tag)).decode()}).get_json()
+    assert result['valid'] is False and result['expected_tag'] == encrypted['tag']
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'method': 'caesar', 'key': '3', 'plaintext': 'hello'}, 'Both plaintext and ciphertext must be provided'),
+    ({'key': '3', 'plaintext': 'hello', 'ciphertext': 'khoor'}, 'No encryption method specified'),
+    ({'method': 'aes', 'plaintext': 'hello', 'ciphertext': 'AAAA'}, 'No encryption key provided'),
+    ({'method': 'aes', 'key': KEY, 'plaintext': 'hello', 'ciphertext': 'AAAA'}, 'AES mode not specified'),
+    ({'method': 'aes', 'mode': 'cbc', 'key': KEY, 'plaintext': 'hello', 'ciphertext': 'AAAA'}, 'The IV'),
+    ({'method': 'aes', 'mode': 'ecb', 'key': KEY, 'plaintext': 'hello', 'ciphertext': '!!'}, 'ciphertext is not valid Base64'),
+    ({'method': 'rot13', 'key': 'x', 'plaintext': 'hello', 'ciphertext': 'uryyb'}, 'Unsupported encryption method'),
+])
+def test_bad_requests_are_rejected(client, body, error):
+    response = client.post('/validate', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+
+def test_batch_reports_each_pair(client):
+    first = _encrypt(client, 'aes', 'cbc')
+    second = _encrypt(client, 'aes', 'cbc', plaintext='retreat at noon')
+    items = [
+        _pair(first),
+        _pair(second, plaintext='retreat at noon'),
+        _pair(first, plaintext='attack at dusk'),
+        {'plaintext': 'no ciphertext'},
+        _pair(first, iv='not base64!'),
+    ]
+    response = client.post('/validate/batch', json={'method': 'aes', 'mode': 'cbc', 'key': KEY, 'items': items})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [result['valid'] for result in body['results']] == [True, True, False, False, False]
+    assert body['valid_count'] == 2 and body['all_valid'] is False
+    assert 'expected' not in body['results'][0]
+    assert body['results'][3]['error'] == 'Both plaintext and ciphertext must be provided'
+    assert body['results'][4]['error'] == 'iv is not valid Base64'
+
+
+def test_batch_can_include_the_expected_ciphertext(client):
+    encrypted = _encrypt(client, 'vigenere', key='LEMON')
+    response = client.post('/validate/batch', json={
+        'method': 'vigenere', 'key': 'LEMON', 'include_expected': True, 'items': [_pair(encrypted)]
+    })
+    body = response.get_json()
+    assert body['all_valid'] is True
+    assert body['results'][0]['expected'] == encrypted['ciphertext']
+
+
+@pytest.mark.parametrize('items', [None, [], {'plaintext': 'x'}])
+def test_batch_needs_a_list_of_items(client, items):
+    response = client.post('/validate/batch', json={'method': 'caesar', 'key': '3', 'items': items})
+    assert response.status_code == 400
+
+
+def test_batch_size_is_capped(client, app):
+    app.config['VALIDATE_MAX_BATCH'] = 2
+    items = [{'plaintext': 'hello', 'ciphertext': 'khoor'}] * 3
+    response = client.post('/validate/batch', json={'method': 'caesar', 'key': '3', 'items': items})
+    assert response.status_code == 400
+    assert client.post('/validate/batch', json={
+        'method': 'caesar', 'key': '3', 'items': items[:2]
+    }).get_json()['all_valid'] is True
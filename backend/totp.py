@@ -0,0 +1,130 @@
+"""
+Lean TOTP (RFC 6238) verification.
+
+pyotp is still used for secret generation and provisioning URIs; this module
+only handles verification. Decoded secret bytes are cached per user, HOTP
+values are computed directly with hmac, and the current time step is tried
+first so a valid code normally costs a single HMAC.
+
+A matching code is only accepted if its time step is later than the last one
+accepted for the user. The caller supplies that check (accept), so it can
+live in the database that all server processes share (models.py). Outcomes
+and HMAC counts go to the metrics registry.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Verification outcomes
+TOTP_VALID = 'valid'
+TOTP_INVALID = 'invalid'
+TOTP_REPLAYED = 'replayed'
+TOTP_MALFORMED = 'malformed'
+
+
+def decode_secret(secret):
+    """Decode a base32 TOTP secret (padding optional) to raw key bytes."""
+    secret = secret.strip().replace(' ', '').upper()
+    secret += '=' * (-len(secret) % 8)
+    return base64.b32decode(secret)
+
+
+def hotp(key, counter, digits=6):
+    """Compute the HOTP value (RFC 4226) for a counter as a zero-padded string."""
+    mac = hmac.new(key, counter.to_bytes(8, 'big'), hashlib.sha1).digest()
+    offset = mac[-1] & 0x0F
+    code = int.from_bytes(mac[offset:offset + 4], 'big') & 0x7FFFFFFF
+    return str(code % 10 ** digits).zfill(digits)
+
+
+class TOTPVerifier:
+    """TOTP verifier with a decoded-secret cache."""
+
+    def __init__(self, interval=30, digits=6, valid_window=1, cache_size=4096):
+        self.interval = interval
+        self.digits = digits
+        self.valid_window = valid_window
+        self.cache_size = cache_size
+        self._keys = OrderedDict()  # user_id -> (secret, key_bytes)
+        self._lock = threading.Lock()
+
+    def configure(self, valid_window=None, cache_size=None):
+        """Apply application config (called from app.py)."""
+        if valid_window is not None:
+            self.valid_window = valid_window
+        if cache_size is not None:
+            self.cache_size = cache_size
+
+    def verify(self, user_id, secret, token, accept, for_time=None):
+        """
+        Verify a TOTP token for a user.
+
+        Args:
+            user_id: Cache key for the user
+            secret (str): The user's base32 TOTP secret
+            token (str): The code supplied by the user
+            accept (callable): Called with the matching time step; records it and returns
+                False if that step or a later one was accepted before
+            for_time (float, optional): Unix time to verify against (defaults to now)
+
+        Returns:
+            bool: True if the token is valid and has not been used before
+        """
+        outcome = self._verify(user_id, secret, token, accept, for_time)
+        metrics.inc('totp_verifications_total', outcome=outcome)
+        logger.debug("TOTP verification for user %s: %s", user_id, outcome)
+        return outcome == TOTP_VALID
+
+    def _verify(self, user_id, secret, token, accept, for_time):
+        token = str(token).strip()
+        if len(token) != self.digits or not token.isdigit():
+            return TOTP_MALFORMED
+
+        try:
+            key = self._get_key(user_id, secret)
+        except (ValueError, TypeError):
+            return TOTP_MALFORMED
+
+        if for_time is None:
+            for_time = time.time()
+        current = int(for_time) // self.interval
+
+        # Current step first, then alternate outwards: 0, -1, +1, -2, +2, ...
+        candidates = [current]
+        for delta in range(1, self.valid_window + 1):
+            candidates.extend((current - delta, current + delta))
+
+        for computed, counter in enumerate(candidates, start=1):
+            if hmac.compare_digest(hotp(key, counter, self.digits), token):
+                metrics.inc('totp_hmac_computations_total', computed)
+                return TOTP_VALID if accept(counter) else TOTP_REPLAYED
+
+        metrics.inc('totp_hmac_computations_total', len(candidates))
+        return TOTP_INVALID
+
+    def _get_key(self, user_id, secret):
+        with self._lock:
+            cached = self._keys.get(user_id)
+            if cached is not None and cached[0] == secret:
+                self._keys.move_to_end(user_id)
+                return cached[1]
+
+        key = decode_secret(secret)
+        with self._lock:
+            self._keys[user_id] = (secret, key)
+            self._keys.move_to_end(user_id)
+            while len(self._keys) > self.cache_size:
+                self._keys.popitem(last=False)
+        return key
+
+
+totp_verifier = TOTPVerifier()
@@ -0,0 +1,184 @@
+"""
+Streaming shell command runner for the web terminal (app.py).
+
+Each command runs in its own process group and is watched by a background
+task, so a long command never holds up other clients. stdout and stderr are
+read line by line as they are produced (lines longer than READ_SIZE bytes in
+pieces) and sent to the client that started the command:
+
+- command_started: {id, command}
+- command_output:  {id, stream: 'stdout' | 'stderr', output: line}
+- command_exit:    {id, returncode, reason, elapsed}
+- command_error:   {id, error} when the command can't be started
+
+`reason` is 'exited', 'timeout', 'cancelled' or 'output_limit'. A command is
+killed (with its whole process group) when it runs longer than the timeout,
+prints more than the output cap, is cancelled by the client or the client
+disconnects. At most `max_concurrent` commands run at once across all
+clients; beyond that new commands are refused rather than queued.
+
+The code uses plain threading and subprocess. app.py monkey-patches them
+with eventlet, which turns the threads into green threads and the pipe reads
+into cooperative ones.
+"""
+
+import codecs
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+
+# Most bytes read from a pipe at once, so output without newlines is sent in pieces
+READ_SIZE = 64 * 1024
+
+
+class CommandJob:
+    def __init__(self, sid, command_id, process):
+        self.sid = sid
+        self.id = command_id
+        self.process = process
+        self.started = time.monotonic()
+        self.reason = None  # Why the process was killed, if it was
+        self.output_bytes = 0
+        self.lock = threading.Lock()
+
+    def kill(self, reason=None):
+        """Kill the process group, remembering the first reason given."""
+        with self.lock:
+            if self.reason is None:
+                self.reason = reason
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass  # Already exited
+
+
+class CommandRunner:
+    """Runs shell commands for Socket.IO clients and streams their output."""
+
+    def __init__(self, socketio, timeout=30, max_output_bytes=1024 * 1024, max_concurrent=4):
+        self.socketio = socketio
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.max_concurrent = max_concurrent
+        self._jobs = {}  # (sid, command id) -> CommandJob
+        self._lock = threading.Lock()
+
+    def start(self, sid, command, command_id=None):
+        """
+        Start a command in the background.
+
+        Args:
+            sid (str): Socket.IO session that receives the events
+            command (str): Shell command line
+            command_id (str, optional): Client-chosen ID echoed in every event
+
+        Returns:
+            str: The command ID, or None if the command was refused
+        """
+        command_id = str(command_id) if command_id is not None else uuid.uuid4().hex
+        if not command or not isinstance(command, str):
+            self._emit(sid, 'command_error', {"id": command_id, "error": "No command provided"})
+            return None
+
+        with self._lock:
+            if (sid, command_id) in self._jobs:
+                self._emit(sid, 'command_error', {"id": command_id, "error": "A command with this ID is already running"})
+                return None
+            if len(self._jobs) >= self.max_concurrent:
+                self._emit(sid, 'command_error', {"id": command_id, "error": "Too many commands running, try again later"})
+                return None
+            try:
+                process = subprocess.Popen(
+                    command, shell=True,
+                    stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    start_new_session=True  # Own process group, so kill() reaches its children too
+                )
+            except OSError as e:
+                self._emit(sid, 'command_error', {"id": command_id, "error": str(e)})
+                return None
+            job = self._jobs[(sid, command_id)] = CommandJob(sid, command_id, process)
+
+        self._emit(sid, 'command_started', {"id": command_id, "command": command})
+        threading.Thread(target=self._watch, args=(job,), daemon=True).start()
+        return command_id
+
+    def cancel(self, sid, command_id):
+        """Kill a running command. Returns False if there is no such command."""
+        with self._lock:
+            job = self._jobs.get((sid, str(command_id)))
+        if job is None:
+            return False
+        job.kill('cancelled')
+        return True
+
+    def cancel_all(self, sid):
+        """Kill every command started by a session (when it disconnects)."""
+        with self._lock:
+            jobs = [job for (job_sid, _), job in self._jobs.items() if job_sid == sid]
+        for job in jobs:
+            job.kill('cancelled')
+
+    def running(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def _emit(self, sid, event, data):
+        self.socketio.emit(event, data, to=sid)
+
+    def _pump(self, job, pipe, stream):
+        # Pieces can end inside a multi-byte character, so decode incrementally
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            with job.lock:
+                remaining = self.max_output_bytes - job.output_bytes
+            # Read at most one byte past the cap, so the buffer can't outgrow it
+            chunk = pipe.readline(max(1, min(READ_SIZE, remaining + 1)))
+            if not chunk:
+                break
+            with job.lock:
+                job.output_bytes += len(chunk)
+                over = job.output_bytes > self.max_output_bytes
+            if over:
+                job.kill('output_limit')
+                break
+            output = decoder.decode(chunk)
+            if output:
+                self._emit(job.sid, 'command_output', {"id": job.id, "stream": stream, "output": output})
+        output = decoder.decode(b'', final=True)
+        if output and job.reason != 'output_limit':
+            self._emit(job.sid, 'command_output', {"id": job.id, "stream": stream, "output": output})
+        pipe.close()
+
+    def _watch(self, job):
+        process = job.process
+        readers = [
+            threading.Thread(target=self._pump, args=(job, process.stdout, 'stdout'), daemon=True),
+            threading.Thread(target=self._pump, args=(job, process.stderr, 'stderr'), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+
+        try:
+            process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            job.kill('timeout')
+            process.wait()
+        # Anything the command left running in the background would keep the pipes open
+        job.kill()
+        for reader in readers:
+            reader.join()
+
+        with self._lock:
+            self._jobs.pop((job.sid, job.id), None)
+        self._emit(job.sid, 'command_exit', {
+            "id": job.id,
+            "returncode": process.returncode,
+            "reason": job.reason or 'exited',
+            "elapsed": round(time.monotonic() - job.started, 3)
+        })
@@ -0,0 +1,161 @@
+"""
+Tests for the web terminal's command runner.
+
+Run from the repository root:
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# command_runner.py lives next to the web terminal's app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_runner import CommandRunner  # noqa: E402
+
+SID = 'client-1'
+
+
+class RecordingSocketIO:
+    """Collects emitted events in place of Flask-SocketIO."""
+
+    def __init__(self):
+        self.events = []
+        self._condition = threading.Condition()
+
+    def emit(self, event, data, to=None):
+        with self._condition:
+            self.events.append((to, event, data))
+            self._condition.notify_all()
+
+    def wait_for(self, event, command_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                for _, name, data in self.events:
+                    if name == event and data['id'] == command_id:
+                        return data
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AssertionError(f"No {event} for {command_id}")
+                self._condition.wait(remaining)
+
+    def output(self, command_id, stream='stdout'):
+        return ''.join(
+            data['output'] for _, name, data in self.events
+            if name == 'command_output' and data['id'] == command_id and data['stream'] == stream
+        )
+
+
+@pytest.fixture
+def socketio():
+    return RecordingSocketIO()
+
+
+def _runner(socketio, **options):
+    return CommandRunner(socketio, **{'timeout': 10, **options})
+
+
+def test_output_is_streamed_to_the_client(socketio):
+    runner = _runner(socketio)
+    command_id = runner.start(SID, 'echo one; echo two >&2; exit 3', 'c1')
+    assert command_id == 'c1'
+
+    exit_event = socketio.wait_for('command_exit', 'c1')
+    assert exit_event['returncode'] == 3 and exit_event['reason'] == 'exited'
+    assert socketio.output('c1') == 'one\n'
+    assert socketio.output('c1', 'stderr') == 'two\n'
+    assert all(to == SID for to, _, _ in socketio.events)
+    assert runner.running() == 0
+
+
+def test_output_over_the_limit_kills_the_command(socketio):
+    runner = _runner(socketio, max_output_bytes=1000)
+    runner.start(SID, 'yes', 'c1')
+
+    exit_event = socketio.wait_for('command_exit', 'c1')
+    assert exit_event['reason'] == 'output_limit'
+    assert 0 < len(socketio.output('c1')) <= 1000
+
+
+def test_output_without_newlines_is_sent_in_pieces(socketio, monkeypatch):
+    import command_runner
+    monkeypatch.setattr(command_runner, 'READ_SIZE', 100)
+    runner = _runner(socketio)
+    runner.start(SID, "head -c 1000 /dev/zero | tr '\\0' x", 'c1')
+
+    socketio.wait_for('command_exit', 'c1')
+    pieces = [data['output'] for _, name, data in socketio.events if name == 'command_output']
+    assert ''.join(pieces) == 'x' * 1000
+    assert max(len(piece) for piece in pieces) <= 100
+
+
+def test_slow_commands_time_out(socketio):
+    runner = _runner(socketio, timeout=0.5)
+    runner.start(SID, 'sleep 30', 'c1')
+
+    exit_event = socketio.wait_for('command_exit', 'c1')
+    assert exit_event['reason'] == 'timeout'
+    assert exit_event['elapsed'] < 5
+
+
+def test_commands_can_be_cancelled(socketio):
+    runner = _runner(socketio)
+    runner.start(SID, 'sleep 30', 'c1')
+    socketio.wait_for('command_started', 'c1')
+
+    assert runner.cancel(SID, 'c1')
+    assert socketio.wait_for('command_exit', 'c1')['reason'] == 'cancelled'
+    assert not runner.cancel(SID, 'c1')
+    assert not runner.cancel('another-client', 'c1')
+
+
+def test_disconnecting_cancels_the_clients_commands(socketio):
+    runner = _runner(socketio)
+    runner.start(SID, 'sleep 30', 'c1')
+    runner.start('client-2', 'sleep 30', 'c2')
+
+    runner.cancel_all(SID)
+    assert socketio.wait_for('command_exit', 'c1')['reason'] == 'cancelled'
+    assert runner.running() == 1
+    runner.cancel_all('client-2')
+    socketio.wait_for('command_exit', 'c2')
+
+
+def test_background_children_do_not_hold_the_command_open(socketio):
+    runner = _runner(socketio)
+    runner.start(SID, 'sleep 30 & echo started', 'c1')
+
+    exit_event = socketio.wait_for('command_exit', 'c1')
+    assert exit_event['reason'] == 'exited' and exit_event['elapsed'] < 5
+    assert socketio.output('c1') == 'started\n'
+
+
+def test_concurrent_commands_are_capped(socketio):
+    runner = _runner(socketio, max_concurrent=1)
+    assert runner.start(SID, 'sleep 30', 'c1') == 'c1'
+    assert runner.start(SID, 'echo hi', 'c2') is None
+    assert socketio.wait_for('command_error', 'c2')['error'] == 'Too many commands running, try again later'
+
+    runner.cancel(SID, 'c1')
+    socketio.wait_for('command_exit', 'c1')
+    assert runner.start(SID, 'echo hi', 'c2') == 'c2'
+    socketio.wait_for('command_exit', 'c2')
+
+
+def test_refused_commands(socketio):
+    runner = _runner(socketio)
+    assert runner.start(SID, '', 'c1') is None
+    assert socketio.wait_for('command_error', 'c1')['error'] == 'No command provided'
+
+    runner.start(SID, 'sleep 30', 'c2')
+    assert runner.start(SID, 'echo hi', 'c2') is None
+    errors = [data['error'] for _, name, data in socketio.events if name == 'command_error' and data['id'] == 'c2']
+    assert errors == ['A command with this ID is already running']
+    runner.cancel(SID, 'c2')
+    socketio.wait_for('command_exit', 'c2')